@@ -0,0 +1,112 @@
+import argparse
+import random
+import sys
+from os.path import dirname, realpath
+from timeit import repeat
+
+HOME = dirname(realpath(__file__))
+sys.path.append(HOME + "/../src")
+
+import pandas as pd
+from utils.dividends import (
+    bonus_frame,
+    dividends_frame,
+    timedelta_day,
+    validate_date
+)
+
+def earnings_rows(n: int) -> list:
+    r = random.Random(n)
+    return [{
+        "ed": f"{1 + i % 28:02d}/{1 + i % 12:02d}/{1990 + i // 12}",
+        "pd": f"{1 + i % 28:02d}/{1 + (i + 1) % 12:02d}/{1990 + i // 12}",
+        "v": r.uniform(0.01, 2),
+        "et": r.choice(["JCP", "Dividendo", "Rend. Tributado", "Amortização"])
+    } for i in range(n)]
+
+def bonus_rows(n: int) -> list:
+    return [[
+        f"{1 + i % 28:02d}/05/{1990 + i}", f"{1 + i % 28:02d}/06/{1990 + i}",
+        f"R$ {i},50", f"{i % 30},00%", " NEW3 "
+    ] for i in range(n)]
+
+def concat_dividends_frame(symbol: str, rows: list) -> pd.DataFrame:
+    """
+    This function is the previous builder, with one concat per row
+    """
+    df = pd.DataFrame({})
+    for row in rows:
+        prev_date = validate_date(row["ed"])
+        value_without_tax = float(row["v"])
+        if row["et"] == "JCP" or row["et"] == "Rend. Tributado":
+            value = value_without_tax * (1 - 0.15)
+        else:
+            value = value_without_tax
+        df = pd.concat([df, pd.DataFrame({
+            "symbol": [symbol],
+            "ex_date": [timedelta_day(prev_date, 1)],
+            "prev_date": [prev_date],
+            "payment_day": [validate_date(row["pd"])],
+            "type": [row["et"]],
+            "value_without_tax": [value_without_tax],
+            "value": [value],
+        })])
+    return df
+
+def concat_bonus_frame(symbol: str, rows: list) -> pd.DataFrame:
+    """
+    This function is the previous builder, with one concat per row
+    """
+    df = pd.DataFrame(
+        columns=[
+            "symbol", "ex-date", "incorporation_date",
+            "proportion", "value", "new_ticker"
+        ]
+    )
+    for cells in rows:
+        ex_date = validate_date(cells[0])
+        df = pd.concat([df, pd.DataFrame({
+            "symbol": [symbol],
+            "ex_date": [ex_date],
+            "prev_date": [timedelta_day(ex_date, -1)],
+            "incorporation_date": [validate_date(cells[1])],
+            "proportion": [
+                float(cells[3].replace("%", "").replace(",", "."))
+            ],
+            "value": [float(cells[2].replace("R$ ", "").replace(",", "."))],
+            "new_ticker": [cells[4].strip()],
+        })])
+    return df
+
+def best_ms(function, *args, number: int = 3) -> float:
+    return min(
+        repeat(lambda: function(*args), number=number, repeat=3)
+    ) / number * 1000
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare the dividend and bonus frame builders"
+    )
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    args = parser.parse_args()
+
+    print(f"{'builder':<10}{'events':>8}{'concat ms':>12}{'arrays ms':>12}")
+    for n in args.sizes:
+        rows = earnings_rows(n)
+        if concat_dividends_frame("SYM3", rows).to_csv(sep=";", index=False) \
+                != dividends_frame("SYM3", rows).to_csv(sep=";", index=False):
+            raise ValueError(f"The dividends of {n} events do not match")
+        print(
+            f"{'dividends':<10}{n:>8}"
+            f"{best_ms(concat_dividends_frame, 'SYM3', rows):>12.2f}"
+            f"{best_ms(dividends_frame, 'SYM3', rows):>12.2f}"
+        )
+        rows = bonus_rows(n)
+        if concat_bonus_frame("SYM3", rows).to_csv(sep=";", index=False) \
+                != bonus_frame("SYM3", rows).to_csv(sep=";", index=False):
+            raise ValueError(f"The bonus of {n} events do not match")
+        print(
+            f"{'bonus':<10}{n:>8}"
+            f"{best_ms(concat_bonus_frame, 'SYM3', rows):>12.2f}"
+            f"{best_ms(bonus_frame, 'SYM3', rows):>12.2f}"
+        )
@@ -0,0 +1,106 @@
+import argparse
+import sys
+from bisect import bisect_left
+from os.path import dirname, realpath
+from time import perf_counter
+
+HOME = dirname(realpath(__file__))
+sys.path.append(HOME + "/../src")
+
+import numpy as np
+import pandas as pd
+from investment_portfolio.investment_portfolio import dividends_story
+from investment_portfolio.position_index import PositionIndex
+
+def synthetic(symbols: int, years: int, seed: int = 0) -> tuple:
+    """
+    This function creates the stories, with a trade per month, and the
+    dividends, paid per quarter, of the symbols
+    """
+    rng = np.random.default_rng(seed)
+    names = [f"S{i:03d}3" for i in range(symbols)]
+    dates = pd.date_range("2000-01-03", periods=12 * years, freq="MS")
+    n = len(dates)
+    amount = rng.integers(1, 100, size=(symbols, n)).cumsum(axis=1)
+    value = rng.uniform(10, 5000, size=(symbols, n)).cumsum(axis=1)
+    df_story = pd.DataFrame({
+        "date": np.tile(dates.strftime("%Y-%m-%d"), symbols),
+        "symbol": np.repeat(names, n),
+        "amount": amount.ravel(),
+        "value": value.ravel(),
+    })
+    df_story["price"] = df_story["value"] / df_story["amount"]
+    prev_dates = pd.date_range("2000-02-15", periods=4 * years, freq="QS")
+    prev_dates = prev_dates + pd.Timedelta(days=14)
+    m = len(prev_dates)
+    df_dividend = pd.DataFrame({
+        "symbol": np.repeat(names, m),
+        "ex_date": np.tile(
+            (prev_dates + pd.Timedelta(days=1)).strftime("%Y-%m-%d"), symbols
+        ),
+        "prev_date": np.tile(prev_dates.strftime("%Y-%m-%d"), symbols),
+        "payment_day": np.tile(
+            (prev_dates + pd.Timedelta(days=30)).strftime("%Y-%m-%d"), symbols
+        ),
+        "type": "Dividendo",
+        "value_without_tax": rng.uniform(0.01, 2, size=symbols * m),
+    })
+    df_dividend["value"] = df_dividend["value_without_tax"]
+    return df_story, df_dividend
+
+def bisect_dividends_story(
+    df_story: pd.DataFrame, df_dividend: pd.DataFrame
+) -> pd.DataFrame:
+    """
+    This function is the previous matching, with a bisect per dividend and
+    a loop over the symbols
+    """
+    stories = []
+    for c, df_story_c in df_story.groupby("symbol"):
+        min_date = min(df_story_c["date"])
+        df = df_dividend.loc[df_dividend["symbol"] == c]
+        df = df.loc[(df["prev_date"] >= min_date)]
+        df = df.sort_values(["prev_date"])
+        intake_dates = sorted(list(df_story_c["date"]))
+        df["date"] = df["prev_date"].apply(
+            lambda x: intake_dates[bisect_left(intake_dates, x) - 1]
+        )
+        df = df.merge(df_story_c, on=["date", "symbol"], how="left")
+        df = df[
+            ["symbol", "prev_date", "payment_day", "type",
+            "value_x", "amount", "value_y", "price"]
+        ]
+        df = df.rename(
+            columns={"value_x": "dividend_per_stock", "value_y": "investment"}
+        )
+        df["dividend_received"] = df["dividend_per_stock"] * df["amount"]
+        stories.append(
+            df.sort_values(["payment_day", "prev_date"], ascending=False)
+        )
+    return pd.concat(stories)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare the dividend to position matching"
+    )
+    parser.add_argument("--symbols", type=int, default=500)
+    parser.add_argument("--years", type=int, default=20)
+    args = parser.parse_args()
+
+    df_story, df_dividend = synthetic(args.symbols, args.years)
+    start = perf_counter()
+    expected = bisect_dividends_story(df_story, df_dividend)
+    bisect_seconds = perf_counter() - start
+    start = perf_counter()
+    result = dividends_story(PositionIndex(df_story), df_dividend)
+    index_seconds = perf_counter() - start
+    if expected.to_csv(sep=";", index=False) \
+            != result.to_csv(sep=";", index=False):
+        raise ValueError("The dividend stories do not match")
+    print(
+        f"{args.symbols} symbols, {args.years} years, "
+        f"{len(df_story)} story rows, {len(df_dividend)} dividends"
+    )
+    print(f"bisect per symbol: {bisect_seconds:8.3f} s")
+    print(f"position index:    {index_seconds:8.3f} s")
+    print(f"speedup:           {bisect_seconds / index_seconds:8.1f}x")
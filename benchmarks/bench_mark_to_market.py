@@ -0,0 +1,73 @@
+import argparse
+import sys
+import tempfile
+from os.path import dirname, realpath
+from time import perf_counter
+
+HOME = dirname(realpath(__file__))
+sys.path.append(HOME + "/../src")
+
+import numpy as np
+import pandas as pd
+from investment_portfolio.mark_to_market import MarkToMarket
+from investment_portfolio.position_index import PositionIndex
+from prices.prices import PriceStore
+
+def synthetic(symbols: int, years: int, seed: int = 0) -> tuple:
+    """
+    This function creates the stories, with a trade per month, and the
+    daily prices, of the symbols
+    """
+    rng = np.random.default_rng(seed)
+    names = np.array([f"S{i:03d}3" for i in range(symbols)])
+    months = pd.date_range("2000-01-03", periods=12 * years, freq="MS")
+    n = len(months)
+    amount = rng.integers(1, 100, size=(symbols, n)).cumsum(axis=1)
+    value = rng.uniform(10, 5000, size=(symbols, n)).cumsum(axis=1)
+    df_story = pd.DataFrame({
+        "date": np.tile(months.strftime("%Y-%m-%d"), symbols),
+        "symbol": np.repeat(names, n),
+        "amount": amount.ravel(),
+        "value": value.ravel(),
+    })
+    days = pd.bdate_range("2000-01-03", periods=252 * years)
+    close = 30 * np.exp(
+        rng.normal(0, 0.02, size=(len(days), symbols)).cumsum(axis=0)
+    )
+    df_prices = pd.DataFrame({
+        "date": np.repeat(days.strftime("%Y-%m-%d"), symbols),
+        "symbol": np.tile(names, len(days)),
+        "close": close.ravel(),
+    })
+    return df_story, df_prices
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Measure the daily mark-to-market of the portfolio"
+    )
+    parser.add_argument("--symbols", type=int, default=300)
+    parser.add_argument("--years", type=int, default=20)
+    args = parser.parse_args()
+
+    df_story, df_prices = synthetic(args.symbols, args.years)
+    positions = PositionIndex(df_story)
+    with tempfile.TemporaryDirectory() as dir:
+        prices = PriceStore(dir + "/")
+        start = perf_counter()
+        prices.append(df_prices)
+        append_seconds = perf_counter() - start
+        start = perf_counter()
+        prices = PriceStore(dir + "/")
+        load_seconds = perf_counter() - start
+        start = perf_counter()
+        mtm = MarkToMarket(positions, prices)
+        totals = mtm.totals()
+        mtm_seconds = perf_counter() - start
+    print(
+        f"{args.symbols} symbols, {args.years} years, "
+        f"{len(prices)} days, {len(df_story)} story rows"
+    )
+    print(f"append prices:     {append_seconds:8.3f} s")
+    print(f"load prices:       {load_seconds:8.3f} s")
+    print(f"mark-to-market:    {mtm_seconds:8.3f} s")
+    print(f"last market value: {totals['market_value'].iloc[-1]:,.2f}")
@@ -0,0 +1,223 @@
+import argparse
+import io
+import json
+import subprocess
+import sys
+from contextlib import redirect_stdout
+from datetime import datetime
+from os.path import dirname, realpath
+from shutil import copytree
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+HOME = dirname(realpath(__file__))
+sys.path.append(HOME + "/../src")
+
+from synthetic import PageServer, generate
+from companies.companies import get_companies, read_companies
+from brokers.brokers import get_brokers
+from investment_portfolio.income import IncomeCube
+from investment_portfolio.investment_portfolio import InvestmentPortfolio
+from prices.prices import PriceStore
+from storage.storage import get_storage
+from utils.fetcher import HTTPFetcher
+from utils.instrumentation import RUN
+from utils.utils import read_trade_confirmation
+
+# Brokers, companies and trade confirmations of each scale
+SCALES = {
+    "small": (2, 20, 500),
+    "medium": (3, 100, 5000),
+    "large": (5, 400, 20000),
+}
+
+def timed(timings: dict, name: str, function, *args, **kwargs):
+    start = perf_counter()
+    result = function(*args, **kwargs)
+    timings[name] = round(perf_counter() - start, 6)
+    return result
+
+def pipeline(
+    root: str, backend: str, workers: int, interval: float, processes: int
+) -> dict:
+    """
+    This function runs every stage of the pipeline on a data folder, with
+    the pages served by a local stand-in of statusinvest. The trade
+    confirmations, the earnings and the investment portfolio are built from
+    scratch, and then again with their caches. The requests are spaced by
+    the interval, so it is zero to time the parsing alone
+    """
+    timings = {}
+    companies = read_companies(root + "/companies.json")
+    brokers = [broker["id"] for broker in get_brokers(root + "/brokers.json")]
+    symbols = [company["symbol"] for company in companies]
+    cache = root + "/cache/trade-confirmations.pickle"
+    for run in ["cold", "warm"]:
+        tcs = timed(
+            timings, f"read_trade_confirmation/{run}", read_trade_confirmation,
+            root + "/trade-confirmation/", cache, brokers=brokers,
+            symbols=symbols
+        )
+    server = PageServer(root)
+    try:
+        fetcher = HTTPFetcher(server.url, interval=interval)
+        for run in ["cold", "warm"]:
+            timed(
+                timings, f"get_companies/{run}", get_companies, companies,
+                root + "/earnings-history/", workers, fetcher
+            )
+        fetcher.close()
+    finally:
+        server.close()
+    prices = PriceStore(root + "/prices/")
+    timed(timings, "prices", prices.import_csv, [root + "/prices.csv"])
+    dir = root + "/investment-portfolio/"
+    stages = {}
+    for run in ["cold", "warm"]:
+        RUN.reset()
+        storage = get_storage(dir, backend)
+        timed(
+            timings, f"investment_portfolio/{run}", InvestmentPortfolio, dir,
+            tcs, storage, prices, processes
+        )
+        stages[run] = {
+            stage["stage"]: stage["duration"]
+                for stage in RUN.report()["stages"]
+        }
+    storage = get_storage(dir, backend)
+    timed(timings, "frontend/monthly_profits", storage.read, "monthly_profits")
+    timed(
+        timings, "frontend/profits", storage.read_many, "profits",
+        storage.symbols("profits")
+    )
+    timed(
+        timings, "frontend/income", lambda: IncomeCube(storage.read("income"))
+    )
+    timed(
+        timings, "frontend/consolidated_portfolio", storage.read,
+        "consolidated_portfolio"
+    )
+    for run in stages:
+        for stage, duration in stages[run].items():
+            timings[f"investment_portfolio/{run}/{stage}"] = duration
+    return timings
+
+def bench(
+    scale: str,
+    backend: str,
+    workers: int,
+    interval: float,
+    processes: int,
+    repeat: int,
+    seed: int
+) -> dict:
+    """
+    This function returns the best time of each stage at a scale, over
+    copies of the same data folder
+    """
+    brokers, companies, count = SCALES[scale]
+    best = {}
+    with TemporaryDirectory() as tmp:
+        generate(tmp + "/data", brokers, companies, count, seed)
+        for i in range(repeat):
+            root = copytree(tmp + "/data", f"{tmp}/run-{i}")
+            for name, seconds in pipeline(
+                root, backend, workers, interval, processes
+            ).items():
+                best[name] = min(best.get(name, seconds), seconds)
+    return {
+        "brokers": brokers,
+        "companies": companies,
+        "trade_confirmations": count,
+        "timings": best
+    }
+
+def commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=HOME,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+def compare(old: dict, new: dict) -> None:
+    print(
+        f"{'scale':<8}{'stage':<60}{'old s':>10}{'new s':>10}{'ratio':>8}"
+    )
+    for scale in new["scales"]:
+        if not scale in old["scales"]:
+            continue
+        before = old["scales"][scale]["timings"]
+        after = new["scales"][scale]["timings"]
+        for name in after:
+            if not name in before:
+                continue
+            ratio = after[name] / before[name] if before[name] else 0.0
+            print(
+                f"{scale:<8}{name:<60}{before[name]:>10.4f}"
+                f"{after[name]:>10.4f}{ratio:>8.2f}"
+            )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Time every stage of the pipeline on synthetic data"
+    )
+    parser.add_argument(
+        "--scales", nargs="*", choices=list(SCALES), default=["small"]
+    )
+    parser.add_argument(
+        "--storage", choices=["csv", "sqlite"], default="csv"
+    )
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=0.0,
+        help="seconds between the requests to the local pages"
+    )
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=1,
+        help="processes that write the files of the symbols"
+    )
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--output", help="JSON file where the timings are written"
+    )
+    parser.add_argument(
+        "--compare", help="JSON file of a previous run to compare with"
+    )
+    parser.add_argument(
+        "--verbose", action="store_true", help="show the logs of the stages"
+    )
+    args = parser.parse_args()
+
+    results = {
+        "commit": commit(),
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "storage": args.storage,
+        "scales": {}
+    }
+    for scale in args.scales:
+        log = sys.stdout if args.verbose else io.StringIO()
+        with redirect_stdout(log):
+            results["scales"][scale] = bench(
+                scale, args.storage, args.workers, args.interval,
+                args.processes, args.repeat, args.seed
+            )
+        sizes = results["scales"][scale]
+        print(
+            f"{scale}: {sizes['trade_confirmations']} trade confirmations "
+            f"of {sizes['companies']} companies"
+        )
+        for name, seconds in results["scales"][scale]["timings"].items():
+            print(f"  {name:<60}{seconds:>10.4f} s")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), results)
@@ -0,0 +1,94 @@
+import argparse
+import sys
+import tracemalloc
+from os import listdir
+from os.path import dirname, join, realpath
+from tempfile import TemporaryDirectory
+from timeit import repeat
+
+HOME = dirname(realpath(__file__))
+sys.path.append(HOME + "/../src")
+
+import numpy as np
+from bs4 import BeautifulSoup
+from synthetic import page as synthetic_page
+from utils.statusinvest import (
+    find_bonus,
+    find_bonus_bs,
+    find_earnings,
+    find_earnings_bs
+)
+
+# Number of dividends of the synthetic pages, from a small page to a large one
+DIVIDENDS = [10, 40, 160, 640]
+
+def streaming(page: bytes) -> None:
+    html = page.decode("utf-8")
+    find_earnings(html)
+    find_bonus(html)
+
+def beautifulsoup(page: bytes) -> None:
+    bs = BeautifulSoup(page, "html.parser")
+    find_earnings_bs(bs)
+    find_bonus_bs(bs)
+
+def write_pages(dir: str, seed: int) -> None:
+    """
+    This function writes a synthetic page of each size of DIVIDENDS
+    """
+    rng = np.random.default_rng(seed)
+    for dividends in DIVIDENDS:
+        file = join(dir, f"SYN{dividends:04d}.html")
+        with open(file, "w", encoding="utf-8") as f:
+            f.write(synthetic_page("SYN3", rng, dividends))
+
+def compare(dir: str, number: int) -> None:
+    """
+    This function prints the time and memory of both extractors on each
+    page of the folder
+    """
+    print(
+        f"{'page':<16}{'KiB':>8}{'stream ms':>12}{'stream KiB':>12}"
+        f"{'bs4 ms':>10}{'bs4 KiB':>10}{'speedup':>9}"
+    )
+    for file in sorted(listdir(dir)):
+        with open(join(dir, file), "rb") as f:
+            page = f.read()
+        stream_ms, stream_kib = measure(streaming, page, number)
+        bs_ms, bs_kib = measure(beautifulsoup, page, number)
+        print(
+            f"{file:<16}{len(page) / 1024:>8.0f}{stream_ms:>12.2f}"
+            f"{stream_kib:>12.0f}{bs_ms:>10.2f}{bs_kib:>10.0f}"
+            f"{bs_ms / stream_ms:>8.1f}x"
+        )
+
+def measure(function, page: bytes, number: int) -> tuple:
+    """
+    This function returns the best time of a parse, in milliseconds, and its
+    peak memory, in KiB
+    """
+    seconds = min(repeat(lambda: function(page), number=number, repeat=3))
+    tracemalloc.start()
+    function(page)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return seconds / number * 1000, peak / 1024
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare the statusinvest extractors on saved pages"
+    )
+    parser.add_argument(
+        "--dir", default=None,
+        help="folder of saved pages, synthetic pages when not given"
+    )
+    parser.add_argument("--number", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.dir is None:
+        with TemporaryDirectory() as tmp:
+            write_pages(tmp, args.seed)
+            compare(tmp, args.number)
+    else:
+        compare(args.dir, args.number)
@@ -0,0 +1,213 @@
+import argparse
+import json
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from os import makedirs
+from os.path import dirname, exists, realpath
+
+HOME = dirname(realpath(__file__))
+sys.path.append(HOME + "/../src")
+
+import numpy as np
+import pandas as pd
+from utils.dividends import TAXED_EARNINGS, UNTAXED_EARNINGS
+from utils.statusinvest import BONUS_ROW_CLASS
+
+EARNING_TYPES = TAXED_EARNINGS + UNTAXED_EARNINGS
+
+def symbols_of(companies: int) -> list:
+    """
+    This function names the symbols of the companies
+    """
+    return [f"S{i:04d}3" for i in range(companies)]
+
+def trade_confirmations(
+    brokers: list, symbols: list, count: int, rng: np.random.Generator
+) -> list:
+    """
+    This function creates the papers of the trade confirmations, with one
+    to four operations each. The sales never exceed the amount held, and
+    the values match the prices and the fees, so every paper is valid
+    """
+    days = pd.bdate_range("2010-01-04", "2023-12-29")
+    dates = np.sort(rng.choice(len(days), size=count))
+    held = dict.fromkeys(symbols, 0)
+    papers = []
+    for day in dates:
+        operations = []
+        for symbol in rng.choice(symbols, size=rng.integers(1, 5)):
+            if any(o["symbol"] == symbol for o in operations):
+                continue
+            amount = int(rng.integers(1, 200))
+            if held[symbol] > 0 and rng.random() < 0.2:
+                amount = -int(rng.integers(1, held[symbol] + 1))
+            held[symbol] += amount
+            price = int(rng.integers(100, 10000))
+            operations.append({
+                "symbol": str(symbol), "amount": amount,
+                "price": price / 100, "value": price * amount / 100
+            })
+        fees = {
+            "liquidacao": int(rng.integers(1, 500)) / 100,
+            "emolumentos": int(rng.integers(1, 100)) / 100
+        }
+        cents = sum(round(o["value"] * 100) for o in operations)
+        fees_cents = sum(round(v * 100) for v in fees.values())
+        if cents == 0:
+            operations[0]["amount"] += 1
+            operations[0]["value"] = round(
+                operations[0]["price"] * operations[0]["amount"], 2
+            )
+            held[operations[0]["symbol"]] += 1
+            cents = sum(round(o["value"] * 100) for o in operations)
+        papers.append({
+            "broker": str(rng.choice(brokers)),
+            "date": days[day].strftime("%Y-%m-%d"),
+            "operations_value": cents / 100,
+            "settlement_amount": (cents + fees_cents) / 100,
+            "fees": fees,
+            "operations": operations
+        })
+    return papers
+
+def prices(symbols: list, rng: np.random.Generator) -> pd.DataFrame:
+    """
+    This function creates the weekly closing prices of the symbols, as a
+    random walk
+    """
+    dates = pd.date_range("2010-01-08", "2023-12-29", freq="W-FRI")
+    steps = rng.normal(0, 0.03, size=(len(dates), len(symbols)))
+    close = np.round(rng.uniform(5, 80, len(symbols)) * np.exp(
+        steps.cumsum(axis=0)
+    ), 2)
+    return pd.DataFrame({
+        "date": np.repeat(dates.strftime("%Y-%m-%d"), len(symbols)),
+        "symbol": np.tile(symbols, len(dates)),
+        "close": close.ravel()
+    })
+
+def page(symbol: str, rng: np.random.Generator, dividends: int = 40) -> str:
+    """
+    This function creates a statusinvest page of the symbol, with the
+    earning section and the bonus card
+    """
+    rows = []
+    for k in range(dividends):
+        year = 2010 + k // 3
+        month = 1 + 4 * (k % 3)
+        rows.append({
+            "ed": f"15/{month:02d}/{year}",
+            "pd": f"10/{month + 1:02d}/{year}",
+            "v": round(float(rng.uniform(0.01, 2)), 8),
+            "et": str(rng.choice(EARNING_TYPES))
+        })
+    bonus = ""
+    for k in range(int(rng.integers(0, 3))):
+        year = 2012 + 4 * k + int(rng.integers(0, 4))
+        cells = [
+            "Bonificação", "ON", f"20/06/{year}", f"21/06/{year}", "-",
+            f"R$ {rng.integers(1, 30)},{rng.integers(10, 99)}",
+            f"{rng.choice([5, 10, 20])},00%", f" {symbol} "
+        ]
+        bonus += f'<div class="{BONUS_ROW_CLASS}">' + "".join(
+            f"<div><strong>{cell}</strong></div>" for cell in cells
+        ) + "</div>"
+    value = json.dumps(rows).replace("'", "&#39;")
+    filler = "".join(
+        f"<div class='row'><span>{symbol} {i}</span><p>Lorem ipsum</p></div>"
+            for i in range(200)
+    )
+    return (
+        f"<html><head><title>{symbol}</title></head><body>{filler}"
+        "<div id='earning-section'><div>"
+        f"<input type='hidden' id='results' value='{value}'>"
+        "</div></div>"
+        "<div class='card'><div class='card-header'><h3>BONIFICAÇÃO</h3>"
+        f"</div><div class='card-body'><div>{bonus}</div></div></div>"
+        f"{filler}</body></html>"
+    )
+
+def generate(
+    dir: str,
+    brokers: int = 3,
+    companies: int = 50,
+    count: int = 1000,
+    seed: int = 0
+) -> None:
+    """
+    This function creates a data folder with the brokers, the companies,
+    the trade confirmations, the prices and the statusinvest pages of the
+    companies. The same arguments always create the same files
+    """
+    rng = np.random.default_rng(seed)
+    brokers = [f"broker{i}" for i in range(brokers)]
+    symbols = symbols_of(companies)
+    for folder in ["trade-confirmation", "earnings-history", "pages"]:
+        makedirs(f"{dir}/{folder}", exist_ok=True)
+    with open(f"{dir}/brokers.json", "w") as f:
+        json.dump([{"id": broker} for broker in brokers], f)
+    with open(f"{dir}/companies.json", "w") as f:
+        json.dump([{"symbol": symbol} for symbol in symbols], f)
+    papers = trade_confirmations(brokers, symbols, count, rng)
+    for i, paper in enumerate(papers):
+        name = (
+            f"trade-confirmation-{paper['broker']}-"
+            f"{paper['date'].replace('-', '')}-{i}.json"
+        )
+        with open(f"{dir}/trade-confirmation/{name}", "w") as f:
+            json.dump(paper, f)
+    prices(symbols, rng).to_csv(f"{dir}/prices.csv", sep=";", index=False)
+    for symbol in symbols:
+        with open(f"{dir}/pages/{symbol}.html", "w") as f:
+            f.write(page(symbol, rng))
+
+class PageServer:
+    """
+    This class serves the pages of a data folder as a local stand-in of
+    statusinvest, at /acoes/<symbol>
+    """
+    def __init__(self, dir: str) -> None:
+        pages = dir + "/pages/"
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self) -> None:
+                file = pages + self.path.rsplit("/", 1)[-1] + ".html"
+                if exists(file):
+                    with open(file, "rb") as f:
+                        body = f.read()
+                    self.send_response(200)
+                else:
+                    body = b"Not found"
+                    self.send_response(404)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args) -> None:
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/acoes/"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Create a synthetic data folder"
+    )
+    parser.add_argument("dir")
+    parser.add_argument("--brokers", type=int, default=3)
+    parser.add_argument("--companies", type=int, default=50)
+    parser.add_argument("--trade-confirmations", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    generate(
+        args.dir, args.brokers, args.companies, args.trade_confirmations,
+        args.seed
+    )
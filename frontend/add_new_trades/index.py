@@ -1,16 +1,21 @@
 import json
+import time
 from typing import Dict
 import numpy as np
 
 import pandas as pd
 import streamlit as st
-from os.path import dirname, realpath
+from os import listdir, replace
+from os.path import basename, dirname, exists, realpath
 from st_aggrid import GridOptionsBuilder, AgGrid, GridUpdateMode
 
 HOME = dirname(realpath(__file__))
 COMPANIES_FILE = HOME + "/../../data/companies.json"
 BROKERS_FILE = HOME + "/../../data/brokers.json"
 TC_DIR = HOME + "/../../data/trade-confirmation/"
+IP_DIR = HOME + "/../../data/investment-portfolio/"
+# Seconds the upload waits for the watch mode of src/main.py to apply it
+APPLY_TIMEOUT = 2
 
 def can_eval(dic: str) -> bool:
     try:
@@ -46,6 +51,36 @@ def get_operations() -> pd.DataFrame:
         "value": []
     })
 
+def is_applied(filename: str) -> bool:
+    """
+    This function checks if the trade confirmation is in the ledgers and
+    no view has symbols pending
+    """
+    manifest_file = IP_DIR + "manifest.json"
+    if not exists(manifest_file):
+        return False
+    with open(manifest_file) as f:
+        if not basename(filename) in json.load(f):
+            return False
+    pending = IP_DIR + "pending/"
+    for file in listdir(pending) if exists(pending) else []:
+        with open(pending + file) as f:
+            if json.load(f):
+                return False
+    return True
+
+def wait_applied(filename: str) -> bool:
+    deadline = time.time() + APPLY_TIMEOUT
+    while time.time() < deadline:
+        try:
+            if is_applied(filename):
+                return True
+        except (OSError, ValueError):
+            # The files are being written
+            pass
+        time.sleep(0.1)
+    return False
+
 def add_new_trades_view():
     st.title("Add new trades")
     st.caption("Here you can add a new trade confirmation")
@@ -173,9 +208,21 @@ def add_new_trades_view():
                     + f"trade-confirmation-{broker}-{date.strftime('%Y%m%d')}"
                     + ".json"
             )
-            with open(filename, 'w') as fp:
+            # The file is renamed once written, so the watch mode never
+            # reads it half-written
+            with open(filename + ".tmp", 'w') as fp:
                 json.dump(
                     trade_confirmation,
                     fp
                 )
+            replace(filename + ".tmp", filename)
             st.success(f"Your trade confirmation has been saved in {filename}")
+            with st.spinner("Applying the trade confirmation"):
+                applied = wait_applied(filename)
+            if applied:
+                st.success("Your trade confirmation is in the portfolio")
+            else:
+                st.info(
+                    "Your trade confirmation will be in the portfolio when "
+                    "src/main.py runs, or at once with src/main.py --watch"
+                )
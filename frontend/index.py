@@ -1,5 +1,10 @@
+import sys
 import streamlit as st
+from os.path import dirname, realpath
 from streamlit_option_menu import option_menu
+
+# The pages read the investment portfolio through the modules in src
+sys.path.append(dirname(realpath(__file__)) + "/../src")
 from my_story.index import my_story_view
 from new_intake.index import new_intake_view
 from add_new_trades.index import add_new_trades_view
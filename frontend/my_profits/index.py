@@ -1,5 +1,48 @@
+import numpy as np
 import streamlit as st
+from streamlit_echarts import st_echarts
+from storage.storage import get_storage
 from os.path import dirname, realpath
 
+HOME = dirname(realpath(__file__))
+IP_DIR = HOME + "/../../data/investment-portfolio/"
+
 def my_profits_view():
-    st.write("My profits")
\ No newline at end of file
+    st.title("My profits")
+    st.caption("The realized profits of your sales, by month")
+
+    storage = get_storage(IP_DIR)
+    if not storage.exists("monthly_profits"):
+        st.write("There are no sales yet")
+        return
+    df_m = storage.read("monthly_profits")
+    df_s = storage.read_many("profits", storage.symbols("profits"))
+    df_s = df_s.loc[df_s["realized"] != 0]
+
+    c1, c2, c3 = st.columns(3)
+    c1.metric("Realized", f"R$ {df_m['realized'].sum():,.2f}")
+    c2.metric("Sales", f"R$ {df_m['sales'].sum():,.2f}")
+    c3.metric("Tax", f"R$ {df_m['tax'].sum():,.2f}")
+
+    # Print the realized profit of each month
+    bar_chart_options = {
+        "tooltip": {"trigger": "axis"},
+        "xAxis": {"type": "category", "data": list(df_m["month"])},
+        "yAxis": {"type": "value"},
+        "series": [{
+            "type": "bar",
+            "data": [round(v, 2) for v in df_m["realized"]],
+        }]
+    }
+    st_echarts(options=bar_chart_options)
+
+    st.text("Months")
+    st.dataframe(df_m.round(2), use_container_width=True)
+
+    st.text("Sales")
+    df_s = df_s[[
+        "date", "symbol", "amount", "sale_value", "avg_price", "sold_cost",
+        "realized"
+    ]].sort_values("date", ascending=False)
+    df_s["amount"] = np.abs(df_s["amount"])
+    st.dataframe(df_s.round(2), use_container_width=True)
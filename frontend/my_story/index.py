@@ -1,5 +1,49 @@
 import streamlit as st
+from streamlit_echarts import st_echarts
+from investment_portfolio.income import IncomeCube
+from storage.storage import get_storage
 from os.path import dirname, realpath
 
+HOME = dirname(realpath(__file__))
+IP_DIR = HOME + "/../../data/investment-portfolio/"
+
 def my_story_view():
-    st.write("My story")
\ No newline at end of file
+    st.title("My story")
+    st.caption("The earnings received, by month and type")
+
+    storage = get_storage(IP_DIR)
+    if not storage.exists("income"):
+        st.write("There are no earnings yet")
+        return
+    cube = IncomeCube(storage.read("income"))
+
+    c1, c2 = st.columns(2)
+    symbol = c1.selectbox("Symbol", ["All"] + cube.symbols)
+    symbol = None if symbol == "All" else symbol
+    type = c2.selectbox("Type", ["All"] + cube.types)
+    type = None if type == "All" else type
+
+    total = cube.total(symbol=symbol, type=type)
+    c1, c2, c3 = st.columns(3)
+    c1.metric("Gross", f"R$ {total['gross']:,.2f}")
+    c2.metric("Net", f"R$ {total['net']:,.2f}")
+    c3.metric("Yield on cost", f"{100 * total['yield_on_cost']:.2f}%")
+
+    # Print the net earnings of each month
+    df_m = cube.series("month", symbol=symbol, type=type)
+    bar_chart_options = {
+        "tooltip": {"trigger": "axis"},
+        "xAxis": {"type": "category", "data": list(df_m["month"])},
+        "yAxis": {"type": "value"},
+        "series": [{
+            "type": "bar",
+            "data": [round(v, 2) for v in df_m["net"]],
+        }]
+    }
+    st_echarts(options=bar_chart_options)
+
+    st.text("Years")
+    st.dataframe(
+        cube.series("year", symbol=symbol, type=type).round(4),
+        use_container_width=True
+    )
@@ -1,24 +1,37 @@
 import streamlit as st
 from st_aggrid import AgGrid, GridOptionsBuilder
-import pandas as pd
 import numpy as np
-import yfinance as yf
+from os import environ
 from streamlit_echarts import st_echarts
+from prices.prices import PriceStore
+from prices.quotes import LocalQuoteProvider, QuoteCache, YahooQuoteProvider
+from storage.storage import get_storage
 
 from streamlit_option_menu import option_menu
 from os.path import dirname, realpath
 
+HOME = dirname(realpath(__file__))
+QUOTES_FILE = HOME + "/../../data/cache/quotes.json"
+PRICES_DIR = HOME + "/../../data/prices/"
+
+@st.cache(allow_output_mutation=True)
+def get_quote_cache() -> QuoteCache:
+    """
+    This function creates the quote cache shared by all the sessions. The
+    quotes come from the local price history when QUOTE_PROVIDER is local
+    """
+    if environ.get("QUOTE_PROVIDER") == "local":
+        return QuoteCache(LocalQuoteProvider(PriceStore(PRICES_DIR)))
+    return QuoteCache(
+        YahooQuoteProvider(), QUOTES_FILE, stale_while_revalidate=True
+    )
 
 def new_intake_view():
-    HOME = dirname(realpath(__file__))
-
-    @st.cache(allow_output_mutation=True)
     def get_portfolio():
-        df_ = pd.read_csv(HOME + '/../../data/investment-portfolio/consolidated_portfolio.csv', sep=';')
-        for ticker in df_["symbol"]:
-            ticker_ = yf.Ticker(ticker + ".SA")
-            summary = ticker_.history(period="1d")
-            df_.loc[(df_["symbol"] == ticker), "curr_price"] = float(summary.iloc[0]["Close"])
+        storage = get_storage(HOME + '/../../data/investment-portfolio/')
+        df_ = storage.read("consolidated_portfolio")
+        quotes = get_quote_cache().get(list(df_["symbol"]))
+        df_["curr_price"] = df_["symbol"].map(quotes).astype(float)
         df_ = df_[["symbol", "amount", "avg_price", "investment", "perc", "curr_price"]]
         df_["avg_price"] = np.round(df_["avg_price"], 2)
         df_["investment"] = np.round(df_["investment"], 2)
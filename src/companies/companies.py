@@ -1,40 +1,37 @@
 import json
 from typing import Dict
-from utils.dividends import download_bonus, download_dividends
+from utils.dividends import WORKERS, refresh_earnings
+from utils.fetcher import HTTPFetcher
+
+def read_companies(file: str) -> Dict:
+    print(f"[COMPANIES] I am reading the companies from {file}")
+    f = open(file)
+    companies = json.load(f)
+    f.close()
+    return companies
 
 def get_companies(
-        file: str,
-        trade_confirmations: Dict,
+        companies: Dict,
         dir_earnings: str,
+        workers: int = WORKERS,
+        fetcher: HTTPFetcher = None,
+        limit: int = None
     ) -> Dict:
     """
-    This function reads the file of companies
+    This function downloads the earnings of the companies that are due in
+    the refresh schedule, up to the limit. The fetcher may point to another
+    site, such as a local copy of the pages. The symbols of the trade
+    confirmations are validated with the others, when they are read
     """
-    print(f"[COMPANIES] I am reading the companies from {file}")
-    f = open(file)
-    companies = json.load(f)
-    f.close()
-    # Validate companies
-    for date in trade_confirmations:
-        for tc in trade_confirmations[date]:
-            companies_ = [
-                operation["symbol"]
-                    for operation in tc.operations
-            ]
-            validate_companies(companies, companies_)
     # Download earnings and actions
-    for c in companies:
-        print(f"[COMPANIES] I am getting earnings from {c['symbol']}")
-        download_dividends(c["symbol"], dir_earnings)
-        download_bonus(c["symbol"], dir_earnings)
+    print(f"[COMPANIES] I am getting earnings from {len(companies)} companies")
+    summary = refresh_earnings(
+        [c["symbol"] for c in companies], dir_earnings, workers, fetcher,
+        limit
+    )
+    for status in summary:
+        print(
+            f"[COMPANIES] {status}: {len(summary[status])} "
+            f"{' '.join(summary[status])}"
+        )
     return companies
-
-def validate_companies(companies: Dict, tc_companies: list
-) -> None:
-    list_companies = [company["symbol"] for company in companies]
-    for company in tc_companies:
-        if not company in list_companies:
-            raise ValueError(
-                f"The company {company} does not exist in "\
-                " companies.json. Please, add this company."
-            )
@@ -0,0 +1,277 @@
+import hashlib
+from bisect import bisect_left
+from os.path import exists
+from typing import Dict, List
+import numpy as np
+import pandas as pd
+from investment_portfolio.profits import track_lots
+from utils.money import from_cents, to_cents_array
+
+# bonus: ratio new shares for each share held, at value each
+# split: each share becomes ratio shares (less than 1 in a reverse split)
+# rename: the position moves to new_symbol
+ACTION_COLUMNS = ["symbol", "type", "ex_date", "ratio", "value", "new_symbol"]
+# The split factors are floats, so the amounts adjusted by them are whole
+# shares up to this error
+AMOUNT_TOLERANCE = 1e-6
+
+def action_files(dir: str, symbol: str) -> List[str]:
+    """
+    This function lists the files with the corporate actions of a symbol:
+    the downloaded bonus and the splits and renames written by hand
+    """
+    return [
+        file for file in [
+            dir + "bonus-" + symbol + ".csv",
+            dir + "actions-" + symbol + ".csv"
+        ] if exists(file)
+    ]
+
+def action_hashes(dir: str, symbols: List[str]) -> Dict[str, str]:
+    """
+    This function calculates the content hash of the corporate action files
+    of each symbol, so its views are only recalculated when they change
+    """
+    hashes = {}
+    for symbol in symbols:
+        files = action_files(dir, symbol)
+        if not files:
+            continue
+        sha = hashlib.sha256()
+        for file in files:
+            with open(file, "rb") as f:
+                sha.update(f.read())
+        hashes[symbol] = sha.hexdigest()
+    return hashes
+
+def linked_symbols(entries: Dict, symbols: set) -> set:
+    """
+    This function adds to the symbols the ones linked to them by corporate
+    actions, in both ways: the operations of a symbol become operations of
+    the symbols its actions give shares of, so they are adjusted together
+    """
+    links = {}
+    for c, entry in entries.items():
+        for new_symbol in entry["symbols"]:
+            links.setdefault(c, set()).add(new_symbol)
+            links.setdefault(new_symbol, set()).add(c)
+    linked = set(symbols)
+    queue = list(linked)
+    while queue:
+        for c in links.get(queue.pop(), ()):
+            if not c in linked:
+                linked.add(c)
+                queue.append(c)
+    return linked
+
+def read_csv(file: str) -> pd.DataFrame:
+    if not exists(file):
+        return pd.DataFrame({})
+    try:
+        return pd.read_csv(file, sep=";", float_precision="round_trip")
+    except pd.errors.EmptyDataError:
+        return pd.DataFrame({})
+
+def read_actions(dir: str, symbols: List[str]) -> pd.DataFrame:
+    """
+    This function reads the corporate actions of the symbols. The bonus come
+    from the bonus files, with the proportion in percent, and the splits
+    and renames from the actions files, with type, ex_date, ratio and
+    new_symbol columns
+    """
+    actions = []
+    for symbol in symbols:
+        df = read_csv(dir + "bonus-" + symbol + ".csv")
+        if not df.empty:
+            actions.append(pd.DataFrame({
+                "symbol": symbol,
+                "type": "bonus",
+                "ex_date": df["ex_date"],
+                "ratio": df["proportion"] / 100,
+                "value": df["value"],
+                "new_symbol": df["new_ticker"].fillna(symbol).astype(str)
+            }))
+        df = read_csv(dir + "actions-" + symbol + ".csv")
+        if not df.empty:
+            df = df.assign(symbol=symbol)
+            if not "value" in df:
+                df["value"] = 0.0
+            if not "ratio" in df:
+                df["ratio"] = 1.0
+            if not "new_symbol" in df:
+                df["new_symbol"] = symbol
+            df["new_symbol"] = df["new_symbol"].fillna(symbol).astype(str)
+            actions.append(df[ACTION_COLUMNS])
+    if not actions:
+        return pd.DataFrame(columns=ACTION_COLUMNS)
+    df = pd.concat(actions, ignore_index=True)
+    unknown = ~df["type"].isin(["bonus", "split", "rename"])
+    if unknown.any():
+        raise ValueError(
+            "[CORPORATE ACTIONS] Action type not definied "
+            f"{df['type'][unknown].iloc[0]}"
+        )
+    df["ex_date"] = pd.to_datetime(df["ex_date"], format="%Y-%m-%d")
+    return df.sort_values(["ex_date", "symbol"], kind="stable") \
+        .reset_index(drop=True)
+
+def action_tc_names(actions: pd.DataFrame) -> List[str]:
+    """
+    This function names the records of the corporate actions, as the trade
+    confirmations of their operations
+    """
+    return [
+        f"corporate-action-{t}-{c}-{d.strftime('%Y-%m-%d')}"
+            for c, t, d in zip(
+                actions["symbol"], actions["type"], actions["ex_date"]
+            )
+    ]
+
+def split_factors(
+    symbols: np.ndarray, dates: np.ndarray, actions: pd.DataFrame
+) -> np.ndarray:
+    """
+    This function calculates the factor of the amounts traded by the symbol
+    on each date: the product of the ratios of its later splits
+    """
+    factors = np.ones(len(symbols))
+    splits = actions.loc[actions["type"] == "split"]
+    for c, df_c in splits.groupby("symbol"):
+        days = df_c["ex_date"].to_numpy(dtype="datetime64[D]")
+        ratios = df_c["ratio"].to_numpy(dtype=np.float64)
+        after = np.append(np.cumprod(ratios[::-1])[::-1], 1.0)
+        mask = symbols == c
+        days_mask = dates[mask].astype("datetime64[D]")
+        factors[mask] = after[np.searchsorted(days, days_mask, "right")]
+    return factors
+
+def whole_amounts(amounts: np.ndarray) -> np.ndarray:
+    """
+    This function returns the amounts as integers when all of them are whole
+    shares, up to AMOUNT_TOLERANCE, or as they are when a split left
+    fractions of shares
+    """
+    whole = np.round(amounts)
+    if np.all(np.abs(amounts - whole) <= AMOUNT_TOLERANCE):
+        return whole.astype(np.int64)
+    return amounts
+
+def action_operation(
+    date: np.datetime64,
+    symbol: str,
+    amount: float,
+    value: int,
+    tc_name: str
+) -> Dict:
+    """
+    This function creates the operation of a corporate action. The value is
+    in cents
+    """
+    price = from_cents(value) / amount if amount else 0.0
+    return {
+        "date": date, "symbol": symbol, "amount": amount, "price": price,
+        "value": value, "cost_of_fees": 0,
+        # The shares that leave by a rename are not sold
+        "value_without_fees": value if amount > 0 else 0,
+        "price_without_fees": price, "tc_name": tc_name
+    }
+
+def apply_actions(
+    operations: pd.DataFrame, actions: pd.DataFrame
+) -> pd.DataFrame:
+    """
+    This function applies the corporate actions to the operations. The
+    amounts and prices before a split are adjusted to the shares after it,
+    and the bonus shares and renames become operations on their ex_date.
+    The amounts held before the actions come from the accumulated amounts
+    of each symbol and of the operations already added, so only the actions
+    are gone through one by one
+    """
+    if actions.empty:
+        return operations
+    symbols = operations["symbol"].astype(str).to_numpy()
+    dates = operations["date"].to_numpy()
+    factors = split_factors(symbols, dates, actions)
+    operations = operations.assign(
+        amount=operations["amount"] * factors,
+        price=operations["price"] / factors,
+        price_without_fees=operations["price_without_fees"] / factors
+    )
+    amounts = operations["amount"].to_numpy(dtype=np.float64)
+    accumulated = {}
+    for c in actions["symbol"].unique():
+        rows = np.flatnonzero(symbols == c)
+        rows = rows[np.argsort(dates[rows], kind="stable")]
+        accumulated[c] = (dates[rows], np.cumsum(amounts[rows]))
+    added = []
+    # The dates, accumulated amounts and rows of the operations added to
+    # each symbol, in the order of the actions
+    added_by_symbol = {}
+    names = action_tc_names(actions)
+    # The factors of the shares on the ex_date, before and after the action
+    old_factors = split_factors(
+        actions["symbol"].to_numpy(dtype=object).astype(str),
+        actions["ex_date"].to_numpy(),
+        actions
+    )
+    new_factors = split_factors(
+        actions["new_symbol"].to_numpy(dtype=object).astype(str),
+        actions["ex_date"].to_numpy(),
+        actions
+    )
+    for action, name, old_factor, new_factor in zip(
+        actions.itertuples(index=False), names, old_factors, new_factors
+    ):
+        date = np.datetime64(action.ex_date)
+        days, held = accumulated.get(action.symbol, ([], []))
+        i = np.searchsorted(days, date, "left")
+        amount = held[i - 1] if i > 0 else 0.0
+        added_days, added_held, added_rows = added_by_symbol.get(
+            action.symbol, ([], [], [])
+        )
+        j = bisect_left(added_days, date)
+        if j > 0:
+            amount += added_held[j - 1]
+        new_rows = []
+        if action.type == "bonus" and amount > 0:
+            # The fractions of shares are not received
+            bonus = np.floor(
+                amount / old_factor * action.ratio + AMOUNT_TOLERANCE
+            )
+            if bonus > 0:
+                new_rows.append(action_operation(
+                    date, action.new_symbol, bonus * new_factor,
+                    int(to_cents_array(bonus * action.value)), name + "-1"
+                ))
+        elif action.type == "rename" and abs(amount) > AMOUNT_TOLERANCE:
+            # The position moves at its average cost, without a profit
+            df = pd.concat([
+                operations.loc[(symbols == action.symbol) & (dates < date)],
+                pd.DataFrame(added_rows[:j])
+            ]).sort_values(["date", "tc_name"], kind="stable")
+            cost = int(np.rint(track_lots(df)["cost"].iloc[-1]))
+            new_rows.append(action_operation(
+                date, action.symbol, -amount, -cost, name + "-1"
+            ))
+            new_rows.append(action_operation(
+                date, action.new_symbol, amount / old_factor * new_factor,
+                cost, name + "-2"
+            ))
+        for row in new_rows:
+            added_days, added_held, added_rows = added_by_symbol.setdefault(
+                row["symbol"], ([], [], [])
+            )
+            added_days.append(row["date"])
+            added_held.append(
+                (added_held[-1] if added_held else 0.0) + row["amount"]
+            )
+            added_rows.append(row)
+        added += new_rows
+    if added:
+        added = pd.DataFrame(added)
+        added["date"] = pd.to_datetime(added["date"])
+        operations = pd.concat([operations, added], ignore_index=True)
+    operations["amount"] = whole_amounts(
+        operations["amount"].to_numpy(dtype=np.float64)
+    )
+    return operations
@@ -0,0 +1,161 @@
+from itertools import product
+from typing import Dict, List
+import numpy as np
+import pandas as pd
+from utils.dividends import INCOME_TAX, TAXED_EARNINGS
+
+INCOME_COLUMNS = ["symbol", "month", "type", "gross", "net", "cost"]
+MEASURES = ["gross", "net"]
+
+def income_rows(df_dividend_story: pd.DataFrame) -> pd.DataFrame:
+    """
+    This function sums the earnings received of each symbol, payment month
+    and earning type. The cost is the cost basis of the position held at
+    the last payment of the symbol in the month, so it is not summed
+    """
+    df = df_dividend_story.loc[df_dividend_story["amount"].notna()]
+    df = df.loc[df["amount"] > 0].sort_values("payment_day", kind="stable")
+    net = df["dividend_received"].to_numpy(dtype=np.float64)
+    df = pd.DataFrame({
+        "symbol": df["symbol"].to_numpy(),
+        "month": df["payment_day"].astype(str).str[:7].to_numpy(),
+        "type": df["type"].to_numpy(),
+        "gross": np.where(
+            df["type"].isin(TAXED_EARNINGS), net / (1 - INCOME_TAX), net
+        ),
+        "net": net,
+        "cost": df["cost"].to_numpy(dtype=np.float64),
+    })
+    df["cost"] = df.groupby(["symbol", "month"])["cost"].transform("last")
+    return df.groupby(["symbol", "month", "type"], as_index=False).agg(
+        gross=("gross", "sum"), net=("net", "sum"), cost=("cost", "last")
+    )[INCOME_COLUMNS]
+
+def update_income(
+    df_prev: pd.DataFrame, df: pd.DataFrame, symbols: List[str]
+) -> pd.DataFrame:
+    """
+    This function replaces the income of the symbols in the previous one
+    """
+    if df_prev is not None:
+        df_prev = df_prev.loc[~df_prev["symbol"].isin(symbols)]
+        df = pd.concat([df_prev, df], ignore_index=True)
+    return df.sort_values(
+        ["symbol", "month", "type"], kind="stable"
+    ).reset_index(drop=True)[INCOME_COLUMNS]
+
+def last_cost(
+    cost: np.ndarray, last: np.ndarray, axes: tuple
+) -> np.ndarray:
+    """
+    This function reduces the cost basis over the free axes. The periods
+    and types keep the cost of the last month, since a cost basis is held
+    and not received, and only the symbols are summed
+    """
+    for axis in axes:
+        if axis == 0:
+            continue
+        rows = np.expand_dims(last.argmax(axis=axis), axis)
+        cost = np.take_along_axis(cost, rows, axis)
+        last = np.take_along_axis(last, rows, axis)
+    return cost.sum(axis=0, keepdims=True) if 0 in axes else cost
+
+class IncomeCube:
+    """
+    This class keeps the income as dense arrays of symbols by periods by
+    types, by month and by year. The totals of every combination of fixed
+    and free axes are summed once, so any slice is a single lookup. The
+    cost basis of a slice is the one of each symbol at its last month in
+    the slice, summed over the symbols, and the yield on cost is the net
+    income of the slice over it
+    """
+    def __init__(self, df_income: pd.DataFrame) -> None:
+        self.symbols = sorted(df_income["symbol"].unique())
+        self.types = sorted(df_income["type"].unique())
+        self.months = sorted(df_income["month"].unique())
+        self.years = sorted({month[:4] for month in self.months})
+        self.index = {
+            "symbol": {c: i for i, c in enumerate(self.symbols)},
+            "type": {t: i for i, t in enumerate(self.types)},
+            "month": {m: i for i, m in enumerate(self.months)},
+            "year": {y: i for i, y in enumerate(self.years)},
+        }
+        symbols = df_income["symbol"].map(self.index["symbol"]).to_numpy()
+        types = df_income["type"].map(self.index["type"]).to_numpy()
+        months = df_income["month"].map(self.index["month"]).to_numpy()
+        values = df_income[MEASURES].to_numpy(dtype=np.float64)
+        costs = df_income["cost"].to_numpy(dtype=np.float64)
+        self.totals = {}
+        self.costs = {}
+        for period, labels in [
+            ("month", df_income["month"]), ("year", df_income["month"].str[:4])
+        ]:
+            periods = labels.map(self.index[period]).to_numpy()
+            shape = (
+                len(self.symbols), len(self.index[period]), len(self.types)
+            )
+            cube = np.zeros(shape + (len(MEASURES),))
+            np.add.at(cube, (symbols, periods, types), values)
+            # The cost basis of each cell is the one of its last month
+            last = np.full(shape, -1)
+            np.maximum.at(last, (symbols, periods, types), months)
+            latest = months == last[symbols, periods, types]
+            cost = np.zeros(shape)
+            cost[symbols[latest], periods[latest], types[latest]] = \
+                costs[latest]
+            # Every combination of fixed (True) and summed (False) axes
+            for fixed in product([True, False], repeat=3):
+                axes = tuple(i for i, f in enumerate(fixed) if not f)
+                self.totals[(period,) + fixed] = cube.sum(
+                    axis=axes, keepdims=True
+                )
+                self.costs[(period,) + fixed] = last_cost(cost, last, axes)
+
+    def total(
+        self,
+        symbol: str = None,
+        month: str = None,
+        year: str = None,
+        type: str = None
+    ) -> Dict[str, float]:
+        """
+        This function returns the gross, net, cost basis and yield on cost
+        of a slice. The axes that are not given are summed
+        """
+        period = "year" if year is not None else "month"
+        keys = [symbol, year if year is not None else month, type]
+        fixed = tuple(key is not None for key in keys)
+        position = []
+        for axis, key in zip(["symbol", period, "type"], keys):
+            if key is None:
+                position.append(0)
+            elif key in self.index[axis]:
+                position.append(self.index[axis][key])
+            else:
+                return dict.fromkeys(MEASURES + ["cost", "yield_on_cost"], 0.0)
+        total = dict(zip(
+            MEASURES,
+            self.totals[(period,) + fixed][tuple(position)].tolist()
+        ))
+        total["cost"] = float(self.costs[(period,) + fixed][tuple(position)])
+        total["yield_on_cost"] = \
+            total["net"] / total["cost"] if total["cost"] else 0.0
+        return total
+
+    def series(
+        self, axis: str, symbol: str = None, type: str = None
+    ) -> pd.DataFrame:
+        """
+        This function returns the totals of each symbol, month, year or type
+        of a slice
+        """
+        labels = {
+            "symbol": self.symbols, "month": self.months,
+            "year": self.years, "type": self.types
+        }[axis]
+        return pd.DataFrame([
+            {axis: label, **self.total(**{
+                "symbol": symbol, "type": type, axis: label
+            })}
+                for label in labels
+        ])
@@ -1,57 +1,270 @@
-from bisect import bisect, bisect_left, bisect_right
-from datetime import timedelta
 import re
-from dateutil.relativedelta import relativedelta
-from typing import Dict
+from typing import Dict, List
 
 import numpy as np
-from utils.utils import save_to_file, create_folder
-from utils.yf import get_dividends
+from investment_portfolio.manifest import (
+    diff_manifest,
+    load_manifest,
+    manifest_entry,
+    save_manifest
+)
+from investment_portfolio.corporate_actions import (
+    action_hashes,
+    linked_symbols,
+    read_actions
+)
+from investment_portfolio.income import income_rows, update_income
+from investment_portfolio.ledger import Ledger
+from investment_portfolio.mark_to_market import MarkToMarket
+from investment_portfolio.position_index import PositionIndex
+from investment_portfolio.profits import (
+    monthly_profits,
+    symbol_months,
+    update_profits,
+    update_symbol_months
+)
+from prices.prices import PriceStore
+from storage.storage import Storage, CSVStorage
+from trade_confirmation.trade_confirmation import OperationBatch
+from utils.executor import SymbolExecutor
+from utils.instrumentation import stage, timed_symbol
+from utils.money import from_cents
+from utils.utils import BatchWriter, create_folder, is_outdated
 from os import listdir
-from os.path import isfile, join, basename
+from os.path import join, exists
 import pandas as pd
 
+# The views of the investment portfolio, in the order they are created
+VIEWS = [
+    "portfolio", "anual_amounts", "story", "dividends_story", "profits",
+    "market_value"
+]
+# The views with records by symbol
+SYMBOL_VIEWS = ["anual_amounts", "story", "dividends_story", "profits"]
+
 class InvestmentPortfolio:
-    def __init__(self, dir: str, trade_confirmations: Dict) -> None:
+    """
+    This class keeps the investment portfolio. The trade confirmations are
+    applied to the ledgers, and the symbols they change are left pending in
+    each view until the view is calculated again, so the views may be
+    created apart from the ledgers and from each other
+    """
+    def __init__(
+        self,
+        dir: str,
+        trade_confirmations: Dict = None,
+        storage: Storage = None,
+        prices: PriceStore = None,
+        workers: int = 1
+    ) -> None:
         self.create_folders(dir)
-        for date in sorted(trade_confirmations.keys()):
-            for tc in trade_confirmations[date]:
+        self.storage = storage if storage is not None else CSVStorage(dir)
+        self.prices = prices
+        # The files of the symbols are written by a process pool, which is
+        # kept for every view until the portfolio is closed
+        self.executor = SymbolExecutor(workers)
+        self.ledger = None
+        if trade_confirmations is not None:
+            with self:
+                self.update_ledgers(trade_confirmations)
+                self.create_views()
+
+    def close(self) -> None:
+        self.executor.close()
+
+    def __enter__(self) -> "InvestmentPortfolio":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def update_ledgers(self, trade_confirmations: Dict) -> Ledger:
+        """
+        This function applies the new, changed or deleted trade
+        confirmations and the corporate actions to the ledgers, and leaves
+        the symbols they change pending in every view. The ledger is kept
+        with the manifest, so only the symbols changed and the ones linked
+        to them by corporate actions are adjusted again
+        """
+        manifest_file = self.dir + "manifest.json"
+        ledger_file = self.dir + "ledger.pickle"
+        # Without the ledger, every trade confirmation is applied again
+        rebuild = not exists(manifest_file) or not exists(ledger_file)
+        manifest = load_manifest(manifest_file)
+        changed, deleted = diff_manifest(manifest, trade_confirmations)
+        with stage("ledgers"):
+            # The records are collected and every ledger is written once
+            self.writer = BatchWriter(self.storage)
+            symbols = set()
+            # The trade confirmations whose previous records are no longer valid
+            dirty = set(deleted + [
+                tc.name for tc in changed if tc.name in manifest
+            ])
+            for tc_name in dirty:
+                symbols.update(manifest[tc_name]["symbols"])
+                self.remove_trade_confirmation(
+                    tc_name, manifest[tc_name]["symbols"]
+                )
+                del manifest[tc_name]
+            for tc in changed:
                 self.add_fees(tc.name, tc.date, tc.broker, tc.fees)
                 self.add_spent_values(
                     tc.name, tc.date, tc.operations_value, tc.settlement_amount
                 )
-                for operation in tc.operations:
-                    self.add_operation(
-                        tc.name, tc.date, tc.broker, operation
+                manifest[tc.name] = manifest_entry(tc)
+                symbols.update(manifest[tc.name]["symbols"])
+            batch = OperationBatch(changed)
+            self.add_operations(batch)
+            self.writer.flush()
+        print(
+            f"[INVESTMENT PORTFOLIO] I am updating {len(changed)} new or "
+            f"changed and {len(deleted)} deleted trade confirmations"
+        )
+
+        # The corporate actions are applied to the ledger, and the views of
+        # the symbols whose actions changed are calculated again
+        with stage("corporate_actions"):
+            actions_file = self.dir + "actions.json"
+            previous = load_manifest(actions_file)
+            entries = self.read_corporate_actions(
+                trade_confirmations, previous
+            )
+            # The profits of these symbols are followed again from the start
+            adjusted = set()
+            for c in set(entries) | set(previous):
+                if entries.get(c) != previous.get(c):
+                    for entry in [entries.get(c), previous.get(c)]:
+                        if entry is not None:
+                            adjusted.update([c] + entry["symbols"])
+            if rebuild:
+                self.ledger = Ledger.from_trade_confirmations(
+                    trade_confirmations,
+                    read_actions(self.dir_earnings, sorted(entries))
+                )
+            else:
+                # The symbols linked by corporate actions are adjusted
+                # together, and the operations the actions move between them
+                # keep their names when their values change
+                linked = linked_symbols(entries, symbols | adjusted)
+                adjusted |= {c for c in linked if linked_symbols(
+                    entries, {c}
+                ) != {c}}
+                symbols |= linked
+                self.ledger = Ledger.load(ledger_file).update(
+                    batch,
+                    dirty | {tc.name for tc in changed},
+                    linked,
+                    read_actions(self.dir_earnings, sorted(linked))
+                )
+            symbols |= adjusted
+        # The pending symbols are saved before the ledger and the manifests,
+        # so they are not lost if a view fails
+        self.add_pending(symbols, adjusted, dirty)
+        self.ledger.save(ledger_file)
+        save_manifest(manifest_file, manifest)
+        save_manifest(actions_file, entries)
+        return self.ledger
+
+    def pending_file(self, view: str) -> str:
+        return create_folder(self.dir + "pending/") + view + ".json"
+
+    def pending(self, view: str) -> tuple:
+        """
+        This function returns the symbols pending in a view, the symbols
+        whose corporate actions changed and the trade confirmations whose
+        records are no longer valid
+        """
+        entry = load_manifest(self.pending_file(view))
+        return tuple(
+            set(entry.get(key, [])) for key in ["symbols", "adjusted", "dirty"]
+        )
+
+    def add_pending(self, symbols: set, adjusted: set, dirty: set) -> None:
+        if not symbols and not adjusted and not dirty:
+            return
+        for view in VIEWS:
+            pending = self.pending(view)
+            save_manifest(self.pending_file(view), {
+                key: sorted(previous | new)
+                    for key, previous, new in zip(
+                        ["symbols", "adjusted", "dirty"],
+                        pending,
+                        [symbols, adjusted, dirty]
                     )
+            })
 
-        self.create_portfolio()
-        self.create_anual_amounts()
-        self.create_story()
-        self.create_dividends_story()
+    def create_views(self, views: List[str] = VIEWS) -> None:
+        """
+        This function calculates the views from the ledger, for the symbols
+        pending in each of them, in a single transaction of the storage
+        """
+        pending = {view: self.pending(view) for view in views}
+        with self.storage.transaction():
+            for view in views:
+                with stage(view):
+                    symbols, self.adjusted, self.dirty = pending[view]
+                    if view in SYMBOL_VIEWS:
+                        self.remove_symbols(symbols, [view])
+                    if view == "market_value":
+                        self.create_market_value()
+                    else:
+                        getattr(self, "create_" + view)(symbols)
+        for view in views:
+            if any(pending[view]):
+                save_manifest(self.pending_file(view), {})
 
     def create_folders(self, dir: str) -> None:
         self.dir = create_folder(dir)
-        self.dir_portfolios = create_folder(dir + "portfolios/")
-        self.dir_anual_amounts = create_folder(dir + "anual_amounts/")
-        self.dir_stories = create_folder(dir + "stories/")
         self.dir_earnings = create_folder(dir + "../earnings-history/")
 
+    def read_corporate_actions(
+        self, trade_confirmations: Dict, previous: Dict
+    ) -> Dict:
+        """
+        This function finds the hash and the new symbols of the corporate
+        actions of the traded symbols and of the symbols they are renamed
+        to. The actions of a symbol are only read again when their hash is
+        not the previous one
+        """
+        symbols = {
+            c for date in trade_confirmations
+                for tc in trade_confirmations[date]
+                for c in tc.symbols
+        }
+        entries = {}
+        new_symbols = set(symbols)
+        while new_symbols:
+            hashes = action_hashes(self.dir_earnings, sorted(new_symbols))
+            for c, h in hashes.items():
+                if previous.get(c, {}).get("hash") == h:
+                    entries[c] = previous[c]
+                    continue
+                actions = read_actions(self.dir_earnings, [c])
+                entries[c] = {
+                    "hash": h,
+                    "symbols": sorted(set(actions["new_symbol"]) - {c})
+                }
+            new_symbols = {
+                new_symbol for c in hashes
+                    for new_symbol in entries[c]["symbols"]
+            } - symbols
+            symbols |= new_symbols
+        return entries
+
     def add_fees(
         self, tc_name: str, date: str, broker: str, fees: Dict
     ) -> None:
         """
         This function records the fees
         """
-        file_path = self.dir + "/fees.csv"
-
-        df = pd.DataFrame.from_dict(fees, orient="index").reset_index()
-        df.columns = ["fee", "value"]
-        df["tc_name"] = tc_name
-        df["date"] = date
-        df["broker"] = broker
-        df = df[["date", "broker", "fee", "value", "tc_name"]]
-        save_to_file("fees", df, file_path)
+        self.writer.save_rows(
+            [
+                (date, broker, fee, value, tc_name)
+                    for fee, value in fees.items()
+            ],
+            ["date", "broker", "fee", "value", "tc_name"],
+            "fees"
+        )
 
     def add_spent_values(
         self,
@@ -63,57 +276,51 @@ class InvestmentPortfolio:
         """
         This function records the fees
         """
-        file_path = self.dir + "/spent_values.csv"
-        df = pd.DataFrame(
-            {
-                "tc_name": [tc_name],
-                "date": [date],
-                "operations_value": [operations_value],
-                "settlement_amount": [settlement_amount]
-            }
-        )
-        df = df[["date", "operations_value", "settlement_amount", "tc_name"]]
-        save_to_file("spent_values", df, file_path)
-    
-    def add_operation(
-        self, tc_name: str, date: str, broker: str, operation: Dict
-    ) -> None:
-        symbol = operation["symbol"]
-        file_path = (
-            self.dir_portfolios + "/portfolio-" + operation["symbol"] + ".csv"
-        )
-        df = pd.DataFrame(
-            {
-                "tc_name": [tc_name + "-" + operation["counter"]],
-                "date": [date],
-                "symbol": [symbol],
-                "amount": [operation["amount"]],
-                "price": [operation["price"]],
-                "value": [operation["value"]],
-                "cost_of_fees": [operation["cost_of_fees"]],
-                "value_without_fees": [operation["value_without_fees"]],
-                "price_without_fees": [operation["price_without_fees"]]
-            }
+        self.writer.save_rows(
+            [(date, operations_value, settlement_amount, tc_name)],
+            ["date", "operations_value", "settlement_amount", "tc_name"],
+            "spent_values"
         )
+
+    def add_operations(self, batch: OperationBatch) -> None:
+        """
+        This function records the operations of the trade confirmations in
+        the ledger of each symbol
+        """
+        df = batch.frame()
+        for column in ["value", "cost_of_fees", "value_without_fees"]:
+            df[column] = from_cents(df[column])
         df = df[[
             "date", "symbol", "amount", "price", "value", "cost_of_fees",
             "value_without_fees", "price_without_fees", "tc_name"
         ]]
-        save_to_file("operation", df, file_path)
-        
-    def get_portfolio_files(self) -> list:
-        portfolio_files = {
-            re.split("-|\.", file)[1]: join(self.dir_portfolios, file)
-                for file in listdir(self.dir_portfolios)
-        }
-        return portfolio_files
+        for symbol, df_c in df.groupby("symbol", observed=True, sort=False):
+            self.writer.save(
+                df_c.assign(symbol=str(symbol)), "portfolio", str(symbol)
+            )
 
-    def get_portfolio_story_files(self) -> list:
-        story_files = {
-            re.split("-|\.", file)[1]: join(self.dir_stories, file)
-                for file in listdir(self.dir_stories) if "portfolio-" in file
-        }
-        return story_files
+    def remove_trade_confirmation(self, tc_name: str, symbols: list) -> None:
+        """
+        This function removes the records of a trade confirmation
+        """
+        self.writer.remove(tc_name, "fees")
+        self.writer.remove(tc_name, "spent_values")
+        for symbol in symbols:
+            self.writer.remove(tc_name, "portfolio", symbol)
+
+    def remove_symbols(
+        self, symbols: set, tables: List[str] = SYMBOL_VIEWS
+    ) -> None:
+        """
+        This function removes the records of the symbols that are no longer
+        in the portfolio
+        """
+        ledger_symbols = set(self.ledger.symbols)
+        for symbol in symbols:
+            if symbol in ledger_symbols:
+                continue
+            for table in tables:
+                self.storage.delete(table, symbol)
 
     def get_dividend_files(self) -> list:
         dividend_files = {
@@ -122,120 +329,225 @@ class InvestmentPortfolio:
         }
         return dividend_files
     
-    def create_portfolio(self) -> None:
-        """
-        This function creates the consolidated portfolio of all tickers
-        """
-        file = self.dir + "consolidated_portfolio.csv"
-        portfolio = pd.DataFrame({})
-        portfolio_file = self.get_portfolio_files()
-        for c in portfolio_file:
-            df = pd.read_csv(portfolio_file[c], sep=";")
-            df = df[["symbol", "amount", "value"]]
-            df = df.rename(columns={"value": "investment"})
-            df = df.groupby(
-                    ["symbol"], as_index=False
-                ).agg({"amount": "sum", "investment": "sum"})
-            df["avg_price"] = df["investment"] / df["amount"]
-            df = df[["symbol", "amount", "avg_price", "investment"]]
-            portfolio = pd.concat([portfolio, df])
-        amount_invested = sum(portfolio["investment"])
-        portfolio["perc"] = round(
-            portfolio["investment"] / amount_invested * 100, 2
-        )
-        portfolio = portfolio.sort_values(
-            ["perc", "investment"], ascending=False
+    def write_symbols(self, table: str, df: pd.DataFrame) -> None:
+        """
+        This function writes the records of each symbol
+        """
+        self.storage.write_many(
+            table, dict(tuple(df.groupby("symbol", sort=False))),
+            self.executor
         )
-        portfolio.to_csv(file, sep=";", index=False)
-
-    def create_anual_amounts(self):
-        portfolio_file = self.get_portfolio_files()
-        for c in portfolio_file:
-            df = pd.read_csv(portfolio_file[c], sep=";")
-            df["date"] = pd.to_datetime(df["date"], format="%Y-%m-%d")
-            df["year"] = df["date"].apply(lambda x: x.year)
-            df = df[["year", "symbol", "amount", "value"]]
-            df = df.rename(columns={"value": "investment"})
-            df = df.groupby(
-                    ["year", "symbol"], as_index=False
-                ).agg({"amount": "sum", "investment": "sum"})
-            df = df[["year", "symbol", "amount", "investment"]]
-            df = pd.concat(
-                [df, pd.DataFrame({
-                        "year": [min(df["year"]) - 1],
-                        "symbol": [list(df["symbol"].unique())[0]],
-                        "amount": [0],
-                        "investment": [0.0]
-                    })
-                ]
-            )
-            df = df.sort_values(["year"])
-            df["accumulated"] = df['investment'].cumsum()
-            df.to_csv(
-                self.dir_anual_amounts + basename(portfolio_file[c]),
-                sep=";",
-                index=False
-            )
 
-    def create_story(self):
-        portfolio_file = self.get_portfolio_files()
-        for c in portfolio_file:
-            df = pd.read_csv(portfolio_file[c], sep=";")
-            df = df[["date", "symbol", "amount", "price", "value"]]
-            # Groupby the trades made in the same day
-            df = df.groupby(["date", "symbol"], as_index=False).agg({
-                "amount": "sum",
-                "value": "sum"
-            })
-            # Calculate the amount and value in each day
-            df = df.sort_values(["date"])
-            df["amount"] = df['amount'].cumsum()
-            df["value"] = df['value'].cumsum()
-            # Calculate the avg price in each day
-            df["price"] = df["value"] / df["amount"]
-            df.to_csv(
-                self.dir_stories + basename(portfolio_file[c]),
-                sep=";",
-                index=False
-            )
+    def create_portfolio(self, symbols: set = None) -> None:
+        """
+        This function creates the consolidated portfolio of all tickers.
+        If symbols is given, it is only recalculated when they changed
+        """
+        if symbols is not None and not symbols and self.storage.exists(
+            "consolidated_portfolio"
+        ):
+            return
+        self.storage.write("consolidated_portfolio", self.ledger.portfolio())
 
-    def create_dividends_story(self):
-        portfolio_story_files = self.get_portfolio_story_files()
+    def create_anual_amounts(self, symbols: set = None):
+        self.write_symbols("anual_amounts", self.ledger.anual_amounts(symbols))
+
+    def create_story(self, symbols: set = None):
+        self.write_symbols("story", self.ledger.stories(symbols))
+
+    def create_dividends_story(self, symbols: set = None):
         dividend_files = self.get_dividend_files()
-        for c in portfolio_story_files:
-            df_story = pd.read_csv(portfolio_story_files[c], sep=";")
-            min_date = min(df_story["date"])
-            df_dividend = pd.read_csv(dividend_files[c], sep=";")
-            df_dividend = df_dividend.loc[
-                (df_dividend["prev_date"] >= min_date)
-            ]
-            df_dividend = df_dividend.sort_values(["prev_date"])
-            intake_dates = sorted(list(df_story["date"]))
-            df_dividend["date"] = df_dividend["prev_date"].apply(
-                lambda x: intake_dates[bisect_left(intake_dates, x) - 1]
-            )
-            df_dividend_story = df_dividend.merge(
-                df_story, on=["date", "symbol"], how="left"
-            )
-            df_dividend_story = df_dividend_story[
-                ["symbol", "prev_date", "payment_day", "type",
-                "value_x", "amount", "value_y", "price"]
-            ]
-            df_dividend_story = df_dividend_story.rename(
-                columns={
-                    "value_x": "dividend_per_stock",
-                    "value_y": "investment"
-                }
-            )
-            df_dividend_story["dividend_received"] = (
-                df_dividend_story["dividend_per_stock"] 
-                * df_dividend_story["amount"]
+        selected = []
+        for c in self.ledger.symbols:
+            if not c in dividend_files:
+                continue
+            # The earnings are downloaded daily, so a dividend story is also
+            # recalculated when it is older than the earnings file
+            if symbols is not None and not c in symbols and not is_outdated(
+                self.storage.updated("dividends_story", c), dividend_files[c]
+            ):
+                continue
+            selected.append(c)
+        df_dividend = []
+        for c in selected:
+            try:
+                df_dividend.append(pd.read_csv(dividend_files[c], sep=";"))
+            except pd.errors.EmptyDataError:
+                # The symbol has never paid earnings
+                continue
+        if not df_dividend:
+            self.create_income(None, selected)
+            return
+        df_dividend = pd.concat(df_dividend, ignore_index=True)
+        df_dividend_story = dividends_story(
+            self.ledger.positions(set(selected)), df_dividend,
+            self.ledger.lots(set(selected))
+        )
+        # The cost basis is only used by the income
+        df_story = df_dividend_story.drop(columns="cost")
+        stories = dict(tuple(df_story.groupby("symbol", sort=False)))
+        self.storage.write_many(
+            "dividends_story",
+            {
+                c: stories.get(c, df_story.iloc[0:0])
+                    for c in df_dividend["symbol"].unique()
+            },
+            self.executor
+        )
+        self.create_income(df_dividend_story, selected)
+
+    def create_income(
+        self, df_dividend_story: pd.DataFrame, selected: list
+    ) -> None:
+        """
+        This function replaces the income of the symbols whose dividend
+        stories were calculated, and removes the symbols that are no longer
+        in the portfolio
+        """
+        df_prev = None
+        if self.storage.exists("income"):
+            df_prev = self.storage.read("income")
+            selected = list(selected) + sorted(
+                set(df_prev["symbol"]) - set(self.ledger.symbols)
             )
-            df_dividend_story = df_dividend_story.sort_values(
-                ["payment_day", "prev_date"], ascending=False
+        if not selected and df_prev is not None:
+            return
+        if df_dividend_story is None:
+            df_dividend_story = dividends_story(
+                self.ledger.positions(set()), pd.DataFrame(columns=[
+                    "symbol", "prev_date", "payment_day", "type", "value"
+                ]),
+                self.ledger.lots(set())
             )
-            df_dividend_story.to_csv(
-                self.dir_stories + basename(dividend_files[c]),
-                sep=";",
-                index=False
-            )
\ No newline at end of file
+        self.storage.write(
+            "income",
+            update_income(df_prev, income_rows(df_dividend_story), selected)
+        )
+
+    def create_profits(self, symbols: set = None) -> None:
+        """
+        This function follows the average cost and the realized profit of
+        the symbols. The previous rows are continued from the last one that
+        is still valid, so only the new operations are followed, and only
+        the months of the followed symbols are summed again
+        """
+        selected = [
+            c for c in self.ledger.symbols
+                if symbols is None or c in symbols
+                or not self.storage.exists("profits", c)
+        ]
+        if not selected and not symbols \
+                and self.storage.exists("monthly_profits"):
+            return
+        operations = self.ledger.select(set(selected))
+        operations = operations.assign(
+            date=operations["date"].dt.strftime("%Y-%m-%d"),
+            value=from_cents(operations["value"]),
+            value_without_fees=from_cents(operations["value_without_fees"])
+        )
+        followed = 0
+        profits = []
+        for c, df_c in operations.groupby("symbol", observed=True):
+            with timed_symbol(c):
+                df_prev = None
+                if symbols is not None and not c in self.adjusted \
+                        and self.storage.exists("profits", c):
+                    df_prev = self.storage.read("profits", c)
+                df_profits, count = update_profits(df_prev, df_c, self.dirty)
+                followed += count
+                self.storage.write("profits", df_profits, c)
+                profits.append(df_profits)
+        print(
+            f"[INVESTMENT PORTFOLIO] I am following {followed} operations "
+            f"of {len(selected)} symbols"
+        )
+        # The months of the other symbols are kept, and the ones of the
+        # symbols that are no longer in the portfolio are removed
+        df_prev = None
+        if symbols is not None:
+            if self.storage.exists("symbol_monthly_profits"):
+                df_prev = self.storage.read("symbol_monthly_profits")
+            else:
+                df_prev = symbol_months(self.storage.read_many(
+                    "profits", sorted(set(self.ledger.symbols) - set(selected))
+                ))
+            df_prev = df_prev.loc[df_prev["symbol"].isin(self.ledger.symbols)]
+        df_months = update_symbol_months(
+            df_prev,
+            symbol_months(
+                pd.concat(profits, ignore_index=True) if profits
+                    else pd.DataFrame({})
+            ),
+            selected
+        )
+        self.storage.write("symbol_monthly_profits", df_months)
+        self.storage.write("monthly_profits", monthly_profits(df_months))
+
+    def create_market_value(self) -> None:
+        """
+        This function values the portfolio on each day with prices. The
+        positions are the lots followed by the profits, so the unrealised
+        profit is over their cost basis
+        """
+        if self.prices is None or len(self.prices) == 0:
+            return
+        df_lots = self.ledger.lot_story()
+        self.storage.write(
+            "market_value",
+            MarkToMarket(
+                PositionIndex(df_lots),
+                self.prices,
+                realised=PositionIndex(df_lots.assign(
+                    value=df_lots["realized"]
+                ))
+            ).totals()
+        )
+
+def dividends_story(
+    positions: PositionIndex,
+    df_dividend: pd.DataFrame,
+    lots: PositionIndex = None
+) -> pd.DataFrame:
+    """
+    This function matches every dividend of all symbols with the position
+    held before its prev_date, in a single lookup. A dividend whose
+    prev_date is the first trade date of the symbol gets the position of
+    that day. The cost basis of the position is also looked up in the lots,
+    when they are given, for the income. It is not part of the story
+    """
+    prev_date = pd.to_datetime(df_dividend["prev_date"], format="%Y-%m-%d")
+    first_dates = positions.first_dates(df_dividend["symbol"])
+    kept = prev_date.to_numpy() >= first_dates
+    df_dividend = df_dividend.loc[kept]
+    # Nothing is held before the first trade date, so its trades count
+    dates = np.where(
+        prev_date.to_numpy()[kept] == first_dates[kept],
+        prev_date.to_numpy()[kept] + np.timedelta64(1, "D"),
+        prev_date.to_numpy()[kept]
+    )
+    df_position = positions.lookup(
+        df_dividend["symbol"], dates, inclusive=False
+    )
+    df_dividend_story = pd.DataFrame({
+        "symbol": df_dividend["symbol"].to_numpy(),
+        "prev_date": df_dividend["prev_date"].to_numpy(),
+        "payment_day": df_dividend["payment_day"].to_numpy(),
+        "type": df_dividend["type"].to_numpy(),
+        "dividend_per_stock": df_dividend["value"].to_numpy(),
+        "amount": df_position["amount"],
+        "investment": df_position["value"],
+        "price": df_position["price"]
+    })
+    df_dividend_story["dividend_received"] = (
+        df_dividend_story["dividend_per_stock"]
+        * df_dividend_story["amount"].astype(np.float64)
+    )
+    if lots is not None:
+        df_dividend_story["cost"] = lots.lookup(
+            df_dividend["symbol"], dates, inclusive=False
+        )["value"].to_numpy()
+    return df_dividend_story.sort_values(
+        ["symbol", "payment_day", "prev_date"],
+        ascending=[True, False, False],
+        kind="stable"
+    )
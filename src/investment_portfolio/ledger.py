@@ -0,0 +1,221 @@
+import pickle
+from copy import copy
+from os import replace
+from typing import Dict, List
+import numpy as np
+import pandas as pd
+from investment_portfolio.corporate_actions import (
+    apply_actions,
+    whole_amounts
+)
+from investment_portfolio.position_index import PositionIndex
+from investment_portfolio.profits import lot_story
+from storage.storage import remove_mask
+from trade_confirmation.trade_confirmation import OperationBatch
+from utils.money import from_cents
+from utils.utils import merge_sorted
+
+OPERATION_COLUMNS = [
+    "date", "symbol", "amount", "price", "value", "cost_of_fees",
+    "value_without_fees", "price_without_fees", "tc_name"
+]
+# The money of the operations, in integer cents
+MONEY_COLUMNS = ["value", "cost_of_fees", "value_without_fees"]
+
+def trades_table(operations: pd.DataFrame) -> pd.DataFrame:
+    """
+    This function keeps the traded operations sorted by date and tc_name,
+    with the symbols as strings
+    """
+    operations = operations[OPERATION_COLUMNS].astype({"symbol": str})
+    return operations.sort_values(
+        ["date", "tc_name"], kind="stable"
+    ).reset_index(drop=True)
+
+def adjust(
+    trades: pd.DataFrame, actions: pd.DataFrame = None
+) -> pd.DataFrame:
+    """
+    This function converts the dates and the money of the traded operations,
+    and applies the corporate actions to them
+    """
+    operations = trades.copy()
+    operations["date"] = pd.to_datetime(
+        operations["date"], format="%Y-%m-%d"
+    )
+    operations[MONEY_COLUMNS] = operations[MONEY_COLUMNS].astype(np.int64)
+    if actions is not None:
+        operations = apply_actions(operations, actions)
+    return operations
+
+def set_types(operations: pd.DataFrame) -> pd.DataFrame:
+    """
+    This function makes the symbols categorical. The amounts are integers
+    unless a split left fractions of shares
+    """
+    operations["amount"] = whole_amounts(
+        operations["amount"].to_numpy(dtype=np.float64)
+    )
+    operations["symbol"] = operations["symbol"].astype(str).astype("category")
+    return operations.reset_index(drop=True)
+
+class Ledger:
+    """
+    This class keeps the operations of all trade confirmations in a single
+    table, sorted by date and tc_name, with categorical symbols, datetime
+    dates and the money in int64 cents, so the sums are exact. The corporate
+    actions are applied to them, and the views of all symbols are calculated
+    from it at once, with the money converted to floats only in the views.
+    The traded operations are also kept as they were before the actions, so
+    the ledger is updated by symbol
+    """
+    def __init__(
+        self, operations: pd.DataFrame, actions: pd.DataFrame = None
+    ) -> None:
+        self.trades = trades_table(operations)
+        self.operations = set_types(adjust(self.trades, actions).sort_values(
+            ["date", "tc_name"], kind="stable"
+        ))
+
+    @classmethod
+    def from_trade_confirmations(
+        cls, trade_confirmations: Dict, actions: pd.DataFrame = None
+    ) -> "Ledger":
+        batch = OperationBatch.from_trade_confirmations(trade_confirmations)
+        return cls(batch.frame(), actions)
+
+    @classmethod
+    def load(cls, file: str) -> "Ledger":
+        with open(file, "rb") as f:
+            return pickle.load(f)
+
+    def save(self, file: str) -> None:
+        with open(file + ".tmp", "wb") as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+        replace(file + ".tmp", file)
+
+    def update(
+        self,
+        batch: OperationBatch,
+        removed: set,
+        symbols: set,
+        actions: pd.DataFrame
+    ) -> "Ledger":
+        """
+        This function returns the ledger without the operations of the
+        removed trade confirmations and with the operations of the batch.
+        Only the given symbols, with the actions of the symbols linked to
+        them, are adjusted again, and the others are kept as they are
+        """
+        trades = merge_sorted(
+            self.trades.loc[~remove_mask(self.trades, removed)],
+            trades_table(batch.frame())
+        ).reset_index(drop=True)
+        kept = ~self.operations["symbol"].isin(symbols)
+        ledger = copy(self)
+        ledger.trades = trades
+        ledger.operations = set_types(merge_sorted(
+            self.operations.loc[kept].astype({"symbol": str}),
+            adjust(trades.loc[trades["symbol"].isin(symbols)], actions)
+        ))
+        return ledger
+
+    @property
+    def symbols(self) -> List[str]:
+        return sorted(self.operations["symbol"].unique())
+
+    def select(self, symbols: set = None) -> pd.DataFrame:
+        if symbols is None:
+            return self.operations
+        return self.operations.loc[self.operations["symbol"].isin(symbols)]
+
+    def portfolio(self) -> pd.DataFrame:
+        """
+        This function calculates the consolidated portfolio of all symbols
+        """
+        df = self.operations.groupby(
+            "symbol", observed=True, as_index=False
+        ).agg(amount=("amount", "sum"), investment=("value", "sum"))
+        df["symbol"] = df["symbol"].astype(str)
+        df["investment"] = from_cents(df["investment"])
+        df["avg_price"] = df["investment"] / df["amount"]
+        df = df[["symbol", "amount", "avg_price", "investment"]]
+        amount_invested = sum(df["investment"])
+        df["perc"] = round(df["investment"] / amount_invested * 100, 2)
+        return df.sort_values(
+            ["perc", "investment"], ascending=False, kind="stable"
+        )
+
+    def anual_amounts(self, symbols: set = None) -> pd.DataFrame:
+        """
+        This function calculates the amount and investment of each year, and
+        the accumulated investment, with a year without investment before
+        the first one
+        """
+        df = self.select(symbols)
+        df = df.assign(year=df["date"].dt.year).groupby(
+            ["symbol", "year"], observed=True, as_index=False
+        ).agg(amount=("amount", "sum"), investment=("value", "sum"))
+        first = df.groupby("symbol", observed=True, as_index=False).agg(
+            year=("year", "min")
+        )
+        first["year"] -= 1
+        first["amount"] = 0
+        first["investment"] = 0
+        df = pd.concat([df, first], ignore_index=True)
+        df["symbol"] = df["symbol"].astype(str)
+        df = df.sort_values(["symbol", "year"], kind="stable")
+        df["accumulated"] = df.groupby("symbol")["investment"].cumsum()
+        df["investment"] = from_cents(df["investment"])
+        df["accumulated"] = from_cents(df["accumulated"])
+        return df[["year", "symbol", "amount", "investment", "accumulated"]]
+
+    def accumulated(self, symbols: set = None) -> pd.DataFrame:
+        """
+        This function calculates the amount and value held after each day
+        with trades
+        """
+        df = self.select(symbols).groupby(
+            ["symbol", "date"], observed=True, as_index=False
+        ).agg(amount=("amount", "sum"), value=("value", "sum"))
+        df["symbol"] = df["symbol"].astype(str)
+        grouped = df.groupby("symbol")
+        df["amount"] = grouped["amount"].cumsum()
+        df["value"] = from_cents(grouped["value"].cumsum())
+        return df
+
+    def stories(self, symbols: set = None) -> pd.DataFrame:
+        """
+        This function calculates the amount, value and average price held
+        after each day with trades
+        """
+        df = self.accumulated(symbols)
+        df["date"] = df["date"].dt.strftime("%Y-%m-%d")
+        with np.errstate(divide="ignore", invalid="ignore"):
+            df["price"] = df["value"] / df["amount"]
+        return df[["date", "symbol", "amount", "value", "price"]]
+
+    def positions(self, symbols: set = None) -> PositionIndex:
+        """
+        This function creates the index of the positions held in the symbols
+        """
+        return PositionIndex(self.accumulated(symbols))
+
+    def lot_story(self, symbols: set = None) -> pd.DataFrame:
+        """
+        This function follows the lots of the symbols, as the profits do,
+        and keeps the position, its cost basis and the realized profit after
+        each day with trades
+        """
+        operations = self.select(symbols)
+        return lot_story(operations.assign(
+            value=from_cents(operations["value"]),
+            value_without_fees=from_cents(operations["value_without_fees"])
+        ))
+
+    def lots(self, symbols: set = None) -> PositionIndex:
+        """
+        This function creates the index of the positions held in the symbols
+        at their cost basis
+        """
+        return PositionIndex(self.lot_story(symbols))
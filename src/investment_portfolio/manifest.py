@@ -0,0 +1,66 @@
+import json
+from os import replace
+from os.path import exists, getmtime
+from typing import Dict, List, Tuple
+from utils.utils import file_hash
+
+def load_manifest(file: str) -> Dict:
+    """
+    This function reads the manifest of the processed trade confirmations,
+    or returns an empty one if it does not exist
+    """
+    if not exists(file):
+        return {}
+    with open(file) as f:
+        return json.load(f)
+
+def save_manifest(file: str, manifest: Dict) -> None:
+    # Only json.dumps without indent uses the C encoder. The file is renamed
+    # over the previous one, so an interrupted write does not corrupt it
+    with open(file + ".tmp", "w") as f:
+        f.write(json.dumps(manifest, sort_keys=True))
+    replace(file + ".tmp", file)
+
+def tc_hash(tc) -> str:
+    """
+    This function returns the content hash of a trade confirmation, which is
+    already known when it was read with read_trade_confirmation
+    """
+    if tc.hash is None:
+        return file_hash(tc.file_path)
+    return tc.hash
+
+def manifest_entry(tc) -> Dict:
+    """
+    This function creates the manifest entry of a trade confirmation
+    """
+    return {
+        "hash": tc_hash(tc),
+        "mtime": getmtime(tc.file_path),
+        "symbols": sorted(set(tc.symbols))
+    }
+
+def diff_manifest(
+    manifest: Dict, trade_confirmations: Dict
+) -> Tuple[List, List[str]]:
+    """
+    This function compares the trade confirmations with the manifest and
+    returns the new or changed trade confirmations and the names of the
+    deleted ones
+    """
+    changed = []
+    names = set()
+    for date in sorted(trade_confirmations.keys()):
+        for tc in trade_confirmations[date]:
+            names.add(tc.name)
+            entry = manifest.get(tc.name)
+            if entry is not None:
+                if entry["mtime"] == getmtime(tc.file_path):
+                    continue
+                if entry["hash"] == tc_hash(tc):
+                    # Only touched, keep the new mtime to skip hashing it again
+                    entry["mtime"] = getmtime(tc.file_path)
+                    continue
+            changed.append(tc)
+    deleted = sorted(name for name in manifest if not name in names)
+    return changed, deleted
@@ -0,0 +1,77 @@
+from typing import List
+import numpy as np
+import pandas as pd
+from investment_portfolio.position_index import PositionIndex
+from prices.prices import PriceStore
+
+class MarkToMarket:
+    """
+    This class values the positions of every symbol on every day with
+    prices, as matrices of dates by symbols. The positions are the lots at
+    their cost basis, so the unrealised profit is the amount held times the
+    price over its average cost, and the profit realized by the sales up to
+    each day is kept apart. The positions without a price yet are valued at
+    cost
+    """
+    def __init__(
+        self,
+        lots: PositionIndex,
+        prices: PriceStore,
+        symbols: List[str] = None,
+        date_from: str = None,
+        date_to: str = None,
+        realised: PositionIndex = None
+    ) -> None:
+        if symbols is None:
+            symbols = list(lots.symbols)
+        self.dates, self.symbols, self.price = prices.matrix(
+            symbols, date_from, date_to
+        )
+        self.amount, self.cost = lots.matrix(self.symbols, self.dates)
+        self.amount_dtype = lots.amount.dtype
+        self.market_value = np.where(
+            np.isnan(self.price),
+            self.cost,
+            self.amount * np.nan_to_num(self.price)
+        )
+        self.unrealised = self.market_value - self.cost
+        if realised is None:
+            self.realised = np.zeros_like(self.cost)
+        else:
+            self.realised = realised.matrix(self.symbols, self.dates)[1]
+        total = self.market_value.sum(axis=1, keepdims=True)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self.weights = np.where(
+                total != 0, self.market_value / total, 0.0
+            )
+
+    def totals(self) -> pd.DataFrame:
+        """
+        This function sums the market value, the cost basis, the unrealised
+        profit and the realized profit of each day
+        """
+        return pd.DataFrame({
+            "date": pd.to_datetime(self.dates).strftime("%Y-%m-%d"),
+            "market_value": self.market_value.sum(axis=1),
+            "cost": self.cost.sum(axis=1),
+            "unrealised": self.unrealised.sum(axis=1),
+            "realised": self.realised.sum(axis=1),
+        })
+
+    def frame(self) -> pd.DataFrame:
+        """
+        This function lists the valuation of each symbol held on each day
+        """
+        held = self.amount != 0
+        days, columns = np.nonzero(held)
+        return pd.DataFrame({
+            "date": pd.to_datetime(self.dates[days]).strftime("%Y-%m-%d"),
+            "symbol": self.symbols[columns],
+            "amount": self.amount[held].astype(self.amount_dtype),
+            "price": self.price[held],
+            "market_value": self.market_value[held],
+            "cost": self.cost[held],
+            "unrealised": self.unrealised[held],
+            "realised": self.realised[held],
+            "weight": self.weights[held],
+        })
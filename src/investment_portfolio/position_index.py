@@ -0,0 +1,203 @@
+from typing import Dict, Iterable, List, Tuple
+import numpy as np
+import pandas as pd
+
+def to_days(dates) -> np.ndarray:
+    """
+    This function converts dates, as strings or datetimes, to the number of
+    days since the epoch. NaT becomes the minimum int64
+    """
+    dates = pd.to_datetime(pd.Series(dates, dtype=object), format="ISO8601")
+    return dates.to_numpy(dtype="datetime64[D]").astype(np.int64)
+
+class PositionIndex:
+    """
+    This class answers which position was held in a symbol on a date. It
+    keeps the accumulated amount and value after each day with trades, in
+    arrays sorted by symbol and date, so every query is a binary search and
+    a batch of queries is a single vectorized search
+    """
+    def __init__(self, df_story: pd.DataFrame) -> None:
+        symbols = df_story["symbol"].astype(str).to_numpy()
+        days = to_days(df_story["date"])
+        order = np.lexsort((days, symbols))
+        self.symbols, codes = np.unique(symbols[order], return_inverse=True)
+        self.codes = {c: i for i, c in enumerate(self.symbols)}
+        self.days = days[order]
+        self.amount = df_story["amount"].to_numpy()[order]
+        self.value = df_story["value"].to_numpy(dtype=np.float64)[order]
+        self.starts = np.searchsorted(codes, np.arange(len(self.symbols)))
+        self.ends = np.append(self.starts[1:], len(codes))
+        # The keys of (symbol, day) are sorted, and the days out of the
+        # range still fall between the keys of the symbol and the next one
+        self.min_day = self.days.min() if len(self.days) else 0
+        self.stride = (self.days.max() - self.min_day + 2) \
+            if len(self.days) else 2
+        self.code_of_row = codes
+        self.keys = codes * self.stride + (self.days - self.min_day)
+
+    @classmethod
+    def from_storage(
+        cls, storage, symbols: List[str] = None
+    ) -> "PositionIndex":
+        """
+        This function creates the index from the stories in the storage
+        """
+        if symbols is None:
+            symbols = storage.symbols("story")
+        return cls(storage.read_many("story", symbols))
+
+    def __len__(self) -> int:
+        return len(self.days)
+
+    def symbol_codes(self, symbols: Iterable) -> np.ndarray:
+        """
+        This function finds the positions of the symbols in the index, which
+        are -1 for the unknown ones
+        """
+        return pd.Categorical(
+            np.asarray(symbols, dtype=object).astype(str),
+            categories=self.symbols
+        ).codes.astype(np.int64)
+
+    def take(self, array: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        if len(array) == 0:
+            return np.zeros(len(rows), dtype=array.dtype)
+        return array[rows]
+
+    def query_keys(self, codes: np.ndarray, days: np.ndarray) -> np.ndarray:
+        relative = np.clip(days - self.min_day, -1, self.stride - 1)
+        return codes * self.stride + relative
+
+    def lookup(
+        self, symbols: Iterable, dates: Iterable, inclusive: bool = True
+    ) -> pd.DataFrame:
+        """
+        This function finds the positions held in each pair of symbol and
+        date. The trades of the date are counted when inclusive is True.
+        The pairs without a position before them have missing values
+        """
+        symbols = pd.Series(symbols, dtype=object).astype(str).to_numpy()
+        days = to_days(dates)
+        codes = self.symbol_codes(symbols)
+        rows = np.searchsorted(
+            self.keys,
+            self.query_keys(codes, days),
+            side="right" if inclusive else "left"
+        ) - 1
+        found = (codes >= 0) & (rows >= 0) \
+            & (days != np.iinfo(np.int64).min)
+        found[found] &= self.code_of_row[rows[found]] == codes[found]
+        rows = np.where(found, rows, 0)
+        if pd.api.types.is_integer_dtype(self.amount):
+            amount = pd.array(self.take(self.amount, rows), dtype="Int64")
+            amount[~found] = pd.NA
+        else:
+            amount = np.where(found, self.take(self.amount, rows), np.nan)
+        value = np.where(found, self.take(self.value, rows), np.nan)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            price = value / np.asarray(amount, dtype=np.float64)
+        return pd.DataFrame({
+            "symbol": symbols,
+            "date": pd.Series(dates, dtype=object).to_numpy(),
+            "amount": amount,
+            "value": value,
+            "price": price
+        })
+
+    def position(
+        self, symbol: str, date, inclusive: bool = True
+    ) -> Dict[str, float]:
+        """
+        This function finds the position held in a symbol on a date. There
+        is no position before the first trade
+        """
+        code = self.codes.get(symbol)
+        if code is None:
+            return {"amount": 0, "value": 0.0, "price": np.nan}
+        start, end = self.starts[code], self.ends[code]
+        row = start + np.searchsorted(
+            self.days[start:end],
+            to_days([date])[0],
+            side="right" if inclusive else "left"
+        ) - 1
+        if row < start:
+            return {"amount": 0, "value": 0.0, "price": np.nan}
+        amount, value = self.amount[row], self.value[row]
+        return {
+            "amount": amount,
+            "value": value,
+            "price": value / amount if amount else np.nan
+        }
+
+    def positions_at(self, date, inclusive: bool = True) -> pd.DataFrame:
+        """
+        This function finds the positions held in all symbols on a date,
+        without the symbols that were not held
+        """
+        df = self.lookup(self.symbols, [date] * len(self.symbols), inclusive)
+        return df.loc[df["amount"].notna() & (df["amount"] != 0)] \
+            .reset_index(drop=True)
+
+    def history(
+        self, symbol: str, date_from=None, date_to=None
+    ) -> pd.DataFrame:
+        """
+        This function finds the positions held in a symbol after each day
+        with trades between date_from and date_to, both included
+        """
+        code = self.codes.get(symbol)
+        start, end = (0, 0) if code is None else \
+            (self.starts[code], self.ends[code])
+        days = self.days[start:end]
+        if date_to is not None:
+            end = start + np.searchsorted(days, to_days([date_to])[0], "right")
+        if date_from is not None:
+            start += np.searchsorted(days, to_days([date_from])[0], "left")
+        df = pd.DataFrame({
+            "date": self.days[start:end].astype("datetime64[D]"),
+            "symbol": symbol,
+            "amount": self.amount[start:end],
+            "value": self.value[start:end]
+        })
+        with np.errstate(divide="ignore", invalid="ignore"):
+            df["price"] = df["value"] / df["amount"]
+        df["date"] = df["date"].dt.strftime("%Y-%m-%d")
+        return df
+
+    def matrix(
+        self, symbols: Iterable, dates: Iterable, inclusive: bool = True
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        This function finds the amount and value held in every symbol on
+        every date, as matrices of dates by symbols, in a single search.
+        Nothing is held before the first trade or in unknown symbols
+        """
+        codes = self.symbol_codes(symbols)
+        days = to_days(dates)
+        keys = self.query_keys(codes[None, :], days[:, None])
+        rows = np.searchsorted(
+            self.keys, keys, side="right" if inclusive else "left"
+        ) - 1
+        found = (codes[None, :] >= 0) & (rows >= 0)
+        found[found] &= self.code_of_row[rows[found]] \
+            == np.broadcast_to(codes, rows.shape)[found]
+        rows = np.where(found, rows, 0)
+        amount = np.where(
+            found, self.take(self.amount, rows).astype(np.float64), 0.0
+        )
+        value = np.where(found, self.take(self.value, rows), 0.0)
+        return amount, value
+
+    def first_dates(self, symbols: Iterable) -> np.ndarray:
+        """
+        This function finds the day of the first trade of each symbol, as
+        datetime64. It is NaT for the symbols without trades
+        """
+        codes = self.symbol_codes(symbols)
+        days = np.where(
+            codes >= 0,
+            self.days[self.starts[np.maximum(codes, 0)]] if len(self) else 0,
+            np.iinfo(np.int64).min
+        )
+        return days.astype("datetime64[D]")
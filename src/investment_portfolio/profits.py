@@ -0,0 +1,198 @@
+from typing import List, Tuple
+import numpy as np
+import pandas as pd
+from utils.money import DECIMALS, from_cents, to_cents_array
+
+# Monthly sales of stocks up to this value are exempt from income tax
+SALES_EXEMPTION = 20000.0
+# Income tax of the profits of the months that are not exempt
+CAPITAL_GAINS_TAX = 0.15
+
+PROFIT_COLUMNS = [
+    "date", "symbol", "amount", "value", "sale_value", "position", "cost",
+    "avg_price", "sold_cost", "realized", "tc_name"
+]
+SYMBOL_MONTH_COLUMNS = ["symbol", "month", "sales", "realized"]
+
+def track_lots(
+    operations: pd.DataFrame, position: int = 0, cost: float = 0.0
+) -> pd.DataFrame:
+    """
+    This function follows the average cost of the position of a symbol
+    after each operation, from a previous position and cost. An operation
+    against the position (a sale of a long position, or a purchase of a
+    short one) takes the average cost of the amount it closes, and realizes
+    the value received minus that cost. The amount beyond the position
+    opens a new one
+    """
+    amounts = operations["amount"].to_numpy()
+    values = operations["value"].to_numpy(dtype=np.float64)
+    n = len(amounts)
+    positions = np.empty(n, dtype=amounts.dtype)
+    costs = np.empty(n, dtype=np.float64)
+    sold_costs = np.zeros(n, dtype=np.float64)
+    realized = np.zeros(n, dtype=np.float64)
+    trades = zip(amounts.tolist(), values.tolist())
+    for i, (amount, value) in enumerate(trades):
+        if position == 0 or (amount > 0) == (position > 0):
+            position += amount
+            cost += value
+        else:
+            closed = min(abs(amount), abs(position))
+            sold_costs[i] = cost * closed / abs(position)
+            received = -value
+            if closed < abs(amount):
+                received = received * closed / abs(amount)
+            realized[i] = received - sold_costs[i]
+            position += amount
+            if abs(amount) > closed:
+                cost = value * (abs(amount) - closed) / abs(amount)
+            else:
+                # A closed position has no cost left
+                cost = cost - sold_costs[i] if position else 0.0
+        # The cost is rounded as the other values derived from cents, so a
+        # symbol followed from its previous rows has the same cost as one
+        # followed from the start
+        cost = round(cost, DECIMALS)
+        positions[i] = position
+        costs[i] = cost
+    df = pd.DataFrame({
+        "date": operations["date"].to_numpy(),
+        "symbol": operations["symbol"].astype(str).to_numpy(),
+        "amount": amounts,
+        "value": values,
+        "sale_value": np.where(
+            amounts < 0,
+            -operations["value_without_fees"].to_numpy(dtype=np.float64),
+            0.0
+        ),
+        "position": positions,
+        "cost": costs,
+        "sold_cost": sold_costs,
+        "realized": realized,
+        "tc_name": operations["tc_name"].to_numpy(),
+    })
+    with np.errstate(divide="ignore", invalid="ignore"):
+        df["avg_price"] = np.where(
+            positions != 0, costs / positions, np.nan
+        )
+    return df[PROFIT_COLUMNS]
+
+def resume_point(
+    df_prev: pd.DataFrame, operations: pd.DataFrame, dirty: set
+) -> int:
+    """
+    This function counts the previous rows that are still valid: the rows
+    before the first one that differs from the operations or that comes
+    from a changed or deleted trade confirmation
+    """
+    n = min(len(df_prev), len(operations))
+    names = df_prev["tc_name"].astype(str).to_numpy()[:n]
+    valid = names == operations["tc_name"].astype(str).to_numpy()[:n]
+    valid &= ~pd.Series(names).str.rsplit("-", n=1).str[0].isin(dirty) \
+        .to_numpy()
+    invalid = np.flatnonzero(~valid)
+    return invalid[0] if len(invalid) else n
+
+def update_profits(
+    df_prev: pd.DataFrame, operations: pd.DataFrame, dirty: set
+) -> Tuple[pd.DataFrame, int]:
+    """
+    This function continues the previous rows of a symbol from the last
+    valid one, so only the new operations are followed. It returns the rows
+    and how many operations were followed
+    """
+    if df_prev is None:
+        start = 0
+    else:
+        start = resume_point(df_prev, operations, dirty)
+    if start == 0:
+        return track_lots(operations), len(operations)
+    last = df_prev.iloc[start - 1]
+    df = track_lots(operations.iloc[start:], last["position"], last["cost"])
+    return pd.concat([df_prev.iloc[:start], df], ignore_index=True), len(df)
+
+def lot_story(operations: pd.DataFrame) -> pd.DataFrame:
+    """
+    This function follows the lots of every symbol and keeps, after each day
+    with trades, the position, its cost and the profit realized up to it.
+    The amount and value columns are the position and its cost, as in the
+    stories, so they can be indexed the same way
+    """
+    lots = [
+        track_lots(df_c)
+            for _, df_c in operations.groupby("symbol", observed=True)
+    ]
+    if not lots:
+        return pd.DataFrame(
+            columns=["symbol", "date", "amount", "value", "realized"]
+        )
+    df = pd.concat(lots, ignore_index=True)
+    df["realized"] = df.groupby("symbol")["realized"].cumsum()
+    df = df.groupby(["symbol", "date"], as_index=False).last()
+    return pd.DataFrame({
+        "symbol": df["symbol"].astype(str),
+        "date": df["date"],
+        "amount": df["position"],
+        "value": df["cost"],
+        "realized": df["realized"]
+    })
+
+def symbol_months(df_profits: pd.DataFrame) -> pd.DataFrame:
+    """
+    This function sums the sales, in cents, and the realized profits of
+    each symbol and month. The profits are rounded as the other values
+    derived from cents
+    """
+    if df_profits.empty:
+        return pd.DataFrame({
+            "symbol": pd.Series(dtype=object),
+            "month": pd.Series(dtype=object),
+            "sales": pd.Series(dtype=np.int64),
+            "realized": pd.Series(dtype=np.float64)
+        })
+    # The renames move the position at its cost, rounded to cents
+    df = df_profits.loc[
+        (df_profits["sale_value"] != 0)
+        | (np.round(df_profits["realized"], 2) != 0)
+    ]
+    df = df.assign(
+        symbol=df["symbol"].astype(str),
+        month=df["date"].astype(str).str[:7],
+        sale_value=to_cents_array(df["sale_value"])
+    ).groupby(["symbol", "month"], as_index=False).agg(
+        sales=("sale_value", "sum"), realized=("realized", "sum")
+    )
+    df["realized"] = df["realized"].round(DECIMALS)
+    return df[SYMBOL_MONTH_COLUMNS]
+
+def update_symbol_months(
+    df_prev: pd.DataFrame, df: pd.DataFrame, symbols: List[str]
+) -> pd.DataFrame:
+    """
+    This function replaces the months of the symbols in the previous ones
+    """
+    if df_prev is not None:
+        df_prev = df_prev.loc[~df_prev["symbol"].isin(symbols)]
+        df = pd.concat([df_prev, df], ignore_index=True)
+    return df.sort_values(
+        ["symbol", "month"], kind="stable"
+    ).reset_index(drop=True)[SYMBOL_MONTH_COLUMNS]
+
+def monthly_profits(df_months: pd.DataFrame) -> pd.DataFrame:
+    """
+    This function sums the sales and the realized profits of each month,
+    from the months of each symbol. The months with sales up to
+    SALES_EXEMPTION are exempt, and the profit of the others is taxed
+    """
+    # The sales are summed in cents, so the exemption limit is exact
+    df = df_months.groupby("month", as_index=False).agg(
+        sales=("sales", "sum"), realized=("realized", "sum")
+    )
+    df["sales"] = from_cents(df["sales"])
+    df["exempt"] = df["sales"] <= SALES_EXEMPTION
+    df["taxable"] = np.where(df["exempt"], 0.0, df["realized"])
+    df["tax"] = np.round(
+        np.maximum(df["taxable"], 0.0) * CAPITAL_GAINS_TAX, 2
+    )
+    return df[["month", "sales", "realized", "exempt", "taxable", "tax"]]
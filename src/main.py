@@ -1,8 +1,25 @@
-from investment_portfolio.investment_portfolio import InvestmentPortfolio
-from companies.companies import get_companies
+import argparse
+import cProfile
+from datetime import date
+from typing import Dict
+from investment_portfolio.investment_portfolio import (
+    VIEWS,
+    InvestmentPortfolio
+)
+from investment_portfolio.ledger import Ledger
+from pipeline.pipeline import JOBS, Pipeline, Stage
+from prices.prices import PRICES_FILE, PriceStore
+from companies.companies import get_companies, read_companies
 from brokers.brokers import get_brokers
-from utils.utils import read_trade_confirmation
-from os.path import dirname, realpath
+from storage.storage import get_storage
+from utils.dividends import WORKERS
+from utils.executor import PROCESSES
+from utils.instrumentation import RUN, stage
+from utils.utils import create_folder, file_hash, read_trade_confirmation
+from utils.watcher import DirectoryWatcher
+from os import listdir
+from os.path import dirname, exists, realpath
+from time import perf_counter
 
 HOME = dirname(realpath(__file__))
 COMPANIES_FILE = HOME + "/../data/companies.json"
@@ -10,9 +27,266 @@ BROKERS_FILE = HOME + "/../data/brokers.json"
 TC_DIR = HOME + "/../data/trade-confirmation/"
 IP_DIR = HOME + "/../data/investment-portfolio/"
 EH_DIR = HOME + "/../data/earnings-history/"
+TC_CACHE = HOME + "/../data/cache/trade-confirmations.pickle"
+PRICES_DIR = HOME + "/../data/prices/"
+REPORT_FILE = HOME + "/../data/cache/run-report.json"
+PROFILE_FILE = HOME + "/../data/cache/run.prof"
+
+PIPELINE_DIR = HOME + "/../data/cache/pipeline/"
+
+def earnings_hashes(dir: str, prefixes: list) -> Dict[str, str]:
+    """
+    This function calculates the content hash of the earnings files that
+    start with the prefixes
+    """
+    return {
+        file: file_hash(dir + file) for file in sorted(listdir(dir))
+            if file.endswith(".csv") and file.startswith(tuple(prefixes))
+    }
+
+def pipeline(
+    args: argparse.Namespace, portfolio: InvestmentPortfolio
+) -> Pipeline:
+    """
+    This function describes the run as a DAG of stages. The earnings of the
+    companies due in their schedule are refreshed once a day, and the stages
+    of the investment portfolio share it, so they run one at a time
+    """
+    create_folder(EH_DIR)
+
+    def registries(results: Dict) -> tuple:
+        with stage("read_registries"):
+            return read_companies(COMPANIES_FILE), get_brokers(BROKERS_FILE)
+
+    def trade_confirmations(results: Dict) -> Dict:
+        companies, brokers = results["registries"]
+        with stage("read_trade_confirmations"):
+            return read_trade_confirmation(
+                TC_DIR,
+                TC_CACHE,
+                brokers=[broker["id"] for broker in brokers],
+                symbols=[company["symbol"] for company in companies]
+            )
+
+    def earnings(results: Dict) -> Dict:
+        with stage("get_companies"):
+            get_companies(
+                results["registries"][0], EH_DIR, args.workers,
+                limit=args.fetch_limit
+            )
+        return earnings_hashes(EH_DIR, ["dividends-", "bonus-"])
+
+    def corporate_actions(results: Dict) -> Dict:
+        return earnings_hashes(EH_DIR, ["bonus-", "actions-"])
+
+    def prices(results: Dict) -> PriceStore:
+        with stage("prices"):
+            store = PriceStore(PRICES_DIR)
+            store.import_csv(args.prices)
+        return store
+
+    def ledgers(results: Dict) -> Ledger:
+        return portfolio.update_ledgers(results["trade_confirmations"])
+
+    def view(name: str) -> Stage:
+        def create(results: Dict) -> None:
+            portfolio.ledger = results["ledgers"]
+            portfolio.prices = results.get("prices")
+            portfolio.create_views([name])
+        requires = ["ledgers"] + {
+            "dividends_story": ["earnings"], "market_value": ["prices"]
+        }.get(name, [])
+        return Stage(
+            name, create, requires,
+            dirty=lambda: any(portfolio.pending(name)),
+            resource="investment_portfolio"
+        )
+
+    return Pipeline(
+        [
+            Stage(
+                "registries", registries,
+                inputs=[COMPANIES_FILE, BROKERS_FILE]
+            ),
+            Stage(
+                "trade_confirmations", trade_confirmations, ["registries"],
+                inputs=[TC_DIR], suffix=".json"
+            ),
+            Stage(
+                "earnings", earnings, ["registries"],
+                params=[date.today().isoformat(), args.fetch_limit]
+            ),
+            Stage(
+                "corporate_actions", corporate_actions, ["earnings"],
+                inputs=[EH_DIR]
+            ),
+            Stage(
+                "prices", prices, inputs=args.prices, params=args.prices,
+                # Without files there is nothing to import, and the store
+                # is only built again when it was removed
+                dirty=lambda: (
+                    bool(args.prices) and not exists(PRICES_DIR + PRICES_FILE)
+                )
+            ),
+            Stage(
+                "ledgers", ledgers,
+                ["trade_confirmations", "corporate_actions"],
+                dirty=lambda: not all(
+                    exists(IP_DIR + file)
+                        for file in ["manifest.json", "ledger.pickle"]
+                ),
+                resource="investment_portfolio"
+            ),
+        ] + [view(name) for name in VIEWS],
+        PIPELINE_DIR,
+        args.jobs
+    )
+
+def watch(args: argparse.Namespace, dag: Pipeline) -> None:
+    """
+    This function runs the pipeline again each time the trade confirmations
+    change. The earnings are kept, so only the changed trade confirmations
+    are read and validated, and only the views of their symbols are
+    calculated again. An invalid trade confirmation is reported, and it is
+    read again when it changes
+    """
+    watcher = DirectoryWatcher(TC_DIR)
+    print(f"[MAIN] I am watching the trade confirmations in {TC_DIR}")
+    try:
+        while True:
+            files = watcher.wait()
+            print(f"[MAIN] The trade confirmations changed: {' '.join(files)}")
+            start = perf_counter()
+            try:
+                with stage("watch"):
+                    dag.run(args.target, keep=args.keep + ["earnings"])
+            except ValueError as e:
+                print(e)
+                continue
+            print(
+                f"[MAIN] I am done with the changes in "
+                f"{perf_counter() - start:.3f} s"
+            )
+    except KeyboardInterrupt:
+        print("[MAIN] I am no longer watching the trade confirmations")
+    finally:
+        watcher.close()
+
+def run(args: argparse.Namespace) -> None:
+    # The process pool of the portfolio is kept for every stage and every
+    # change watched, and it is closed at the end of the run
+    with InvestmentPortfolio(
+        IP_DIR, None, get_storage(IP_DIR, args.storage), None, args.processes
+    ) as portfolio:
+        dag = pipeline(args, portfolio)
+        status = dag.run(args.target, args.force, args.keep)
+        for name, result in status.items():
+            print(f"[MAIN] {name}: {result}")
+        if args.watch:
+            watch(args, dag)
 
 if __name__ == "__main__":
-    trade_confirmations = read_trade_confirmation(TC_DIR)
-    companies = get_companies(COMPANIES_FILE, trade_confirmations, EH_DIR)
-    brokers = get_brokers(BROKERS_FILE, trade_confirmations)
-    investment_portfolio = InvestmentPortfolio(IP_DIR, trade_confirmations)
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "target",
+        nargs="*",
+        help="stages to bring up to date with the stages they require "
+            "(default: all of them)"
+    )
+    parser.add_argument(
+        "--force",
+        nargs="*",
+        default=[],
+        help="stages run even when they are up to date"
+    )
+    parser.add_argument(
+        "--keep",
+        nargs="*",
+        default=[],
+        help="stages whose last result is used even when they are out of "
+            "date, such as earnings to work offline"
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="keep running, and apply the trade confirmations as they are "
+            "added, changed or removed"
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=JOBS,
+        help="stages run at the same time"
+    )
+    parser.add_argument(
+        "--storage",
+        choices=["csv", "sqlite"],
+        help="storage of the investment portfolio (default: sqlite if "
+            "its database exists, csv otherwise)"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=WORKERS,
+        help="earnings pages downloaded at the same time"
+    )
+    parser.add_argument(
+        "--fetch-limit",
+        type=int,
+        help="earnings pages downloaded at most, besides the ones of the new "
+            "companies (default: every company that is due)"
+    )
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=PROCESSES,
+        help="processes that write the files of the symbols (default: the "
+            "number of CPUs)"
+    )
+    parser.add_argument(
+        "--prices",
+        nargs="*",
+        default=[],
+        help="semicolon CSV files with date, symbol and close columns added "
+            "to the price history"
+    )
+    parser.add_argument(
+        "--report",
+        default=REPORT_FILE,
+        help="JSON file with the timing of the stages and symbols and the "
+            "counters of the run"
+    )
+    parser.add_argument(
+        "--memory",
+        action="store_true",
+        help="trace the peak memory of each stage (the stages run one at a "
+            "time)"
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help=f"write a cProfile dump of the run to {PROFILE_FILE} (the "
+            "stages run one at a time)"
+    )
+    args = parser.parse_args()
+    if (args.profile or args.memory) and args.jobs > 1:
+        # cProfile only follows the main thread, and the peak memory is
+        # traced for the whole process, so the stages run one at a time
+        print("[MAIN] I am running the stages one at a time to trace them")
+        args.jobs = 1
+
+    RUN.reset(memory=args.memory)
+    profile = cProfile.Profile() if args.profile else None
+    try:
+        if profile is not None:
+            profile.enable()
+        run(args)
+    finally:
+        if profile is not None:
+            profile.disable()
+            create_folder(dirname(PROFILE_FILE) + "/")
+            profile.dump_stats(PROFILE_FILE)
+            print(f"[MAIN] I am writing the profile to {PROFILE_FILE}")
+        create_folder(dirname(args.report) + "/")
+        RUN.save(args.report)
+        print(f"[MAIN] I am writing the run report to {args.report}")
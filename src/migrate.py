@@ -0,0 +1,30 @@
+import argparse
+from storage.storage import TABLES, CSVStorage, SQLiteStorage
+from os.path import dirname, realpath
+
+HOME = dirname(realpath(__file__))
+IP_DIR = HOME + "/../data/investment-portfolio/"
+
+def migrate(dir: str) -> None:
+    """
+    This function copies the CSV tree of the investment portfolio into the
+    SQLite database, in a single transaction
+    """
+    csv = CSVStorage(dir)
+    sqlite = SQLiteStorage(dir)
+    with sqlite.transaction():
+        for table in TABLES:
+            symbols = csv.symbols(table) if TABLES[table].get("symbol") \
+                else [None]
+            print(f"[MIGRATE] I am migrating the {table} table")
+            for symbol in symbols:
+                if csv.exists(table, symbol):
+                    sqlite.write(table, csv.read(table, symbol), symbol)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Migrate the CSV investment portfolio to SQLite"
+    )
+    parser.add_argument("--dir", default=IP_DIR)
+    args = parser.parse_args()
+    migrate(args.dir)
@@ -0,0 +1,242 @@
+import hashlib
+import json
+import pickle
+import threading
+from contextlib import nullcontext
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from os import walk
+from os.path import (
+    abspath, exists, getmtime, getsize, isdir, join, relpath
+)
+from time import perf_counter
+from typing import Any, Callable, Dict, Iterable, List
+from utils.utils import create_folder, file_hash
+
+# Stages run at the same time, when they do not depend on each other
+JOBS = 4
+
+def path_fingerprint(path: str, suffix: str = "") -> str:
+    """
+    This function fingerprints a file by its content, and a folder by the
+    names, sizes and modification times of its files with the suffix
+    """
+    if not exists(path):
+        return ""
+    if not isdir(path):
+        return file_hash(path)
+    sha = hashlib.sha256()
+    for root, folders, files in walk(path):
+        folders.sort()
+        for file in sorted(files):
+            if not file.endswith(suffix):
+                continue
+            file = join(root, file)
+            sha.update(
+                f"{relpath(file, path)}:{getsize(file)}:{getmtime(file)}\n"
+                    .encode()
+            )
+    return sha.hexdigest()
+
+class Stage:
+    """
+    This class is a stage of the pipeline. Its function receives the results
+    of the stages it requires, by name, and returns its own result. The
+    files and folders it reads are its inputs, and the params are any other
+    values its result depends on. A stage is out of date when its dirty
+    check is true, and the stages that share a resource never run at the
+    same time. Only the files with the suffix are read in the folders
+    """
+    def __init__(
+        self,
+        name: str,
+        function: Callable[[Dict[str, Any]], Any],
+        requires: Iterable[str] = (),
+        inputs: Iterable[str] = (),
+        params: Any = None,
+        dirty: Callable[[], bool] = None,
+        resource: str = None,
+        suffix: str = ""
+    ) -> None:
+        self.name = name
+        self.function = function
+        self.requires = list(requires)
+        self.inputs = list(inputs)
+        self.params = params
+        self.dirty = dirty
+        self.resource = resource
+        self.suffix = suffix
+
+class Pipeline:
+    """
+    This class runs the stages of a DAG the way make does: a stage only
+    runs when its inputs, its params or the results of the stages it
+    requires changed since its last run. The result of each stage is kept
+    with a fingerprint of its content, so a stage that runs again with the
+    same result does not make the next stages run. The stages whose
+    required stages are done run at the same time, unless there is a single
+    job
+    """
+    def __init__(
+        self, stages: List[Stage], dir: str, jobs: int = JOBS
+    ) -> None:
+        self.stages = {stage.name: stage for stage in stages}
+        self.dir = create_folder(dir)
+        self.state_file = self.dir + "state.json"
+        self.jobs = max(1, jobs)
+        self.lock = threading.Lock()
+        self.resources = {
+            stage.resource: threading.Lock()
+                for stage in stages if stage.resource is not None
+        }
+
+    def order(self, targets: Iterable[str] = None) -> List[str]:
+        """
+        This function sorts the targets and the stages they require, so each
+        stage comes after the stages it requires
+        """
+        order = []
+        visiting = set()
+
+        def visit(name: str) -> None:
+            if name in order:
+                return
+            if not name in self.stages:
+                raise ValueError(f"[PIPELINE] The stage {name} does not exist")
+            if name in visiting:
+                raise ValueError(f"[PIPELINE] The stage {name} is in a cycle")
+            visiting.add(name)
+            for required in self.stages[name].requires:
+                visit(required)
+            visiting.discard(name)
+            order.append(name)
+
+        for name in targets if targets else self.stages:
+            visit(name)
+        return order
+
+    def load_state(self) -> Dict:
+        if not exists(self.state_file):
+            return {}
+        with open(self.state_file) as f:
+            return json.load(f)
+
+    def save_state(self) -> None:
+        with open(self.state_file, "w") as f:
+            json.dump(self.state, f, indent=2, sort_keys=True)
+
+    def result_file(self, name: str) -> str:
+        return self.dir + name + ".pickle"
+
+    def result(self, name: str) -> Any:
+        """
+        This function returns the result of a stage, which is read from its
+        file when the stage was up to date
+        """
+        with self.lock:
+            if not name in self.results:
+                with open(self.result_file(name), "rb") as f:
+                    self.results[name] = pickle.load(f)
+            return self.results[name]
+
+    def key(self, stage: Stage) -> str:
+        """
+        This function fingerprints what the result of a stage depends on
+        """
+        with self.lock:
+            required = {
+                name: self.state[name]["result"] for name in stage.requires
+            }
+        return hashlib.sha256(json.dumps({
+            "inputs": {
+                abspath(path): path_fingerprint(path, stage.suffix)
+                    for path in stage.inputs
+            },
+            "params": stage.params,
+            "requires": required
+        }, sort_keys=True, default=str).encode()).hexdigest()
+
+    def is_updated(self, stage: Stage, key: str) -> bool:
+        with self.lock:
+            state = self.state.get(stage.name)
+        if state is None or not exists(self.result_file(stage.name)):
+            return False
+        if stage.name in self.keep:
+            return True
+        if stage.name in self.force:
+            return False
+        if stage.dirty is not None and stage.dirty():
+            return False
+        return state["key"] == key
+
+    def build(self, name: str) -> str:
+        """
+        This function runs a stage if it is out of date
+        """
+        stage = self.stages[name]
+        key = self.key(stage)
+        if self.is_updated(stage, key):
+            print(f"[PIPELINE] The stage {name} is up to date")
+            return "up to date"
+        print(f"[PIPELINE] I am running the stage {name}")
+        results = {
+            required: self.result(required) for required in stage.requires
+        }
+        with self.resources.get(stage.resource) or nullcontext():
+            start = perf_counter()
+            result = stage.function(results)
+            duration = perf_counter() - start
+        data = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+        with open(self.result_file(name), "wb") as f:
+            f.write(data)
+        with self.lock:
+            self.results[name] = result
+            self.state[name] = {
+                "key": key,
+                "result": hashlib.sha256(data).hexdigest(),
+                "duration": round(duration, 6)
+            }
+            self.save_state()
+        return "run"
+
+    def run(
+        self,
+        targets: Iterable[str] = None,
+        force: Iterable[str] = (),
+        keep: Iterable[str] = ()
+    ) -> Dict[str, str]:
+        """
+        This function brings the targets up to date, with every stage by
+        default. The forced stages run even when they are up to date, and
+        the kept stages use their last result even when they are out of
+        date. It returns whether each stage was run or was up to date
+        """
+        order = self.order(targets)
+        self.force = set(force)
+        self.keep = set(keep)
+        self.state = self.load_state()
+        self.results = {}
+        status = {}
+        if self.jobs == 1:
+            # The stages run on the calling thread, one at a time and in the
+            # order of their requirements, so they can be profiled
+            for name in order:
+                status[name] = self.build(name)
+            return status
+        running = {}
+        with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+            while len(status) < len(order):
+                for name in order:
+                    if name in status or name in running.values():
+                        continue
+                    if all(r in status for r in self.stages[name].requires):
+                        running[executor.submit(self.build, name)] = name
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        status[name] = future.result()
+                    except Exception:
+                        # The stages already running are finished first
+                        wait(running)
+                        raise
+        return {name: status[name] for name in order}
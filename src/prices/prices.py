@@ -0,0 +1,141 @@
+from os import replace
+from os.path import exists
+from typing import List, Tuple
+import numpy as np
+import pandas as pd
+from utils.utils import create_folder
+
+PRICES_FILE = "prices.npz"
+
+def forward_fill(close: np.ndarray) -> np.ndarray:
+    """
+    This function fills the days without a price of each symbol with its
+    last price. The days before the first price are kept missing
+    """
+    rows = np.where(~np.isnan(close), np.arange(len(close))[:, None], 0)
+    rows = np.maximum.accumulate(rows, axis=0)
+    return close[rows, np.arange(close.shape[1])]
+
+class PriceStore:
+    """
+    This class keeps the closing prices of the symbols as a matrix of dates
+    by symbols, in a single numpy file. New prices are appended to it, and
+    the prices of the same date and symbol are replaced
+    """
+    def __init__(self, dir: str) -> None:
+        self.dir = create_folder(dir)
+        self.file = self.dir + PRICES_FILE
+        if exists(self.file):
+            with np.load(self.file) as data:
+                self.days = data["days"]
+                self.symbols = data["symbols"].astype(str)
+                self.close = data["close"]
+        else:
+            self.days = np.array([], dtype=np.int64)
+            self.symbols = np.array([], dtype=str)
+            self.close = np.empty((0, 0), dtype=np.float64)
+
+    def __len__(self) -> int:
+        return len(self.days)
+
+    @property
+    def dates(self) -> np.ndarray:
+        return self.days.astype("datetime64[D]")
+
+    def save(self) -> None:
+        # The file is replaced at once, so a reader never sees half of it
+        with open(self.file + ".tmp", "wb") as f:
+            np.savez(
+                f, days=self.days, symbols=self.symbols, close=self.close
+            )
+        replace(self.file + ".tmp", self.file)
+
+    def append(self, df: pd.DataFrame) -> int:
+        """
+        This function adds the prices of a dataframe with date, symbol and
+        close columns, and returns how many prices were added or replaced
+        """
+        df = df.dropna(subset=["close"])
+        if df.empty:
+            return 0
+        days = pd.to_datetime(df["date"], format="ISO8601") \
+            .to_numpy(dtype="datetime64[D]").astype(np.int64)
+        symbols = np.asarray(df["symbol"].astype(str), dtype=str)
+        all_days = np.union1d(self.days, days)
+        all_symbols = np.union1d(self.symbols, symbols)
+        if len(all_days) != len(self.days) \
+                or len(all_symbols) != len(self.symbols):
+            close = np.full((len(all_days), len(all_symbols)), np.nan)
+            close[np.ix_(
+                np.searchsorted(all_days, self.days),
+                np.searchsorted(all_symbols, self.symbols)
+            )] = self.close
+            self.days, self.symbols, self.close = all_days, all_symbols, close
+        self.close[
+            np.searchsorted(self.days, days),
+            np.searchsorted(self.symbols, symbols)
+        ] = df["close"].to_numpy(dtype=np.float64)
+        self.save()
+        return len(df)
+
+    def import_csv(self, files: List[str]) -> int:
+        """
+        This function adds the prices of semicolon CSV files with date,
+        symbol and close columns
+        """
+        if not files:
+            return 0
+        return self.append(pd.concat(
+            [pd.read_csv(file, sep=";", float_precision="round_trip")
+                for file in files],
+            ignore_index=True
+        ))
+
+    def last_dates(self) -> pd.Series:
+        """
+        This function finds the last date with a price of each symbol, so
+        only the newer prices have to be fetched
+        """
+        has_price = ~np.isnan(self.close)
+        last = len(self.close) - 1 - np.argmax(has_price[::-1], axis=0)
+        return pd.Series(
+            np.where(
+                has_price.any(axis=0),
+                self.days[last] if len(self) else 0,
+                np.iinfo(np.int64).min
+            ).astype("datetime64[D]"),
+            index=self.symbols
+        )
+
+    def matrix(
+        self,
+        symbols: List[str] = None,
+        date_from: str = None,
+        date_to: str = None
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        This function returns the dates, the symbols and the matrix of their
+        prices between date_from and date_to, with the days without a price
+        filled with the last one. The unknown symbols have no prices
+        """
+        close = forward_fill(self.close)
+        start, end = 0, len(self.days)
+        if date_from is not None:
+            start = np.searchsorted(
+                self.days, np.datetime64(date_from, "D").astype(np.int64)
+            )
+        if date_to is not None:
+            end = np.searchsorted(
+                self.days,
+                np.datetime64(date_to, "D").astype(np.int64),
+                side="right"
+            )
+        if symbols is None:
+            return self.dates[start:end], self.symbols, close[start:end]
+        symbols = np.asarray(symbols, dtype=str)
+        columns = np.searchsorted(self.symbols, symbols)
+        known = columns < len(self.symbols)
+        known[known] = self.symbols[columns[known]] == symbols[known]
+        matrix = np.full((end - start, len(symbols)), np.nan)
+        matrix[:, known] = close[start:end, columns[known]]
+        return self.dates[start:end], symbols, matrix
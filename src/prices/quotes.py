@@ -0,0 +1,176 @@
+import json
+import threading
+from os import replace
+from os.path import dirname, exists, getmtime
+from time import time
+from typing import Dict, List
+import numpy as np
+import pandas as pd
+from prices.prices import PriceStore
+from utils.instrumentation import count
+from utils.utils import create_folder
+
+# Seconds a quote is used before it is fetched again
+QUOTE_TTL = 15 * 60
+
+class QuoteProvider:
+    """
+    This class is the interface of the sources of the last prices
+    """
+    def get_quotes(self, symbols: List[str]) -> Dict[str, float]:
+        """
+        This function fetches the last price of the symbols at once. The
+        symbols without a price are left out
+        """
+        raise NotImplementedError
+
+class YahooQuoteProvider(QuoteProvider):
+    """
+    This class fetches the last prices from Yahoo Finance, in a single
+    download for all the symbols
+    """
+    def __init__(self, suffix: str = ".SA") -> None:
+        self.suffix = suffix
+
+    def get_quotes(self, symbols: List[str]) -> Dict[str, float]:
+        import yfinance as yf
+        if not symbols:
+            return {}
+        tickers = [symbol + self.suffix for symbol in symbols]
+        df = yf.download(
+            tickers, period="5d", group_by="column", progress=False
+        )["Close"]
+        if isinstance(df, pd.Series):
+            df = df.to_frame(tickers[0])
+        df = df.ffill()
+        quotes = {}
+        for symbol, ticker in zip(symbols, tickers):
+            if ticker in df and not np.isnan(df[ticker].iloc[-1]):
+                quotes[symbol] = float(df[ticker].iloc[-1])
+        return quotes
+
+class LocalQuoteProvider(QuoteProvider):
+    """
+    This class reads the last prices from the local price history, so the
+    quotes are available without network
+    """
+    def __init__(self, prices: PriceStore) -> None:
+        self.prices = prices
+
+    def get_quotes(self, symbols: List[str]) -> Dict[str, float]:
+        _, symbols, close = self.prices.matrix(symbols)
+        if len(close) == 0:
+            return {}
+        return {
+            str(symbol): float(price)
+                for symbol, price in zip(symbols, close[-1])
+                if not np.isnan(price)
+        }
+
+class QuoteCache:
+    """
+    This class keeps the quotes of a provider in memory and in a file, so
+    they are shared by the sessions and the processes. The missing quotes
+    are fetched at once. The quotes older than ttl are fetched again, or,
+    with stale_while_revalidate, returned while they are fetched in the
+    background
+    """
+    def __init__(
+        self,
+        provider: QuoteProvider,
+        file: str = None,
+        ttl: float = QUOTE_TTL,
+        stale_while_revalidate: bool = False
+    ) -> None:
+        self.provider = provider
+        self.file = file
+        self.ttl = ttl
+        self.stale_while_revalidate = stale_while_revalidate
+        self.lock = threading.Lock()
+        self.refreshing = set()
+        self.mtime = None
+        self.quotes = self.load()
+
+    def load(self) -> Dict[str, list]:
+        """
+        This function reads the quotes of the file when it changed since it
+        was last read
+        """
+        if self.file is None or not exists(self.file):
+            return {}
+        mtime = getmtime(self.file)
+        if mtime == self.mtime:
+            return {}
+        with open(self.file) as f:
+            quotes = json.load(f)
+        self.mtime = mtime
+        return quotes
+
+    def save(self) -> None:
+        if self.file is None:
+            return
+        create_folder(dirname(self.file) + "/")
+        with open(self.file + ".tmp", "w") as f:
+            json.dump(self.quotes, f)
+        replace(self.file + ".tmp", self.file)
+        self.mtime = getmtime(self.file)
+
+    def fetch(self, symbols: List[str]) -> None:
+        try:
+            quotes = self.provider.get_quotes(symbols)
+        except Exception as e:
+            print(f"[QUOTES] I could not get the quotes of {symbols}: {e}")
+            with self.lock:
+                self.refreshing.difference_update(symbols)
+            return
+        now = time()
+        with self.lock:
+            for symbol in symbols:
+                if symbol in quotes:
+                    self.quotes[symbol] = [quotes[symbol], now]
+                else:
+                    # The symbols without a price are not asked again
+                    # before ttl, and they keep their last quote, if any
+                    self.quotes[symbol] = [
+                        self.quotes.get(symbol, [None])[0], now
+                    ]
+            self.refreshing.difference_update(symbols)
+            self.save()
+
+    def revalidate(self, symbols: List[str]) -> None:
+        with self.lock:
+            symbols = [s for s in symbols if s not in self.refreshing]
+            self.refreshing.update(symbols)
+        if symbols:
+            threading.Thread(
+                target=self.fetch, args=(symbols,), daemon=True
+            ).start()
+
+    def get(self, symbols: List[str]) -> Dict[str, float]:
+        """
+        This function returns the quotes of the symbols. The ones without
+        a quote are left out
+        """
+        # Other processes may have fetched quotes in the meantime
+        with self.lock:
+            for symbol, quote in self.load().items():
+                if quote[1] > self.quotes.get(symbol, [0, 0])[1]:
+                    self.quotes[symbol] = quote
+            now = time()
+            missing = [s for s in symbols if s not in self.quotes]
+            stale = [
+                s for s in symbols
+                    if s in self.quotes and now - self.quotes[s][1] >= self.ttl
+            ]
+        count("quote_cache_hits", len(symbols) - len(missing) - len(stale))
+        if self.stale_while_revalidate:
+            self.revalidate(stale)
+        else:
+            missing += stale
+        if missing:
+            self.fetch(missing)
+        with self.lock:
+            return {
+                s: self.quotes[s][0] for s in symbols
+                    if self.quotes.get(s, [None])[0] is not None
+            }
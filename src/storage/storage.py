@@ -0,0 +1,525 @@
+import sqlite3
+from contextlib import contextmanager
+from os import getpid, listdir, remove, replace
+from os.path import exists, getmtime, getsize, join
+from time import time
+from typing import Dict, List
+import pandas as pd
+from utils.executor import SymbolExecutor
+from utils.instrumentation import count
+from utils.utils import create_folder, merge_sorted
+
+# The tables of the investment portfolio. The ledgers are sorted by date and
+# tc_name, and the tables with symbol are stored by symbol
+TABLES = {
+    "fees": {
+        "file": "fees.csv", "date": "date", "ledger": True
+    },
+    "spent_values": {
+        "file": "spent_values.csv", "date": "date", "ledger": True
+    },
+    "portfolio": {
+        "file": "portfolios/portfolio-{symbol}.csv", "date": "date",
+        "ledger": True, "symbol": True
+    },
+    "consolidated_portfolio": {
+        "file": "consolidated_portfolio.csv"
+    },
+    "anual_amounts": {
+        "file": "anual_amounts/portfolio-{symbol}.csv", "symbol": True
+    },
+    "story": {
+        "file": "stories/portfolio-{symbol}.csv", "date": "date",
+        "symbol": True
+    },
+    "dividends_story": {
+        "file": "stories/dividends-{symbol}.csv", "date": "prev_date",
+        "symbol": True
+    },
+    "profits": {
+        "file": "profits/profits-{symbol}.csv", "date": "date",
+        "symbol": True
+    },
+    "symbol_monthly_profits": {
+        "file": "symbol_monthly_profits.csv"
+    },
+    "monthly_profits": {
+        "file": "monthly_profits.csv"
+    },
+    "income": {
+        "file": "income.csv"
+    },
+    "market_value": {
+        "file": "market_value.csv", "date": "date"
+    },
+}
+
+SQLITE_FILE = "portfolio.db"
+
+def filter_dataframe(
+    df: pd.DataFrame,
+    date_column: str = None,
+    date_from: str = None,
+    date_to: str = None,
+    tc_name: str = None
+) -> pd.DataFrame:
+    """
+    This function filters the records by a date range and a trade confirmation
+    """
+    if date_from is not None:
+        df = df.loc[df[date_column] >= date_from]
+    if date_to is not None:
+        df = df.loc[df[date_column] <= date_to]
+    if tc_name is not None:
+        df = df.loc[remove_mask(df, {tc_name})]
+    return df
+
+def remove_mask(df: pd.DataFrame, tc_names: set) -> pd.Series:
+    """
+    This function marks the records of the trade confirmations. The operations
+    are recorded as <tc_name>-<counter>, so they are marked by the name
+    without the counter
+    """
+    names = df["tc_name"].astype(str)
+    return names.isin(tc_names) \
+        | names.str.rsplit("-", n=1).str[0].isin(tc_names)
+
+def write_csv(file: str, df: pd.DataFrame) -> int:
+    """
+    This function writes a semicolon CSV file atomically. The records are
+    written to a temporary file in the same folder, which then replaces the
+    file, so a reader never sees a half-written file. It returns the size of
+    the file
+    """
+    tmp = f"{file}.{getpid()}.tmp"
+    try:
+        df.to_csv(tmp, sep=";", index=False)
+        replace(tmp, file)
+    except BaseException:
+        if exists(tmp):
+            remove(tmp)
+        raise
+    return getsize(file)
+
+def sql_type(column: pd.Series) -> str:
+    # SQLite keeps the booleans as integers, so they are declared to be read
+    # back as booleans
+    if pd.api.types.is_bool_dtype(column):
+        return "BOOLEAN"
+    if pd.api.types.is_integer_dtype(column):
+        return "INTEGER"
+    if pd.api.types.is_float_dtype(column):
+        return "REAL"
+    return "TEXT"
+
+class Storage:
+    """
+    This class is the interface of the storage of the investment portfolio
+    """
+    def symbols(self, table: str) -> List[str]:
+        raise NotImplementedError
+
+    def exists(self, table: str, symbol: str = None) -> bool:
+        raise NotImplementedError
+
+    def updated(self, table: str, symbol: str = None) -> float:
+        """
+        This function returns when the records were written, or None
+        """
+        raise NotImplementedError
+
+    def read(
+        self,
+        table: str,
+        symbol: str = None,
+        date_from: str = None,
+        date_to: str = None,
+        tc_name: str = None
+    ) -> pd.DataFrame:
+        raise NotImplementedError
+
+    def read_many(self, table: str, symbols: List[str]) -> pd.DataFrame:
+        """
+        This function reads the records of many symbols at once
+        """
+        dfs = [
+            self.read(table, symbol) for symbol in symbols
+                if self.exists(table, symbol)
+        ]
+        return pd.concat(dfs, ignore_index=True) if dfs else pd.DataFrame({})
+
+    def write(self, table: str, df: pd.DataFrame, symbol: str = None) -> None:
+        """
+        This function replaces the records
+        """
+        raise NotImplementedError
+
+    def write_many(
+        self,
+        table: str,
+        frames: Dict[str, pd.DataFrame],
+        executor: SymbolExecutor = None
+    ) -> None:
+        """
+        This function replaces the records of many symbols
+        """
+        for symbol, df in frames.items():
+            self.write(table, df, symbol)
+
+    def delete(self, table: str, symbol: str = None) -> None:
+        raise NotImplementedError
+
+    def merge(
+        self,
+        table: str,
+        records: List[pd.DataFrame],
+        removed: set,
+        symbol: str = None
+    ) -> None:
+        """
+        This function removes the records of the removed trade confirmations
+        and the previous records of the trade confirmations in records, and
+        merges the new ones into the ledger. A ledger without records is
+        deleted
+        """
+        raise NotImplementedError
+
+    @contextmanager
+    def transaction(self):
+        yield
+
+class CSVStorage(Storage):
+    """
+    This class stores each table in semicolon CSV files
+    """
+    def __init__(self, dir: str) -> None:
+        self.dir = create_folder(dir)
+        for folder in [
+            "portfolios/", "anual_amounts/", "stories/", "profits/"
+        ]:
+            create_folder(dir + folder)
+
+    def file(self, table: str, symbol: str = None) -> str:
+        return self.dir + TABLES[table]["file"].format(symbol=symbol)
+
+    def symbols(self, table: str) -> List[str]:
+        folder, pattern = TABLES[table]["file"].split("/")
+        prefix, suffix = pattern.split("{symbol}")
+        return sorted(
+            file[len(prefix):-len(suffix)]
+                for file in listdir(self.dir + folder)
+                if file.startswith(prefix) and file.endswith(suffix)
+        )
+
+    def exists(self, table: str, symbol: str = None) -> bool:
+        return exists(self.file(table, symbol))
+
+    def updated(self, table: str, symbol: str = None) -> float:
+        file = self.file(table, symbol)
+        return getmtime(file) if exists(file) else None
+
+    def read(
+        self,
+        table: str,
+        symbol: str = None,
+        date_from: str = None,
+        date_to: str = None,
+        tc_name: str = None
+    ) -> pd.DataFrame:
+        df = pd.read_csv(
+            self.file(table, symbol), sep=";", float_precision="round_trip"
+        )
+        count("files_read")
+        return filter_dataframe(
+            df, TABLES[table].get("date"), date_from, date_to, tc_name
+        )
+
+    def write(self, table: str, df: pd.DataFrame, symbol: str = None) -> None:
+        size = write_csv(self.file(table, symbol), df)
+        count("files_written")
+        count("bytes_written", size)
+
+    def write_many(
+        self,
+        table: str,
+        frames: Dict[str, pd.DataFrame],
+        executor: SymbolExecutor = None
+    ) -> None:
+        """
+        This function replaces the files of many symbols, which are written
+        by the executor
+        """
+        if executor is None:
+            executor = SymbolExecutor(1)
+        sizes = executor.map(
+            write_csv,
+            [self.file(table, symbol) for symbol in frames],
+            frames.values()
+        )
+        count("files_written", len(sizes))
+        count("bytes_written", sum(sizes))
+
+    def delete(self, table: str, symbol: str = None) -> None:
+        if self.exists(table, symbol):
+            remove(self.file(table, symbol))
+
+    def merge(
+        self,
+        table: str,
+        records: List[pd.DataFrame],
+        removed: set,
+        symbol: str = None
+    ) -> None:
+        if not self.exists(table, symbol):
+            if records:
+                df = pd.concat(records)
+                self.write(table, merge_sorted(df.iloc[0:0], df), symbol)
+            return
+        df_prev = self.read(table, symbol)
+        tc_names = set(removed)
+        if records:
+            df = pd.concat(records)
+            tc_names |= set(df["tc_name"])
+        df_prev = df_prev.loc[~remove_mask(df_prev, tc_names)]
+        if records:
+            df_prev = merge_sorted(df_prev, df)
+        if df_prev.empty:
+            self.delete(table, symbol)
+        else:
+            self.write(table, df_prev, symbol)
+
+class SQLiteStorage(Storage):
+    """
+    This class stores each table in a SQLite database, with indexes by
+    symbol, date and tc_name
+    """
+    def __init__(self, dir: str) -> None:
+        self.dir = create_folder(dir)
+        self.conn = sqlite3.connect(
+            join(dir, SQLITE_FILE), check_same_thread=False
+        )
+        self.in_transaction = False
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS _updated "
+            "(tbl TEXT, symbol TEXT, updated REAL, PRIMARY KEY (tbl, symbol))"
+        )
+        self.conn.commit()
+
+    def has_table(self, table: str) -> bool:
+        return self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+            (table,)
+        ).fetchone() is not None
+
+    def booleans(self, table: str, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        This function restores the boolean columns of the records read
+        """
+        for row in self.conn.execute(f"PRAGMA table_info({table})"):
+            column = row[1]
+            if row[2] == "BOOLEAN" and column in df.columns \
+                    and df[column].notna().all():
+                df[column] = df[column].astype(bool)
+        return df
+
+    def where(self, table: str, symbol: str = None) -> tuple:
+        if TABLES[table].get("symbol"):
+            return "symbol = ?", [symbol]
+        return "1 = 1", []
+
+    def symbols(self, table: str) -> List[str]:
+        if not self.has_table(table):
+            return []
+        return [
+            row[0] for row in self.conn.execute(
+                f"SELECT DISTINCT symbol FROM {table} ORDER BY symbol"
+            )
+        ]
+
+    def exists(self, table: str, symbol: str = None) -> bool:
+        if not self.has_table(table):
+            return False
+        where, params = self.where(table, symbol)
+        return self.conn.execute(
+            f"SELECT 1 FROM {table} WHERE {where} LIMIT 1", params
+        ).fetchone() is not None
+
+    def updated(self, table: str, symbol: str = None) -> float:
+        row = self.conn.execute(
+            "SELECT updated FROM _updated WHERE tbl = ? AND symbol = ?",
+            (table, symbol or "")
+        ).fetchone()
+        return row[0] if row is not None else None
+
+    def read(
+        self,
+        table: str,
+        symbol: str = None,
+        date_from: str = None,
+        date_to: str = None,
+        tc_name: str = None
+    ) -> pd.DataFrame:
+        where, params = self.where(table, symbol)
+        date_column = TABLES[table].get("date")
+        if date_from is not None:
+            where += f" AND {date_column} >= ?"
+            params.append(date_from)
+        if date_to is not None:
+            where += f" AND {date_column} <= ?"
+            params.append(date_to)
+        if tc_name is not None:
+            # The range is the same as LIKE '<tc_name>-%', but uses the index
+            where += " AND (tc_name = ? OR (tc_name >= ? AND tc_name < ?))"
+            params += [tc_name, tc_name + "-", tc_name + "."]
+        order = "date, tc_name, rowid" if TABLES[table].get("ledger") \
+            else "rowid"
+        return self.booleans(table, pd.read_sql_query(
+            f"SELECT * FROM {table} WHERE {where} ORDER BY {order}",
+            self.conn,
+            params=params
+        ))
+
+    def read_many(self, table: str, symbols: List[str]) -> pd.DataFrame:
+        if not self.has_table(table):
+            return pd.DataFrame({})
+        symbols = list(symbols)
+        # The symbols are bound in chunks under the SQLite variables limit
+        dfs = [
+            pd.read_sql_query(
+                f"SELECT * FROM {table} WHERE symbol IN "
+                f"({', '.join('?' for _ in chunk)}) ORDER BY symbol, rowid",
+                self.conn,
+                params=chunk
+            )
+            for chunk in [
+                symbols[i:i + 500] for i in range(0, len(symbols), 500)
+            ]
+        ]
+        if not dfs:
+            return pd.DataFrame({})
+        return self.booleans(table, pd.concat(dfs, ignore_index=True))
+
+    def create_table(self, table: str, df: pd.DataFrame) -> None:
+        columns = ", ".join(
+            f'"{column}" {sql_type(df[column])}' for column in df.columns
+        )
+        self.conn.execute(f"CREATE TABLE {table} ({columns})")
+        date_column = TABLES[table].get("date")
+        indexes = [[date_column], ["tc_name"]]
+        if TABLES[table].get("symbol"):
+            indexes.append(["symbol", date_column])
+        for index in indexes:
+            index = [column for column in index if column in df.columns]
+            if index:
+                self.conn.execute(
+                    f"CREATE INDEX ix_{table}_{'_'.join(index)} "
+                    f"ON {table} ({', '.join(index)})"
+                )
+
+    def add_columns(self, table: str, df: pd.DataFrame) -> None:
+        """
+        This function adds the columns of the records that the table does
+        not have yet, since the table is created from the first records
+        written to it. The previous rows have NULL in them
+        """
+        columns = {
+            row[1] for row in self.conn.execute(f"PRAGMA table_info({table})")
+        }
+        for column in df.columns:
+            if not column in columns:
+                self.conn.execute(
+                    f'ALTER TABLE {table} ADD COLUMN "{column}" '
+                    f"{sql_type(df[column])}"
+                )
+
+    def prepare(self, table: str, df: pd.DataFrame) -> None:
+        if self.has_table(table):
+            self.add_columns(table, df)
+        else:
+            self.create_table(table, df)
+
+    def touch(self, table: str, symbol: str = None) -> None:
+        self.conn.execute(
+            "INSERT OR REPLACE INTO _updated VALUES (?, ?, ?)",
+            (table, symbol or "", time())
+        )
+
+    def insert(self, table: str, df: pd.DataFrame) -> None:
+        columns = ", ".join(f'"{column}"' for column in df.columns)
+        values = ", ".join("?" for _ in df.columns)
+        df = df.astype(object).where(df.notna(), None)
+        self.conn.executemany(
+            f"INSERT INTO {table} ({columns}) VALUES ({values})",
+            df.to_numpy().tolist()
+        )
+
+    @contextmanager
+    def transaction(self):
+        if self.in_transaction:
+            yield
+            return
+        self.in_transaction = True
+        try:
+            with self.conn:
+                yield
+        finally:
+            self.in_transaction = False
+
+    def write(self, table: str, df: pd.DataFrame, symbol: str = None) -> None:
+        with self.transaction():
+            self.prepare(table, df)
+            where, params = self.where(table, symbol)
+            self.conn.execute(f"DELETE FROM {table} WHERE {where}", params)
+            self.insert(table, df)
+            self.touch(table, symbol)
+        count("tables_written")
+        count("rows_written", len(df))
+
+    def delete(self, table: str, symbol: str = None) -> None:
+        if not self.has_table(table):
+            return
+        with self.transaction():
+            where, params = self.where(table, symbol)
+            self.conn.execute(f"DELETE FROM {table} WHERE {where}", params)
+            self.conn.execute(
+                "DELETE FROM _updated WHERE tbl = ? AND symbol = ?",
+                (table, symbol or "")
+            )
+
+    def merge(
+        self,
+        table: str,
+        records: List[pd.DataFrame],
+        removed: set,
+        symbol: str = None
+    ) -> None:
+        with self.transaction():
+            df = pd.concat(records) if records else None
+            if self.has_table(table):
+                tc_names = set(removed)
+                if df is not None:
+                    tc_names |= set(df["tc_name"])
+                where, params = self.where(table, symbol)
+                for tc_name in tc_names:
+                    self.conn.execute(
+                        f"DELETE FROM {table} WHERE {where} AND (tc_name = ? "
+                        "OR (tc_name >= ? AND tc_name < ?))",
+                        params + [tc_name, tc_name + "-", tc_name + "."]
+                    )
+            if df is not None:
+                self.prepare(table, df)
+                self.insert(table, df)
+                self.touch(table, symbol)
+
+def get_storage(dir: str, backend: str = None) -> Storage:
+    """
+    This function returns the storage of the investment portfolio. If the
+    backend is not given, SQLite is used when its database exists
+    """
+    if backend is None:
+        backend = "sqlite" if exists(join(dir, SQLITE_FILE)) else "csv"
+    if backend == "sqlite":
+        return SQLiteStorage(dir)
+    if backend == "csv":
+        return CSVStorage(dir)
+    raise ValueError(f"The storage {backend} does not exist")
@@ -1,60 +1,191 @@
 import json
 from os.path import basename
-from typing import Dict
-from trade_confirmation.utils import (
-    validate_date,
-    calculate_fees,
-    validate_operations_value,
-    validate_settlement_amount
-)
+from typing import Dict, Iterator, List
+import numpy as np
+import pandas as pd
+from trade_confirmation.utils import report_text, validate_papers
+from utils.money import DECIMALS, allocate, from_cents, to_cents
+
+# The operations of a trade confirmation, with the values in cents and
+# without fees
+PAPER_DTYPE = [
+    ("amount", np.int64), ("price", np.float64), ("value", np.int64)
+]
+# The operations of a batch of trade confirmations
+OPERATION_DTYPE = np.dtype([
+    ("tc", np.int32), ("counter", np.int32), ("symbol", np.int32),
+    ("date", "datetime64[D]"), ("amount", np.int64), ("price", np.float64),
+    ("value", np.int64), ("cost_of_fees", np.int64),
+    ("value_without_fees", np.int64), ("price_without_fees", np.float64)
+])
+
+def read_paper(file_path: str) -> Dict:
+    print(f"[TRADE CONFIRMATION] I am analyzing the paper {file_path}")
+    with open(file_path) as f:
+        return json.load(f)
+
+class Operation:
+    """
+    This class is an operation of a trade confirmation. The values are in
+    cents, and the price includes its share of the fees
+    """
+    __slots__ = (
+        "symbol", "amount", "price", "value", "cost_of_fees",
+        "value_without_fees", "price_without_fees", "counter"
+    )
+
+    def __init__(
+        self,
+        symbol: str,
+        amount: int,
+        price: float,
+        value: int,
+        cost_of_fees: int,
+        value_without_fees: int,
+        price_without_fees: float,
+        counter: int
+    ) -> None:
+        self.symbol = symbol
+        self.amount = amount
+        self.price = price
+        self.value = value
+        self.cost_of_fees = cost_of_fees
+        self.value_without_fees = value_without_fees
+        self.price_without_fees = price_without_fees
+        self.counter = counter
 
 class TradeConfirmation:
-    def __init__(self, file_path: str) -> None:
+    """
+    This class keeps a trade confirmation. Its operations are kept in a
+    structured array, and their symbols in a tuple. The paper is read and
+    validated from the file, unless it was already validated in a batch.
+    The content hash of the file is kept when it is known
+    """
+    __slots__ = (
+        "name", "file_path", "hash", "broker", "date", "fees", "fees_cost",
+        "operations_value", "settlement_amount", "symbols", "operations"
+    )
+
+    def __init__(
+        self, file_path: str, paper: Dict = None, hash: str = None
+    ) -> None:
         self.name = basename(file_path)
-        # Read json
-        print(f"[TRADE CONFIRMATION] I am analyzing the paper {file_path}")
-        f = open(file_path)
-        paper = json.load(f)
-        f.close()
-        # Read broker
+        self.file_path = file_path
+        self.hash = hash
+        if paper is None:
+            paper = read_paper(file_path)
+            report = validate_papers({file_path: paper})
+            if not report.empty:
+                raise ValueError(report_text(report))
         self.broker = paper['broker']
-        # Read date
-        self.date = validate_date(paper['date'])
-        # Read fees
+        self.date = paper['date']
         self.fees = paper['fees']
-        fees_cost = calculate_fees(self.fees)
-        # Read operations
-        self.operations = paper['operations']
+        self.fees_cost = sum(to_cents(value) for value in self.fees.values())
+        operations = paper['operations']
         self.operations_value = paper['operations_value']
-        validate_operations_value(
-            self.operations_value,
-            self.operations
-        )
-        # Check if the values match
         self.settlement_amount = paper['settlement_amount']
-        validate_settlement_amount(
-            self.settlement_amount,
-            fees_cost,
-            self.operations_value
+        self.symbols = tuple(operation["symbol"] for operation in operations)
+        self.operations = np.array(
+            [
+                (
+                    operation["amount"], operation["price"],
+                    to_cents(operation["value"])
+                )
+                    for operation in operations
+            ],
+            dtype=PAPER_DTYPE
         )
-        # Calculate the price with the fees
-        self.calculate_price_with_fees(self.operations_value, fees_cost)
 
-    def calculate_price_with_fees(
-        self,
-        operations_value: float,
-        fees_cost: float
-    ) -> Dict:
-        count = 1
-        for operation in self.operations:
-            percentage = operation["value"] / operations_value
-            fees_cost_ = fees_cost * percentage
-            operation["cost_of_fees"] = fees_cost_
-            operation["value_without_fees"] = operation["value"]
-            operation["value"] = operation["value"] + fees_cost_
-            operation["price_without_fees"] = operation["price"]
-            operation["price"] = (
-                operation["price"] + fees_cost_ / operation["amount"]
+class OperationBatch:
+    """
+    This class keeps the operations of many trade confirmations in a single
+    structured array, with the symbols as codes. The fees of all trade
+    confirmations are spread over their operations at once, by their values
+    and the largest remainder, so the fees of the operations of each trade
+    confirmation sum exactly to its fees. Iterating over the batch gives
+    each operation as an Operation
+    """
+    def __init__(self, trade_confirmations: List[TradeConfirmation]) -> None:
+        self.names = [tc.name for tc in trade_confirmations]
+        sizes = np.array(
+            [len(tc.operations) for tc in trade_confirmations], dtype=np.int64
+        )
+        tcs = np.repeat(np.arange(len(sizes)), sizes)
+        self.symbols, codes = np.unique(
+            np.array(
+                [c for tc in trade_confirmations for c in tc.symbols],
+                dtype=str
+            ),
+            return_inverse=True
+        )
+        operations = np.zeros(len(tcs), dtype=OPERATION_DTYPE)
+        operations["tc"] = tcs
+        operations["counter"] = np.arange(len(tcs)) \
+            - np.repeat(np.cumsum(sizes) - sizes, sizes) + 1
+        operations["symbol"] = codes
+        operations["date"] = np.array(
+            [tc.date for tc in trade_confirmations], dtype="datetime64[D]"
+        )[tcs]
+        if trade_confirmations:
+            paper = np.concatenate(
+                [tc.operations for tc in trade_confirmations]
+            )
+            for field in ["amount", "price", "value"]:
+                operations[field] = paper[field]
+        operations["cost_of_fees"] = allocate(
+            [tc.fees_cost for tc in trade_confirmations],
+            operations["value"],
+            tcs
+        )
+        operations["value_without_fees"] = operations["value"]
+        operations["value"] += operations["cost_of_fees"]
+        operations["price_without_fees"] = operations["price"]
+        # The price with fees is rounded as the values derived from cents,
+        # so 37.15 with a cent of fees is 37.16 and not 37.160000000000004
+        operations["price"] = np.round(
+            operations["price"]
+            + from_cents(operations["cost_of_fees"]) / operations["amount"],
+            DECIMALS
+        )
+        self.operations = operations
+
+    @classmethod
+    def from_trade_confirmations(
+        cls, trade_confirmations: Dict
+    ) -> "OperationBatch":
+        return cls([
+            tc for date in trade_confirmations
+                for tc in trade_confirmations[date]
+        ])
+
+    def __len__(self) -> int:
+        return len(self.operations)
+
+    def __iter__(self) -> Iterator[Operation]:
+        for row in self.operations.tolist():
+            yield Operation(
+                str(self.symbols[row[2]]), row[4], row[5], row[6], row[7],
+                row[8], row[9], row[1]
             )
-            operation["counter"] = str(count)
-            count += 1
+
+    def frame(self) -> pd.DataFrame:
+        """
+        This function creates the table of the operations, with the values
+        in cents
+        """
+        operations = self.operations
+        names = np.array(self.names, dtype=object)[operations["tc"]]
+        counters = operations["counter"].astype(str).astype(object)
+        return pd.DataFrame({
+            "date": np.datetime_as_string(operations["date"]),
+            "symbol": pd.Categorical.from_codes(
+                operations["symbol"], self.symbols
+            ),
+            "amount": operations["amount"],
+            "price": operations["price"],
+            "value": operations["value"],
+            "cost_of_fees": operations["cost_of_fees"],
+            "value_without_fees": operations["value_without_fees"],
+            "price_without_fees": operations["price_without_fees"],
+            "tc_name": names + "-" + counters,
+        })
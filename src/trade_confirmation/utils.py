@@ -1,72 +1,265 @@
-from datetime import datetime
-from typing import Dict
+from typing import Dict, Iterable, List, Tuple
+import numpy as np
+import pandas as pd
+from utils.money import to_cents_array
 
-def validate_date(date: str) -> str:
+PAPER_FIELDS = [
+    "broker", "date", "fees", "operations", "operations_value",
+    "settlement_amount"
+]
+OPERATION_FIELDS = ["symbol", "amount", "price", "value"]
+VIOLATION_COLUMNS = ["file", "field", "value", "message"]
+
+def violations(
+    files: Iterable, fields: Iterable, values: Iterable, message: str
+) -> pd.DataFrame:
+    files = list(files)
+    return pd.DataFrame({
+        "file": files,
+        "field": list(fields),
+        "value": [str(value) for value in values],
+        "message": [message] * len(files)
+    }, columns=VIOLATION_COLUMNS)
+
+def paper_tables(
+    papers: Dict[str, Dict]
+) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, List[pd.DataFrame]]:
     """
-    This function validates the date
+    This function flattens the papers into tables of trade confirmations,
+    fees and operations. The papers or operations without some field are
+    reported and left out of the tables
     """
-    try:
-        datetime.strptime(date, "%Y-%m-%d")
-    except:
-        raise ValueError("The date must respect the format %Y-%m-%d")
-    return date
+    tcs = {field: [] for field in ["file", "count"] + PAPER_FIELDS}
+    fees = {"file": [], "fee": [], "value": []}
+    operations = {"file": [], "field": []}
+    operations.update({field: [] for field in OPERATION_FIELDS})
+    missing = []
+    for file, paper in papers.items():
+        if not isinstance(paper, dict):
+            missing.append((file, "file", "", "is not a trade confirmation"))
+            continue
+        absent = [field for field in PAPER_FIELDS if not field in paper]
+        if absent:
+            missing += [(file, field, "", "is missing") for field in absent]
+            continue
+        if not isinstance(paper["fees"], dict):
+            missing.append((file, "fees", paper["fees"], "is not a dict"))
+            continue
+        if not isinstance(paper["operations"], list):
+            missing.append((
+                file, "operations", paper["operations"], "is not a list"
+            ))
+            continue
+        tcs["file"].append(file)
+        tcs["count"].append(len(paper["operations"]))
+        for field in PAPER_FIELDS:
+            tcs[field].append(paper[field])
+        for fee, value in paper["fees"].items():
+            fees["file"].append(file)
+            fees["fee"].append(f"fees.{fee}")
+            fees["value"].append(value)
+        for i, operation in enumerate(paper["operations"]):
+            if not isinstance(operation, dict):
+                missing.append((
+                    file, f"operations[{i}]", operation, "is not a dict"
+                ))
+                continue
+            absent = [
+                field for field in OPERATION_FIELDS if not field in operation
+            ]
+            missing += [
+                (file, f"operations[{i}].{field}", "", "is missing")
+                    for field in absent
+            ]
+            if absent:
+                continue
+            operations["file"].append(file)
+            operations["field"].append(f"operations[{i}]")
+            for field in OPERATION_FIELDS:
+                operations[field].append(operation[field])
+    missing = [
+        violations([file], [field], [value], message)
+            for file, field, value, message in missing
+    ]
+    return (
+        pd.DataFrame(tcs), pd.DataFrame(fees), pd.DataFrame(operations),
+        missing
+    )
 
-def calculate_fees(fees: Dict) -> float:
+def numbers(
+    df: pd.DataFrame, column: str, field: pd.Series, report: List
+) -> np.ndarray:
     """
-    This function calculates the fees
+    This function reads a column of numbers, and reports the values that are
+    not numbers
     """
-    total = 0.0
-    for fee in fees:
-        total += fees[fee]
-    return total
+    wrong = ~df[column].map(
+        lambda v: isinstance(v, (int, float)) and not isinstance(v, bool)
+    ).astype(bool)
+    wrong |= pd.isna(df[column])
+    values = pd.to_numeric(df[column].where(~wrong), errors="coerce")
+    report.append(violations(
+        df["file"][wrong], field[wrong], df[column][wrong], "is not a number"
+    ))
+    return values.where(~wrong).to_numpy(dtype=np.float64)
 
-def validate_operations_value(
-    operations_value: float,
-    operations: Dict
-) -> None:
+def validate_papers(
+    papers: Dict[str, Dict],
+    brokers: Iterable[str] = None,
+    symbols: Iterable[str] = None
+) -> pd.DataFrame:
     """
-    This function validates the total of operations value with the value
-    of each operation and validates the value of each operation with the price
+    This function validates the papers of the trade confirmations, by file.
+    The dates, the value of each operation with its price, the operations
+    value with the operations and the settlement amount with the fees and
+    the operations value are checked for all papers at once, with the values
+    in cents, and so are the brokers and symbols when they are given. It
+    returns every violation found, with its file and field
     """
-    total = 0.0
-    for operation in operations:
-        total += operation["value"]
+    df, df_fees, df_op, report = paper_tables(papers)
+    # Dates
+    dates = pd.to_datetime(df["date"], format="%Y-%m-%d", errors="coerce")
+    wrong = dates.isna()
+    report.append(violations(
+        df["file"][wrong], ["date"] * wrong.sum(), df["date"][wrong],
+        "must respect the format %Y-%m-%d"
+    ))
+    # Operations
+    field = df_op["field"].astype(str)
+    amount = numbers(df_op, "amount", field + ".amount", report)
+    price = numbers(df_op, "price", field + ".price", report)
+    value = numbers(df_op, "value", field + ".value", report)
+    wrong = ~np.isnan(amount) & (
+        (amount == 0) | (amount != np.round(amount))
+    )
+    report.append(violations(
+        df_op["file"][wrong], field[wrong] + ".amount", df_op["amount"][wrong],
+        "must be a whole number of shares other than zero"
+    ))
+    valid = ~np.isnan(amount + price + value)
+    wrong = valid & (
+        to_cents_array(np.where(valid, price * amount, 0.0))
+        != to_cents_array(np.where(valid, value, 0.0))
+    )
+    report.append(violations(
+        df_op["file"][wrong], field[wrong] + ".value", df_op["value"][wrong],
+        "is not matching with the amount and price. Please, verify that "
+        "the values are right"
+    ))
+    # Operations value, of the papers whose operations are all valid
+    codes = pd.Categorical(df_op["file"], categories=df["file"]).codes
+    total = np.bincount(
+        codes[valid], weights=to_cents_array(value[valid]), minlength=len(df)
+    ).astype(np.int64)
+    counts = df["count"].to_numpy()
+    complete = np.bincount(codes[valid], minlength=len(df)) == counts
+    operations_value = numbers(
+        df, "operations_value", pd.Series("operations_value", df.index),
+        report
+    )
+    settlement_amount = numbers(
+        df, "settlement_amount", pd.Series("settlement_amount", df.index),
+        report
+    )
+    wrong = counts == 0
+    report.append(violations(
+        df["file"][wrong], ["operations"] * wrong.sum(), [""] * wrong.sum(),
+        "has no operations"
+    ))
+    wrong = complete & ~np.isnan(operations_value) & (
+        to_cents_array(np.nan_to_num(operations_value)) != total
+    )
+    report.append(violations(
+        df["file"][wrong], ["operations_value"] * wrong.sum(),
+        df["operations_value"][wrong],
+        "is not matching with the value of the operations. Please, verify "
+        "that you have not forgotten any operation"
+    ))
+    wrong = complete & (counts > 0) & (total == 0)
+    report.append(violations(
+        df["file"][wrong], ["operations_value"] * wrong.sum(),
+        df["operations_value"][wrong],
+        "is zero, so the fees can not be spread over the operations"
+    ))
+    # Settlement amount
+    fees = numbers(df_fees, "value", df_fees["fee"], report)
+    codes = pd.Categorical(df_fees["file"], categories=df["file"]).codes
+    fees_cost = np.bincount(
+        codes, weights=to_cents_array(np.nan_to_num(fees)), minlength=len(df)
+    ).astype(np.int64)
+    wrong = ~np.isnan(settlement_amount + operations_value) & (
+        to_cents_array(np.nan_to_num(settlement_amount))
+        != fees_cost + to_cents_array(np.nan_to_num(operations_value))
+    )
+    report.append(violations(
+        df["file"][wrong], ["settlement_amount"] * wrong.sum(),
+        df["settlement_amount"][wrong],
+        "is not matching with the fees cost and the operations value. "
+        "Please, verify that you have not forgotten any information"
+    ))
+    report.append(validate_registries(df, df_op, brokers, symbols))
+    return pd.concat(report, ignore_index=True).sort_values(
+        "file", kind="stable"
+    ).reset_index(drop=True)
 
-    if operations_value != round(total, 2):
-        raise ValueError(
-            "The operations value is not matching "\
-            f"({operations_value} != {total}). "\
-            "Please, verify that you have not forgotten any operation or "\
-            "the values are right."
-        )
-
-    for operation in operations:
-        value = round(operation["price"] * operation["amount"], 2)
-        if value != operation["value"]:
-            raise ValueError(
-                f"The operation value of {operation['symbol']} is not matching"\
-                " with the amount and price "
-                f"({operation['price']} * {operation['amount']} != "\
-                f"{operation['value']}). "\
-                "Please, verify that you have not forgotten any operation or "\
-                "the values are right."
-            )
+def tc_tables(trade_confirmations: List) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    This function creates the tables of brokers and symbols of the trade
+    confirmations already read
+    """
+    df = pd.DataFrame({
+        "file": [tc.file_path for tc in trade_confirmations],
+        "broker": [tc.broker for tc in trade_confirmations]
+    })
+    df_op = pd.DataFrame({
+        "file": np.repeat(
+            df["file"].to_numpy(dtype=object),
+            [len(tc.symbols) for tc in trade_confirmations]
+        ),
+        "field": [
+            f"operations[{i}]"
+                for tc in trade_confirmations
+                for i in range(len(tc.symbols))
+        ],
+        "symbol": [c for tc in trade_confirmations for c in tc.symbols]
+    })
+    return df, df_op
 
+def validate_registries(
+    df: pd.DataFrame,
+    df_op: pd.DataFrame,
+    brokers: Iterable[str] = None,
+    symbols: Iterable[str] = None
+) -> pd.DataFrame:
+    """
+    This function checks that the brokers and the symbols of the trade
+    confirmations are in the brokers and companies files. They are looked up
+    in sets, so each one is checked once
+    """
+    report = [violations([], [], [], "")]
+    if brokers is not None:
+        wrong = ~df["broker"].isin(set(brokers))
+        report.append(violations(
+            df["file"][wrong], ["broker"] * wrong.sum(), df["broker"][wrong],
+            "does not exist in the brokers file. Please, add this broker"
+        ))
+    if symbols is not None:
+        wrong = ~df_op["symbol"].isin(set(symbols))
+        report.append(violations(
+            df_op["file"][wrong],
+            df_op["field"][wrong].astype(str) + ".symbol",
+            df_op["symbol"][wrong],
+            "does not exist in the companies file. Please, add this company"
+        ))
+    return pd.concat(report, ignore_index=True)
 
-def validate_settlement_amount(
-    settlement_amount: float,
-    fees_cost: float,
-    operations_value: float,
-) -> None:
+def report_text(report: pd.DataFrame) -> str:
     """
-    This function validates the settlement amount with the total of fees cost
-    and operations value
+    This function writes a line for each violation
     """
-    if settlement_amount != round(fees_cost + operations_value, 2):
-        raise ValueError(
-            "The settlement amount does not match with the fees cost and "\
-            "the operations value. "\
-            f"({settlement_amount} != {fees_cost} + {operations_value}). "\
-            "Please, verify that you have not "\
-            "forgotten any information."
-        )
\ No newline at end of file
+    return "\n".join(
+        f"{file}: {field} {message}" + (f" ({value})" if value else "")
+            for file, field, value, message in report[
+                VIOLATION_COLUMNS
+            ].itertuples(index=False)
+    )
@@ -1,9 +1,30 @@
+import hashlib
+import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import closing
 from datetime import datetime, timedelta
-from bs4 import BeautifulSoup
-from urllib.request import Request, urlopen
+from time import time
+from typing import Dict, List
 from os.path import getmtime, exists
+import numpy as np
 import pandas as pd
-import json
+from utils.fetcher import HTTPFetcher
+from utils.instrumentation import count
+from utils.schedule import RefreshSchedule
+from utils.statusinvest import extract_bonus, extract_earnings
+from utils.utils import create_folder
+
+STATUSINVEST_URL = 'https://statusinvest.com.br/acoes/'
+# Seconds a downloaded page is used before it is downloaded again
+PAGE_TTL = 12 * 60 * 60
+# Refresh schedule of the earnings of the symbols
+SCHEDULE_FILE = "schedule.json"
+# Pages downloaded at the same time
+WORKERS = 8
+# Earnings with 15% of income tax withheld
+TAXED_EARNINGS = ["JCP", "Rend. Tributado"]
+INCOME_TAX = 0.15
+UNTAXED_EARNINGS = ["Dividendo", "Amortização"]
 
 def validate_date(date: str) -> datetime:
     try:
@@ -20,101 +41,204 @@ def timedelta_day(date: str, num: str) -> str:
     date = date.strftime("%Y-%m-%d")
     return date
 
-def download_dividends(symbol: str, dir: str) -> pd.DataFrame:
-    filename = dir + "dividends-" + symbol + ".csv"
-    if exists(filename):
-        file_creation = datetime.fromtimestamp(getmtime(filename)).date()
-        if file_creation == datetime.today().date():
-            return
-    req = Request(
-        'https://statusinvest.com.br/acoes/' + symbol,
-        headers={'User-Agent': 'Mozilla/5.0'}
+def is_cached(symbol: str, dir: str, ttl: float = PAGE_TTL) -> bool:
+    """
+    This function checks if the page of the symbol was downloaded less than
+    ttl seconds ago
+    """
+    filename = dir + "pages/" + symbol + ".html"
+    return exists(filename) and time() - getmtime(filename) < ttl
+
+def fetch_page(
+    symbol: str,
+    dir: str,
+    ttl: float = PAGE_TTL,
+    fetcher: HTTPFetcher = None
+) -> bytes:
+    """
+    This function downloads the page of the symbol, or reads it from the
+    cache if it was downloaded less than ttl seconds ago
+    """
+    filename = create_folder(dir + "pages/") + symbol + ".html"
+    if is_cached(symbol, dir, ttl):
+        count("page_cache_hits")
+        with open(filename, "rb") as f:
+            return f.read()
+    if fetcher is None:
+        with closing(HTTPFetcher(STATUSINVEST_URL)) as fetcher:
+            page = fetcher.get(symbol)
+    else:
+        page = fetcher.get(symbol)
+    with open(filename, "wb") as f:
+        f.write(page)
+    return page
+
+def download_earnings(
+    symbol: str,
+    dir: str,
+    fetcher: HTTPFetcher = None,
+    schedule: RefreshSchedule = None,
+    ttl: float = PAGE_TTL
+) -> str:
+    """
+    This function downloads the dividends and the bonus of the symbol,
+    fetching its page once for both. The files are only written when the
+    earnings changed, so the views derived from them are not calculated
+    again. It returns whether the earnings were refreshed or unchanged
+    """
+    page = fetch_page(symbol, dir, ttl, fetcher)
+    earnings = extract_earnings(page)
+    bonus = extract_bonus(page)
+    payload = hashlib.sha256(
+        json.dumps([earnings, bonus], sort_keys=True).encode()
+    ).hexdigest()
+    df_dividend = dividends_frame(symbol, earnings)
+    files = [
+        dir + "dividends-" + symbol + ".csv", dir + "bonus-" + symbol + ".csv"
+    ]
+    status = "refreshed"
+    if schedule is not None and not schedule.is_changed(symbol, payload) \
+            and all(exists(file) for file in files):
+        status = "unchanged"
+    else:
+        df_dividend.to_csv(files[0], sep=";", index=False)
+        bonus_frame(symbol, bonus).to_csv(files[1], sep=";", index=False)
+    if schedule is not None:
+        schedule.update(symbol, payload, df_dividend)
+    return status
+
+def refresh_earnings(
+    symbols: List[str],
+    dir: str,
+    workers: int = WORKERS,
+    fetcher: HTTPFetcher = None,
+    limit: int = None
+) -> Dict[str, List[str]]:
+    """
+    This function downloads the earnings of the symbols that are due in the
+    refresh schedule, concurrently and in its order, up to the limit. The
+    symbols without files are always downloaded. A symbol that fails does
+    not stop the others
+    """
+    # The fetcher created here is closed here
+    owned = fetcher is None
+    if owned:
+        fetcher = HTTPFetcher(STATUSINVEST_URL)
+    schedule = RefreshSchedule(create_folder(dir) + SCHEDULE_FILE)
+    missing = [
+        symbol for symbol in symbols
+            if not exists(dir + "dividends-" + symbol + ".csv")
+            or not exists(dir + "bonus-" + symbol + ".csv")
+    ]
+    new = set(missing)
+    due = missing + schedule.plan(
+        [symbol for symbol in symbols if not symbol in new],
+        limit=limit
     )
-    bs = BeautifulSoup(urlopen(req).read(), 'html.parser')
-    section = bs.find_all('div', {"id": "earning-section"})
-    input = section[0].findChildren("input", {"id": "results"})
-    df = pd.DataFrame({})
-    for row in json.loads(input[0]["value"]):
-        prev_date = validate_date(row["ed"])
-        ex_date = timedelta_day(prev_date, 1)
-        payment_day = validate_date(row["pd"])
-        value_without_tax = float(row["v"])
-        earning_type = row["et"]
-        if earning_type == "JCP" or earning_type == "Rend. Tributado":
-            value = value_without_tax * (1 - 0.15)
-        elif earning_type == "Dividendo" or earning_type == "Amortização":
-            value = value_without_tax
-        else:
-            raise ValueError(
-                f"[DIVIDENDS] Earning type not definied {earning_type}"
-            )
-        df = pd.concat([df, pd.DataFrame({
-            "symbol": [symbol],
-            "ex_date": [ex_date],
-            "prev_date": [prev_date],
-            "payment_day": [payment_day],
-            "type": [earning_type],
-            "value_without_tax": [value_without_tax],
-            "value": [value],
-        })])
-    df.to_csv(filename, sep=";", index=False)
+    summary = {
+        "refreshed": [], "unchanged": [], "failed": [],
+        "scheduled": sorted(set(symbols) - set(due))
+    }
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # The symbols due in the schedule are always downloaded again, and
+        # only the missing files may come from a page just downloaded
+        futures = {
+            executor.submit(
+                download_earnings, symbol, dir, fetcher, schedule,
+                PAGE_TTL if symbol in new else 0
+            ): symbol
+                for symbol in due
+        }
+        for future in as_completed(futures):
+            symbol = futures[future]
+            try:
+                summary[future.result()].append(symbol)
+            except Exception as e:
+                print(
+                    f"[DIVIDENDS] I could not get the earnings from {symbol}: "
+                    f"{e}"
+                )
+                summary["failed"].append(symbol)
+    if owned:
+        fetcher.close()
+    schedule.save()
+    for status in summary:
+        summary[status] = sorted(summary[status])
+    return summary
 
+def validate_dates(dates: List[str]) -> pd.Series:
+    """
+    This function validates the dates, which become NaT when their format
+    is wrong
+    """
+    dates = pd.Series(dates, dtype=object)
+    parsed = pd.to_datetime(dates, format="%d/%m/%Y", errors="coerce")
+    for date in dates[parsed.isna()]:
+        print(f"[VALIDATION] The date's format is wrong: {date}")
+    return parsed
 
-def download_bonus(symbol: str, dir: str) -> pd.DataFrame:
-    filename = dir + "bonus-" + symbol + ".csv"
-    if exists(filename):
-        file_creation = datetime.fromtimestamp(getmtime(filename)).date()
-        if file_creation == datetime.today().date():
-            return
+def dividends_frame(symbol: str, rows: List[dict]) -> pd.DataFrame:
+    """
+    This function builds the dividends of the symbol from the earnings rows
+    """
+    if len(rows) == 0:
+        return pd.DataFrame({})
+    earning_type = pd.Series([row["et"] for row in rows], dtype=object)
+    unknown = ~earning_type.isin(TAXED_EARNINGS + UNTAXED_EARNINGS)
+    if unknown.any():
+        raise ValueError(
+            "[DIVIDENDS] Earning type not definied "
+            f"{earning_type[unknown].iloc[0]}"
+        )
+    prev_date = validate_dates([row["ed"] for row in rows])
+    if prev_date.isna().any():
+        raise ValueError("[DIVIDENDS] The ex-date is required")
+    value_without_tax = np.array(
+        [float(row["v"]) for row in rows], dtype=np.float64
+    )
+    value = np.where(
+        earning_type.isin(TAXED_EARNINGS),
+        value_without_tax * (1 - INCOME_TAX),
+        value_without_tax
+    )
+    return pd.DataFrame({
+        "symbol": symbol,
+        "ex_date": prev_date + pd.Timedelta(days=1),
+        "prev_date": prev_date,
+        "payment_day": validate_dates([row["pd"] for row in rows]),
+        "type": earning_type,
+        "value_without_tax": value_without_tax,
+        "value": value,
+    })
+
+def bonus_frame(symbol: str, rows: List[List[str]]) -> pd.DataFrame:
+    """
+    This function builds the bonus of the symbol from the bonus card rows
+    """
     df = pd.DataFrame(
         columns=[
             "symbol", "ex-date", "incorporation_date",
             "proportion", "value", "new_ticker"
         ]
     )
-    req = Request(
-        'https://statusinvest.com.br/acoes/' + symbol,
-        headers={'User-Agent': 'Mozilla/5.0'}
-    )
-    bs = BeautifulSoup(urlopen(req).read(), 'html.parser')
-    section = bs.find_all('h3', text="BONIFICAÇÃO")
-    section = section[0].parent.parent
-    section = section.findChildren("div", {"class": "card-body"})[0]
-    section = section.findChildren("div")
-    if len(section) != 0:
-        section = section[0]
-        section = section.findChildren(
-            "div",
-            {
-            "class":
-            "d-flex justify-between align-items-center flex-wrap flex-md-nowrap"
-            }
-        )
-        for sec in section:
-            sec = sec.findChildren("div")
-            ex_date = validate_date(
-                sec[2].findChildren("strong")[0].text
-            )
-            prev_date = timedelta_day(ex_date, -1)
-            incorporation_date = validate_date(
-                sec[3].findChildren("strong")[0].text
-            )
-            value = float((
-                sec[5].findChildren("strong")[0].text
-            ).replace("R$ ", "").replace(",", "."))
-            proportion = float((
-                sec[6].findChildren("strong")[0].text
-            ).replace("%", "").replace(",", "."))
-            new_ticker = (
-                sec[7].findChildren("strong")[0].text
-            ).strip()
-            df = pd.concat([df, pd.DataFrame({
-                "symbol": [symbol],
-                "ex_date": [ex_date],
-                "prev_date": [prev_date],
-                "incorporation_date": [incorporation_date],
-                "proportion": [proportion],
-                "value": [value],
-                "new_ticker": [new_ticker],
-            })])
-    df.to_csv(filename, sep=";", index=False)
+    if len(rows) == 0:
+        return df
+    ex_date = validate_dates([cells[0] for cells in rows])
+    if ex_date.isna().any():
+        raise ValueError("[DIVIDENDS] The bonus ex-date is required")
+    return pd.DataFrame({
+        "symbol": symbol,
+        "ex-date": np.nan,
+        "incorporation_date": validate_dates([cells[1] for cells in rows]),
+        "proportion": np.array([
+            float(cells[3].replace("%", "").replace(",", "."))
+                for cells in rows
+        ], dtype=np.float64),
+        "value": np.array([
+            float(cells[2].replace("R$ ", "").replace(",", "."))
+                for cells in rows
+        ], dtype=np.float64),
+        "new_ticker": [cells[4].strip() for cells in rows],
+        "ex_date": ex_date,
+        "prev_date": ex_date - pd.Timedelta(days=1),
+    })
@@ -0,0 +1,41 @@
+from concurrent.futures import ProcessPoolExecutor
+from os import cpu_count
+from typing import Callable, List
+
+# Number of symbols from which their work is spread over a process pool
+PARALLEL_SYMBOLS = 32
+# Processes of the pool
+PROCESSES = cpu_count() or 1
+
+class SymbolExecutor:
+    """
+    This class runs the work of each symbol of a stage. When there are many
+    symbols and more than one worker, the symbols are fanned out across a
+    process pool, which is started once and kept for the next stages. The
+    results keep the order of the symbols, so they are the same as in the
+    serial path
+    """
+    def __init__(self, workers: int = PROCESSES) -> None:
+        self.workers = max(1, workers or 1)
+        self.pool = None
+
+    def map(self, function: Callable, *iterables) -> List:
+        iterables = [list(iterable) for iterable in iterables]
+        size = len(iterables[0]) if iterables else 0
+        if self.workers == 1 or size < PARALLEL_SYMBOLS:
+            return list(map(function, *iterables))
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(max_workers=self.workers)
+        chunksize = max(1, size // (4 * self.workers))
+        return list(self.pool.map(function, *iterables, chunksize=chunksize))
+
+    def close(self) -> None:
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+    def __enter__(self) -> "SymbolExecutor":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
@@ -0,0 +1,119 @@
+import threading
+from http.client import HTTPConnection, HTTPException, HTTPSConnection
+from time import monotonic, sleep
+from urllib.parse import urlsplit
+from utils.instrumentation import count
+
+# Statuses that are worth trying again
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+class RateLimiter:
+    """
+    This class spaces the requests to each host by a minimum interval
+    """
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.next_request = {}
+
+    def wait(self, host: str) -> None:
+        with self.lock:
+            now = monotonic()
+            start = max(now, self.next_request.get(host, now))
+            self.next_request[host] = start + self.interval
+        if start > now:
+            sleep(start - now)
+
+class HTTPFetcher:
+    """
+    This class downloads the pages of a site. Each thread keeps its own
+    connection alive, the requests are rate limited and the failures are
+    retried with exponential backoff. The connections of all threads are
+    tracked, so they are all closed at once
+    """
+    def __init__(
+        self,
+        base_url: str,
+        interval: float = 0.2,
+        retries: int = 3,
+        backoff: float = 1.0,
+        timeout: float = 30
+    ) -> None:
+        url = urlsplit(base_url)
+        self.https = url.scheme == "https"
+        self.host = url.netloc
+        self.path = url.path
+        self.limiter = RateLimiter(interval)
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.connections = set()
+
+    def connection(self) -> HTTPConnection:
+        conn = getattr(self.local, "conn", None)
+        with self.lock:
+            # The connection may have been closed with the others
+            if conn is None or not conn in self.connections:
+                connection = HTTPSConnection if self.https \
+                    else HTTPConnection
+                conn = connection(self.host, timeout=self.timeout)
+                self.connections.add(conn)
+                self.local.conn = conn
+        return conn
+
+    def reset(self) -> None:
+        """
+        This function closes the connection of the current thread, which is
+        opened again by its next request
+        """
+        conn = getattr(self.local, "conn", None)
+        if conn is not None:
+            with self.lock:
+                self.connections.discard(conn)
+            conn.close()
+            self.local.conn = None
+
+    def close(self) -> None:
+        """
+        This function closes the connections of all threads
+        """
+        with self.lock:
+            connections, self.connections = self.connections, set()
+        for conn in connections:
+            conn.close()
+
+    def get(self, path: str) -> bytes:
+        """
+        This function downloads a page relative to the base url
+        """
+        for attempt in range(self.retries + 1):
+            self.limiter.wait(self.host)
+            count("http_requests")
+            try:
+                conn = self.connection()
+                conn.request(
+                    "GET",
+                    self.path + path,
+                    headers={
+                        "User-Agent": "Mozilla/5.0",
+                        "Connection": "keep-alive"
+                    }
+                )
+                response = conn.getresponse()
+                body = response.read()
+                if response.status == 200:
+                    return body
+                error = ValueError(
+                    f"[FETCHER] The request to {self.host}{self.path}{path} "
+                    f"returned {response.status}"
+                )
+                if not response.status in RETRY_STATUS:
+                    raise error
+            except (HTTPException, OSError) as e:
+                self.reset()
+                error = e
+            if attempt < self.retries:
+                sleep(self.backoff * 2 ** attempt)
+        raise error
@@ -0,0 +1,125 @@
+import json
+import threading
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from time import perf_counter
+from typing import Dict
+
+class Instrumentation:
+    """
+    This class collects the timing of the stages of a run and of each
+    symbol in them, the counters of files, bytes, requests and cache hits
+    and, when memory is traced, the peak memory of each stage. The stages
+    may be nested, and their names are joined by a slash. The peak memory
+    is traced for the whole process, so it is only the one of a stage when
+    the stages run one at a time
+    """
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.reset()
+
+    def reset(self, memory: bool = False) -> None:
+        self.started = datetime.now().isoformat(timespec="seconds")
+        self.start = perf_counter()
+        self.stages = []
+        self.symbols = {}
+        self.counters = {}
+        self.memory = memory
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def frames(self) -> list:
+        if not hasattr(self.local, "frames"):
+            self.local.frames = []
+        return self.local.frames
+
+    @contextmanager
+    def symbol(self, symbol: str):
+        """
+        This function times the work of a symbol in the current stage
+        """
+        path = "/".join(frame["name"] for frame in self.frames())
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = perf_counter() - start
+            with self.lock:
+                symbols = self.symbols.setdefault(path, {})
+                symbols[symbol] = round(symbols.get(symbol, 0.0) + elapsed, 6)
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        This function times a stage
+        """
+        frames = self.frames()
+        memory = self.memory and tracemalloc.is_tracing()
+        if memory:
+            if frames:
+                frames[-1]["peak"] = max(
+                    frames[-1]["peak"], tracemalloc.get_traced_memory()[1]
+                )
+            tracemalloc.reset_peak()
+        frame = {"name": name, "peak": 0, "start": perf_counter()}
+        frames.append(frame)
+        try:
+            yield
+        finally:
+            frames.pop()
+            record = {
+                "stage": "/".join([f["name"] for f in frames] + [name]),
+                "start": round(frame["start"] - self.start, 6),
+                "duration": round(perf_counter() - frame["start"], 6)
+            }
+            if memory:
+                peak = max(frame["peak"], tracemalloc.get_traced_memory()[1])
+                record["peak_memory"] = peak
+                if frames:
+                    frames[-1]["peak"] = max(frames[-1]["peak"], peak)
+            with self.lock:
+                self.stages.append(record)
+
+    def count(self, name: str, n: int = 1) -> None:
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def report(self) -> Dict:
+        """
+        This function returns the report of the run
+        """
+        with self.lock:
+            report = {
+                "started": self.started,
+                "duration": round(perf_counter() - self.start, 6),
+                "stages": sorted(self.stages, key=lambda s: s["start"]),
+                "symbols": {
+                    stage: dict(sorted(symbols.items()))
+                        for stage, symbols in self.symbols.items()
+                },
+                "counters": dict(sorted(self.counters.items()))
+            }
+        if self.memory and tracemalloc.is_tracing():
+            report["peak_memory"] = max(
+                [s.get("peak_memory", 0) for s in report["stages"]]
+                + [tracemalloc.get_traced_memory()[1]]
+            )
+        return report
+
+    def save(self, file: str) -> None:
+        with open(file, "w") as f:
+            json.dump(self.report(), f, indent=2)
+
+# The instrumentation of the current run
+RUN = Instrumentation()
+
+def stage(name: str):
+    return RUN.stage(name)
+
+def timed_symbol(symbol: str):
+    return RUN.symbol(symbol)
+
+def count(name: str, n: int = 1) -> None:
+    RUN.count(name, n)
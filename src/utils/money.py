@@ -0,0 +1,78 @@
+from decimal import Decimal, ROUND_HALF_EVEN
+import numpy as np
+
+# The money is kept in integer cents, and only the values shown or written
+# are floats
+CENTS = 100
+# Decimals the floats derived from cents, as the prices with fees and the
+# average costs, are rounded to, so they do not carry the noise of the float
+# arithmetic. The other floats are written as they are
+DECIMALS = 8
+
+def to_cents(value) -> int:
+    """
+    This function converts a value to integer cents. The floats are read by
+    their shortest representation, so 0.1 is 10 cents and not 10.000000001
+    """
+    if isinstance(value, float):
+        value = repr(value)
+    cents = Decimal(value) * CENTS
+    return int(cents.quantize(Decimal(1), rounding=ROUND_HALF_EVEN))
+
+def to_cents_array(values) -> np.ndarray:
+    """
+    This function converts the values of a column to integer cents, with the
+    same rounding as to_cents. The product by CENTS is not exact, so each
+    value is compared with the float of the half cent above the product's
+    floor: the values above it round up, the ones below it round down and
+    the ones on it, whose shortest representation is the half cent, round
+    to the even cent
+    """
+    values = np.asarray(values, dtype=np.float64)
+    floors = np.floor(values * CENTS)
+    # The division of integers is correctly rounded, so it is the float
+    # nearest to the half cent
+    halves = (2 * floors + 1) / (2 * CENTS)
+    cents = floors + (values > halves)
+    cents += (values == halves) & (np.mod(floors, 2) == 1)
+    return cents.astype(np.int64)
+
+def from_cents(cents):
+    """
+    This function converts cents to the floats shown and written
+    """
+    if isinstance(cents, (int, np.integer)):
+        return cents / CENTS
+    return np.asarray(cents, dtype=np.int64) / CENTS
+
+def allocate(
+    totals: np.ndarray, weights: np.ndarray, groups: np.ndarray
+) -> np.ndarray:
+    """
+    This function splits the total cents of each group proportionally to the
+    weights of its rows by the largest remainder method: each share is
+    rounded down, and the cents left go to the largest fractions, the first
+    rows on ties. The shares of a group always sum exactly to its total
+    """
+    totals = np.asarray(totals, dtype=np.int64)
+    weights = np.asarray(weights, dtype=np.int64)
+    groups = np.asarray(groups, dtype=np.int64)
+    group_weights = np.bincount(
+        groups, weights=weights, minlength=len(totals)
+    ).astype(np.int64)
+    if np.any(group_weights[groups] == 0):
+        raise ValueError("The weights of the allocation sum to zero")
+    # The shares keep the sign of the weights over their sum
+    signs = np.sign(group_weights)[groups]
+    shares, remainders = np.divmod(
+        totals[groups] * weights * signs, group_weights[groups] * signs
+    )
+    left = totals - np.bincount(
+        groups, weights=shares, minlength=len(totals)
+    ).astype(np.int64)
+    rows = np.arange(len(weights))
+    order = np.lexsort((rows, -remainders, groups))
+    starts = np.searchsorted(groups[order], groups[order], "left")
+    ranks = np.empty(len(weights), dtype=np.int64)
+    ranks[order] = rows - starts
+    return shares + (ranks < left[groups])
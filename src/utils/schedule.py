@@ -0,0 +1,139 @@
+import json
+import threading
+from datetime import date, datetime, timedelta
+from os import replace
+from os.path import exists
+from time import time
+from typing import Dict, List
+import numpy as np
+import pandas as pd
+
+DAY = 24 * 60 * 60
+# Seconds between the fetches of a symbol after its earnings changed, and
+# the longest interval they are backed off to while they do not change
+MIN_INTERVAL = DAY
+MAX_INTERVAL = 32 * DAY
+# Days around an announced or expected event in which a symbol is fetched
+# every MIN_INTERVAL
+EVENT_WINDOW = 7
+# Ex-dates from which the cadence of the earnings of a symbol is estimated
+CADENCE_DATES = 8
+
+class RefreshSchedule:
+    """
+    This class decides when the earnings of each symbol are fetched again.
+    It keeps, by symbol, when they were fetched, the hash of their payload,
+    the interval until the next fetch and the latest ex-date and payment
+    day. The interval doubles each time the payload does not change, up to
+    MAX_INTERVAL. The symbols with an announced, recent or expected event
+    are fetched every MIN_INTERVAL, and they are fetched first
+    """
+    def __init__(self, file: str) -> None:
+        self.file = file
+        self.lock = threading.Lock()
+        self.symbols = {}
+        if exists(file):
+            with open(file) as f:
+                self.symbols = json.load(f)
+
+    def save(self) -> None:
+        with self.lock:
+            with open(self.file + ".tmp", "w") as f:
+                json.dump(self.symbols, f, indent=2, sort_keys=True)
+            replace(self.file + ".tmp", self.file)
+
+    def has_event(self, symbol: str, today: date) -> bool:
+        """
+        This function checks if the symbol has a payment to come or an
+        ex-date or payment in the last EVENT_WINDOW days, or if its next
+        ex-date, expected from its cadence, is within EVENT_WINDOW days
+        """
+        entry = self.symbols.get(symbol, {})
+        window = timedelta(days=EVENT_WINDOW)
+        for key in ["ex_date", "payment_day"]:
+            if entry.get(key) and date.fromisoformat(entry[key]) \
+                    >= today - window:
+                return True
+        if entry.get("ex_date") and entry.get("cadence"):
+            expected = date.fromisoformat(entry["ex_date"]) \
+                + timedelta(days=entry["cadence"])
+            return abs((expected - today).days) <= EVENT_WINDOW
+        return False
+
+    def next_fetch(self, symbol: str, now: float) -> float:
+        """
+        This function returns when the symbol is fetched again
+        """
+        entry = self.symbols.get(symbol)
+        if entry is None:
+            return 0.0
+        today = datetime.fromtimestamp(now).date()
+        if self.has_event(symbol, today):
+            return entry["fetched"] + MIN_INTERVAL
+        return entry["fetched"] + entry["interval"]
+
+    def plan(
+        self, symbols: List[str], now: float = None, limit: int = None
+    ) -> List[str]:
+        """
+        This function returns the symbols that are due, the ones with events
+        first and then the most overdue, up to the limit
+        """
+        now = time() if now is None else now
+        today = datetime.fromtimestamp(now).date()
+        due = [
+            (not self.has_event(symbol, today), next_fetch, symbol)
+                for symbol in symbols
+                for next_fetch in [self.next_fetch(symbol, now)]
+                if next_fetch <= now
+        ]
+        return [symbol for _, _, symbol in sorted(due)][:limit]
+
+    def is_changed(self, symbol: str, payload: str) -> bool:
+        with self.lock:
+            return self.symbols.get(symbol, {}).get("hash") != payload
+
+    def update(
+        self,
+        symbol: str,
+        payload: str,
+        df_dividend: pd.DataFrame,
+        now: float = None
+    ) -> bool:
+        """
+        This function records a fetch of the symbol, with the hash of its
+        payload and its dividends. It returns whether the payload changed
+        """
+        now = time() if now is None else now
+        with self.lock:
+            entry = self.symbols.get(symbol, {})
+            changed = entry.get("hash") != payload
+            interval = MIN_INTERVAL if changed else min(
+                2 * entry.get("interval", MIN_INTERVAL), MAX_INTERVAL
+            )
+            entry = {"fetched": now, "hash": payload, "interval": interval}
+            entry.update(event_dates(df_dividend))
+            self.symbols[symbol] = entry
+        return changed
+
+def event_dates(df_dividend: pd.DataFrame) -> Dict:
+    """
+    This function finds the latest ex-date and payment day of the dividends,
+    and the median number of days between their last ex-dates
+    """
+    if df_dividend is None or df_dividend.empty:
+        return {"ex_date": None, "payment_day": None, "cadence": None}
+    ex_dates = np.unique(df_dividend["ex_date"].dropna().to_numpy(
+        dtype="datetime64[D]"
+    ))
+    payment_days = df_dividend["payment_day"].dropna()
+    gaps = np.diff(ex_dates[-CADENCE_DATES:]).astype(np.int64)
+    gaps = gaps[gaps > 0]
+    return {
+        "ex_date": str(ex_dates[-1]) if len(ex_dates) else None,
+        "payment_day": (
+            payment_days.max().strftime("%Y-%m-%d")
+                if len(payment_days) else None
+        ),
+        "cadence": int(np.median(gaps)) if len(gaps) else None
+    }
@@ -0,0 +1,184 @@
+import json
+import re
+from functools import lru_cache
+from html import unescape
+from html.parser import HTMLParser
+from typing import List
+from bs4 import BeautifulSoup
+
+BONUS_ROW_CLASS = (
+    "d-flex justify-between align-items-center flex-wrap flex-md-nowrap"
+)
+# Positions of the cells of a bonus row: ex-date, incorporation date, value,
+# proportion and new ticker
+BONUS_CELLS = [2, 3, 5, 6, 7]
+
+EARNING_SECTION = re.compile(r"""\bid\s*=\s*["']?earning-section\b""")
+INPUT_TAG = re.compile(r"""<input\b(?:[^>"']|"[^"]*"|'[^']*')*>""", re.I)
+ATTRIBUTE = re.compile(r"""([\w-]+)\s*=\s*("[^"]*"|'[^']*'|[^\s"'>]+)""")
+BONUS_TITLE = re.compile(r"<h3\b[^>]*>BONIFICAÇÃO</h3>")
+CARD_BODY = re.compile(
+    r"""<div\b[^>]*\bclass\s*=\s*["'][^"']*\bcard-body\b[^"']*["'][^>]*>"""
+)
+
+class MarkupError(ValueError):
+    pass
+
+class StopParsing(Exception):
+    pass
+
+@lru_cache(maxsize=8)
+def parse_page(page: bytes) -> BeautifulSoup:
+    """
+    This function parses the whole page. The last pages are kept, so the
+    extractors that fall back to it parse each page once
+    """
+    return BeautifulSoup(page, 'html.parser')
+
+def attributes(tag: str) -> dict:
+    return {
+        name.lower(): unescape(value.strip("\"'"))
+            for name, value in ATTRIBUTE.findall(tag)
+    }
+
+def find_earnings(html: str) -> List[dict]:
+    """
+    This function finds the earnings json in the <input id="results"> of the
+    earning section, without parsing the rest of the page
+    """
+    section = EARNING_SECTION.search(html)
+    if section is None:
+        raise MarkupError("The earning section was not found")
+    for tag in INPUT_TAG.finditer(html, section.end()):
+        attrs = attributes(tag.group(0))
+        if attrs.get("id") == "results":
+            return json.loads(attrs["value"])
+    raise MarkupError("The earnings input was not found")
+
+class BonusParser(HTMLParser):
+    """
+    This class reads the rows of the bonus card body as it is fed, keeping
+    the first <strong> text of each cell
+    """
+    def __init__(self) -> None:
+        super().__init__()
+        self.depth = 0
+        self.container = None
+        self.row = None
+        self.cells = []
+        self.open_cells = []
+        self.strong = None
+        self.rows = []
+
+    def handle_starttag(self, tag: str, attrs: list) -> None:
+        if tag != "div":
+            if tag == "strong" and self.row is not None:
+                self.strong = ""
+            return
+        self.depth += 1
+        if self.depth == 1:
+            return
+        if self.container is None:
+            self.container = self.depth
+        elif self.row is None:
+            if dict(attrs).get("class") == BONUS_ROW_CLASS:
+                self.row = self.depth
+                self.cells = []
+                self.open_cells = []
+        else:
+            self.cells.append(None)
+            self.open_cells.append((self.depth, len(self.cells) - 1))
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag == "strong" and self.strong is not None:
+            for _, cell in self.open_cells:
+                if self.cells[cell] is None:
+                    self.cells[cell] = self.strong
+            self.strong = None
+            return
+        if tag != "div":
+            return
+        if self.open_cells and self.open_cells[-1][0] == self.depth:
+            self.open_cells.pop()
+        elif self.row == self.depth:
+            self.rows.append(self.cells)
+            self.row = None
+        elif self.container == self.depth or self.depth == 1:
+            raise StopParsing
+        self.depth -= 1
+
+    def handle_data(self, data: str) -> None:
+        if self.strong is not None:
+            self.strong += data
+
+def find_bonus(html: str) -> List[List[str]]:
+    """
+    This function finds the rows of the bonus card, parsing only its body
+    """
+    title = BONUS_TITLE.search(html)
+    if title is None:
+        raise MarkupError("The bonus card was not found")
+    body = CARD_BODY.search(html, title.end())
+    if body is None:
+        raise MarkupError("The bonus card body was not found")
+    parser = BonusParser()
+    try:
+        parser.feed(html[body.start():])
+    except StopParsing:
+        pass
+    else:
+        raise MarkupError("The bonus card body was not closed")
+    rows = []
+    for cells in parser.rows:
+        row = [cells[i] for i in BONUS_CELLS]
+        if None in row:
+            raise MarkupError("The bonus row has missing cells")
+        rows.append(row)
+    return rows
+
+def find_earnings_bs(bs: BeautifulSoup) -> List[dict]:
+    section = bs.find_all('div', {"id": "earning-section"})
+    input = section[0].findChildren("input", {"id": "results"})
+    return json.loads(input[0]["value"])
+
+def find_bonus_bs(bs: BeautifulSoup) -> List[List[str]]:
+    section = bs.find_all('h3', text="BONIFICAÇÃO")
+    section = section[0].parent.parent
+    section = section.findChildren("div", {"class": "card-body"})[0]
+    section = section.findChildren("div")
+    rows = []
+    if len(section) != 0:
+        section = section[0]
+        section = section.findChildren(
+            "div",
+            {
+            "class":
+            "d-flex justify-between align-items-center flex-wrap flex-md-nowrap"
+            }
+        )
+        for sec in section:
+            sec = sec.findChildren("div")
+            rows.append([
+                sec[i].findChildren("strong")[0].text for i in BONUS_CELLS
+            ])
+    return rows
+
+def extract_earnings(page: bytes) -> List[dict]:
+    """
+    This function extracts the earnings of the page, parsing the whole page
+    only when the markup is not the expected one
+    """
+    try:
+        return find_earnings(page.decode("utf-8"))
+    except (MarkupError, UnicodeDecodeError, ValueError, KeyError):
+        return find_earnings_bs(parse_page(page))
+
+def extract_bonus(page: bytes) -> List[List[str]]:
+    """
+    This function extracts the bonus rows of the page, parsing the whole page
+    only when the markup is not the expected one
+    """
+    try:
+        return find_bonus(page.decode("utf-8"))
+    except (MarkupError, UnicodeDecodeError, IndexError):
+        return find_bonus_bs(parse_page(page))
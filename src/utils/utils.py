@@ -1,28 +1,172 @@
-from os import listdir, makedirs
-from os.path import isfile, join, exists
-from typing import Dict
+import hashlib
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from os import makedirs, scandir, stat
+from os.path import abspath, dirname, join, exists, getmtime
+from typing import Dict, Iterable, List
+import numpy as np
 import pandas as pd
-from trade_confirmation.trade_confirmation import TradeConfirmation
+from trade_confirmation.trade_confirmation import (
+    TradeConfirmation,
+    read_paper
+)
+from trade_confirmation.utils import (
+    report_text,
+    tc_tables,
+    validate_papers,
+    validate_registries
+)
+from utils.instrumentation import count
 
-def read_trade_confirmation(trade_confirmation_dir: str) -> Dict:
+# Version of the parsed trade confirmations in the cache. It must change when
+# TradeConfirmation changes
+TC_CACHE_VERSION = 4
+# Number of files from which they are parsed in a process pool
+PARALLEL_PARSE = 256
+
+def file_hash(file_path: str) -> str:
+    """
+    This function calculates the content hash of a file
+    """
+    with open(file_path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def parse_trade_confirmation(file: str) -> Dict:
+    """
+    This function reads a trade confirmation file and creates its cache
+    entry. The paper is validated later, with the others
+    """
+    info = stat(file)
+    try:
+        paper = read_paper(file)
+    except ValueError:
+        paper = None
+    return {
+        "file": file,
+        "key": (info.st_size, info.st_mtime_ns),
+        "hash": file_hash(file),
+        "paper": paper
+    }
+
+def parse_trade_confirmations(files: List[str], workers: int = None) -> List:
     """
-    This function reads the trade confirmation files and validates them.
+    This function parses the trade confirmation files, in a process pool
+    when there are many of them
     """
-    tc_files = [join(trade_confirmation_dir, file)
-        for file in listdir(trade_confirmation_dir)
-            if isfile(join(trade_confirmation_dir, file))
-    ]
+    if len(files) < PARALLEL_PARSE:
+        return [parse_trade_confirmation(file) for file in files]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(
+            executor.map(parse_trade_confirmation, files, chunksize=64)
+        )
+
+def load_cache(cache_file: str) -> Dict:
+    if cache_file is None or not exists(cache_file):
+        return {}
+    with open(cache_file, "rb") as f:
+        cache = pickle.load(f)
+    if cache.get("version") != TC_CACHE_VERSION:
+        return {}
+    return cache["papers"]
+
+def save_cache(cache_file: str, papers: Dict) -> None:
+    create_folder(dirname(cache_file) + "/")
+    with open(cache_file, "wb") as f:
+        pickle.dump(
+            {"version": TC_CACHE_VERSION, "papers": papers},
+            f,
+            protocol=pickle.HIGHEST_PROTOCOL
+        )
+
+def read_trade_confirmation(
+    trade_confirmation_dir: str,
+    cache_file: str = None,
+    workers: int = None,
+    brokers: Iterable[str] = None,
+    symbols: Iterable[str] = None
+) -> Dict:
+    """
+    This function reads the .json trade confirmation files and validates
+    them. The parsed files are kept in the cache file by path, size, mtime and
+    content hash, so only the new or changed files are parsed again.
+    The new papers are validated at once, and the brokers and symbols of all
+    of them are checked against the given ones. Every violation is printed
+    before raising
+    """
+    tc_files = []
+    keys = {}
+    with scandir(trade_confirmation_dir) as entries:
+        for e in entries:
+            # The files being written are .json.tmp until they are renamed
+            if e.is_file() and e.name.endswith(".json"):
+                # The cache is kept by the absolute path, however the folder
+                # is given
+                file = abspath(join(trade_confirmation_dir, e.name))
+                info = e.stat()
+                tc_files.append(file)
+                keys[file] = (info.st_size, info.st_mtime_ns)
+    cache = load_cache(cache_file)
+    cached = {}
+    changed = []
+    touched = False
+    for file in tc_files:
+        entry = cache.get(file)
+        if entry is not None and entry["key"] != keys[file]:
+            # The file was touched, but it is the same if the content is
+            if entry["hash"] == file_hash(file):
+                entry["key"] = keys[file]
+                touched = True
+            else:
+                entry = None
+        if entry is None:
+            changed.append(file)
+        else:
+            cached[file] = entry
+    # The brokers and symbols of the cached papers may no longer exist
+    report = [validate_registries(
+        *tc_tables([entry["paper"] for entry in cached.values()]),
+        brokers, symbols
+    )]
+    entries = parse_trade_confirmations(changed, workers)
+    count("tc_files_read", len(entries))
+    count("tc_cache_hits", len(cached))
+    report.append(validate_papers(
+        {entry["file"]: entry["paper"] for entry in entries}, brokers, symbols
+    ))
+    invalid = set(report[-1]["file"])
+    for entry in entries:
+        file = entry.pop("file")
+        if file in invalid:
+            continue
+        entry["paper"] = TradeConfirmation(
+            file, entry["paper"], entry["hash"]
+        )
+        cached[file] = entry
+    if cache_file is not None and (
+        changed or touched or len(cached) != len(cache)
+    ):
+        save_cache(cache_file, cached)
+    report = pd.concat(report, ignore_index=True).sort_values(
+        "file", kind="stable"
+    )
+    if not report.empty:
+        for line in report_text(report).split("\n"):
+            print(f"[TRADE CONFIRMATION] {line}")
+        raise ValueError(
+            f"There are {len(report)} violations in "
+            f"{report['file'].nunique()} trade confirmations"
+        )
     papers = {}
     for file in tc_files:
-        paper = TradeConfirmation(file)
+        paper = cached[file]["paper"]
         if not paper.date in papers:
             papers[paper.date] = []
         papers[paper.date].append(paper)
     return papers
 
 def create_folder(folder: str) -> None:
-    if not exists(folder):
-        makedirs(folder)
+    # The folder may be created by another thread at the same time
+    makedirs(folder, exist_ok=True)
     return folder
 
 def get_dataframe(file: str, columns: list) -> pd.DataFrame:
@@ -36,12 +180,92 @@ def get_dataframe(file: str, columns: list) -> pd.DataFrame:
         df = pd.DataFrame(columns=columns)
     return df
 
-def save_to_file(stage: str, df: pd.DataFrame, file: str) -> None:
-    df_prev = get_dataframe(file, df.columns)
-    tc_name = df["tc_name"].unique()[0]
-    if not df_prev.loc[(df_prev["tc_name"] == tc_name)].empty:
-        df_prev = df_prev.loc[~(df_prev["tc_name"] == tc_name)]
-    df_prev = pd.concat([df_prev, df])
-    df_prev = df_prev.sort_values(["date", "tc_name"])
-    df_prev.to_csv(file, sep=';', index=False)
-    
\ No newline at end of file
+def sort_keys(df: pd.DataFrame) -> np.ndarray:
+    """
+    This function creates the keys used to sort the records by date and
+    tc_name. The separator is lower than any character, so comparing the
+    keys is the same as comparing the (date, tc_name) pairs
+    """
+    return (
+        df["date"].astype(str) + "\x00" + df["tc_name"].astype(str)
+    ).to_numpy(dtype=object)
+
+def merge_sorted(df_prev: pd.DataFrame, df: pd.DataFrame) -> pd.DataFrame:
+    """
+    This function merges new records into the records of a file, which are
+    already sorted by date and tc_name, without sorting them again.
+    The new records go after the previous ones with the same keys
+    """
+    df = df.iloc[np.argsort(sort_keys(df), kind="stable")]
+    positions = np.searchsorted(
+        sort_keys(df_prev), sort_keys(df), side="right"
+    )
+    order = np.insert(
+        np.arange(len(df_prev)), positions, len(df_prev) + np.arange(len(df))
+    )
+    return pd.concat([df_prev, df]).iloc[order]
+
+class BatchWriter:
+    """
+    This class collects the records of each ledger and writes every ledger
+    once, in a single transaction of the storage
+    """
+    def __init__(self, storage) -> None:
+        self.storage = storage
+        self.records = {}
+        self.rows = {}
+        self.removed = {}
+
+    def save(self, df: pd.DataFrame, table: str, symbol: str = None) -> None:
+        """
+        This function records the rows of a trade confirmation, which replace
+        its previous rows in the ledger
+        """
+        self.records.setdefault((table, symbol), []).append(df)
+
+    def save_rows(
+        self,
+        rows: List[tuple],
+        columns: List[str],
+        table: str,
+        symbol: str = None
+    ) -> None:
+        """
+        This function records the rows of a trade confirmation as tuples. The
+        rows of a ledger become a single dataframe when it is written
+        """
+        self.rows.setdefault((table, symbol), (columns, []))[1].extend(rows)
+
+    def remove(self, tc_name: str, table: str, symbol: str = None) -> None:
+        """
+        This function removes the rows of a trade confirmation from a ledger
+        """
+        self.removed.setdefault((table, symbol), set()).add(tc_name)
+
+    def flush(self) -> None:
+        """
+        This function writes every ledger once. The ledgers that have no rows
+        left are deleted
+        """
+        for key, (columns, rows) in self.rows.items():
+            self.records.setdefault(key, []).append(
+                pd.DataFrame(rows, columns=columns)
+            )
+        with self.storage.transaction():
+            for table, symbol in set(self.records) | set(self.removed):
+                self.storage.merge(
+                    table,
+                    self.records.get((table, symbol), []),
+                    self.removed.get((table, symbol), set()),
+                    symbol
+                )
+        self.records = {}
+        self.rows = {}
+        self.removed = {}
+
+def is_outdated(updated: float, source: str) -> bool:
+    """
+    This function checks if records written at updated are older than the
+    file they are derived from
+    """
+    return updated is None or updated < getmtime(source)
@@ -0,0 +1,94 @@
+from os import scandir
+from time import sleep
+from typing import Dict, List
+
+# Seconds between the scans of the folder when it is polled
+POLL_INTERVAL = 0.1
+# Seconds without changes after which a burst of changes is over
+DEBOUNCE = 0.2
+
+class DirectoryWatcher:
+    """
+    This class waits for the files of a folder to change. It is notified by
+    inotify when the inotify_simple package is installed, and polls the
+    folder otherwise. The changes are debounced, so a burst of changes is
+    returned at once, when no file changed for the debounce seconds
+    """
+    def __init__(
+        self,
+        dir: str,
+        suffix: str = ".json",
+        interval: float = POLL_INTERVAL,
+        debounce: float = DEBOUNCE
+    ) -> None:
+        self.dir = dir
+        self.suffix = suffix
+        self.interval = interval
+        self.debounce = debounce
+        self.files = self.snapshot()
+        try:
+            from inotify_simple import INotify, flags
+            self.inotify = INotify()
+            self.inotify.add_watch(
+                dir,
+                flags.CLOSE_WRITE | flags.MOVED_TO | flags.MOVED_FROM
+                | flags.DELETE | flags.CREATE
+            )
+        except (ImportError, OSError):
+            self.inotify = None
+
+    def snapshot(self) -> Dict[str, tuple]:
+        """
+        This function reads the size and modification time of the files
+        """
+        files = {}
+        with scandir(self.dir) as entries:
+            for entry in entries:
+                if not entry.name.endswith(self.suffix):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    # The file was removed while the folder was read
+                    continue
+                files[entry.name] = (stat.st_size, stat.st_mtime_ns)
+        return files
+
+    def block(self, seconds: float) -> None:
+        """
+        This function waits for a notification or for the seconds
+        """
+        if self.inotify is None:
+            sleep(seconds)
+        else:
+            self.inotify.read(timeout=int(seconds * 1000))
+
+    def wait(self) -> List[str]:
+        """
+        This function waits until files are added, changed or removed, and
+        returns their names
+        """
+        changed = set()
+        while True:
+            if changed:
+                self.block(self.debounce)
+            elif self.inotify is None:
+                self.block(self.interval)
+            else:
+                # The folder is also scanned once a second, in case a
+                # notification is missed
+                self.block(1.0)
+            files = self.snapshot()
+            names = {
+                name for name in set(files) | set(self.files)
+                    if files.get(name) != self.files.get(name)
+            }
+            self.files = files
+            if names:
+                changed |= names
+            elif changed:
+                return sorted(changed)
+
+    def close(self) -> None:
+        if self.inotify is not None:
+            self.inotify.close()
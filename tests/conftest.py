@@ -0,0 +1,4 @@
+import sys
+from os.path import dirname, realpath
+
+sys.path.append(dirname(realpath(__file__)) + "/../src")
@@ -0,0 +1,125 @@
+import numpy as np
+import pandas as pd
+from investment_portfolio.corporate_actions import ACTION_COLUMNS, apply_actions
+
+def operations(trades: list) -> pd.DataFrame:
+    """
+    This function creates the operations from (date, symbol, amount, value
+    in cents) trades, without fees
+    """
+    amounts = np.array([trade[2] for trade in trades], dtype=np.int64)
+    values = np.array([trade[3] for trade in trades], dtype=np.int64)
+    prices = values / 100 / amounts
+    return pd.DataFrame({
+        "date": pd.to_datetime([trade[0] for trade in trades]),
+        "symbol": [trade[1] for trade in trades],
+        "amount": amounts,
+        "price": prices,
+        "value": values,
+        "cost_of_fees": np.zeros(len(trades), dtype=np.int64),
+        "value_without_fees": values,
+        "price_without_fees": prices,
+        "tc_name": [f"tc-{i}-1" for i in range(len(trades))]
+    })
+
+def actions(rows: list) -> pd.DataFrame:
+    """
+    This function creates the actions from (symbol, type, ex_date, ratio,
+    value, new_symbol) rows
+    """
+    df = pd.DataFrame(rows, columns=ACTION_COLUMNS)
+    df["ex_date"] = pd.to_datetime(df["ex_date"])
+    return df
+
+def added(df: pd.DataFrame) -> pd.DataFrame:
+    return df.loc[df["tc_name"].str.startswith("corporate-action")] \
+        .reset_index(drop=True)
+
+def test_bonus_floors_the_fractions_of_shares():
+    df = apply_actions(
+        operations([
+            ("2021-01-05", "AAAA3", 105, 105000),
+            ("2021-01-05", "BBBB3", 100, 50000),
+            # After the ex_date, so without bonus
+            ("2021-03-01", "AAAA3", 100, 100000),
+        ]),
+        actions([
+            ("AAAA3", "bonus", "2021-03-01", 0.1, 5.5, "AAAA3"),
+            # 100 * 0.29 is 28.999999999999996 in floats
+            ("BBBB3", "bonus", "2021-03-01", 0.29, 1.0, "BBBB3"),
+        ])
+    )
+    df_added = added(df)
+    assert df_added["symbol"].tolist() == ["AAAA3", "BBBB3"]
+    assert df_added["amount"].tolist() == [10, 29]
+    assert df_added["value"].tolist() == [5500, 2900]
+    assert df_added["value_without_fees"].tolist() == [5500, 2900]
+    assert df_added["price"].tolist() == [5.5, 1.0]
+    assert df_added["tc_name"].tolist() == [
+        "corporate-action-bonus-AAAA3-2021-03-01-1",
+        "corporate-action-bonus-BBBB3-2021-03-01-1"
+    ]
+    assert df["amount"].dtype == np.int64
+
+def test_split_adjusts_the_operations_before_it():
+    df = apply_actions(
+        operations([
+            ("2021-01-05", "AAAA3", 100, 100000),
+            ("2021-03-01", "AAAA3", 10, 6000),
+        ]),
+        actions([("AAAA3", "split", "2021-03-01", 2.0, 0.0, "AAAA3")])
+    )
+    assert added(df).empty
+    assert df["amount"].tolist() == [200, 10]
+    assert df["price"].tolist() == [5.0, 6.0]
+    assert df["value"].tolist() == [100000, 6000]
+    assert df["amount"].dtype == np.int64
+
+def test_reverse_split_keeps_whole_amounts():
+    df = apply_actions(
+        operations([
+            ("2021-01-05", "AAAA3", 1000, 100000),
+            ("2021-02-01", "AAAA3", 10, 10000),
+        ]),
+        actions([
+            ("AAAA3", "split", "2021-02-01", 0.1, 0.0, "AAAA3"),
+            ("AAAA3", "split", "2021-03-01", 3.0, 0.0, "AAAA3"),
+        ])
+    )
+    # 1000 * 0.1 * 3 is 300.00000000000006 in floats
+    assert df["amount"].tolist() == [300, 30]
+    assert df["amount"].dtype == np.int64
+    assert np.allclose(df["price"], [10 / 3, 10 / 3])
+
+def test_rename_moves_the_position_at_its_average_cost():
+    df = apply_actions(
+        operations([
+            ("2021-01-05", "AAAA3", 100, 100000),
+            ("2021-02-01", "AAAA3", 50, 60000),
+            ("2021-03-01", "AAAA3", -30, -36000),
+        ]),
+        actions([("AAAA3", "rename", "2021-06-01", 1.0, 0.0, "CCCC3")])
+    )
+    df_added = added(df)
+    assert df_added["symbol"].tolist() == ["AAAA3", "CCCC3"]
+    assert df_added["amount"].tolist() == [-120, 120]
+    # 120 of 150 shares that cost 1,600.00
+    assert df_added["value"].tolist() == [-128000, 128000]
+    # The shares that leave are not sold
+    assert df_added["value_without_fees"].tolist() == [0, 128000]
+    assert df_added["price"].tolist() == [1600 / 150, 1600 / 150]
+
+def test_split_then_rename():
+    df = apply_actions(
+        operations([("2021-01-05", "AAAA3", 100, 100000)]),
+        actions([
+            ("AAAA3", "split", "2021-03-01", 2.0, 0.0, "AAAA3"),
+            ("AAAA3", "rename", "2021-06-01", 1.0, 0.0, "CCCC3"),
+            ("CCCC3", "bonus", "2021-09-01", 0.1, 2.0, "CCCC3"),
+        ])
+    )
+    assert df["amount"].iloc[0] == 200
+    df_added = added(df)
+    assert df_added["symbol"].tolist() == ["AAAA3", "CCCC3", "CCCC3"]
+    assert df_added["amount"].tolist() == [-200, 200, 20]
+    assert df_added["value"].tolist() == [-100000, 100000, 4000]
@@ -0,0 +1,52 @@
+import pandas as pd
+from investment_portfolio.investment_portfolio import dividends_story
+from investment_portfolio.ledger import Ledger
+
+STORY_COLUMNS = [
+    "symbol", "prev_date", "payment_day", "type", "dividend_per_stock",
+    "amount", "investment", "price", "dividend_received"
+]
+
+def ledger() -> Ledger:
+    # Buy 10 at 10 on the first trade date and 5 at 12 later, in cents
+    return Ledger(pd.DataFrame({
+        "date": ["2021-01-04", "2021-02-01"],
+        "symbol": ["AAAA3", "AAAA3"],
+        "amount": [10, 5],
+        "price": [10.0, 12.0],
+        "value": [10000, 6000],
+        "cost_of_fees": [0, 0],
+        "value_without_fees": [10000, 6000],
+        "price_without_fees": [10.0, 12.0],
+        "tc_name": ["tc-1-1", "tc-2-1"],
+    }))
+
+def dividends() -> pd.DataFrame:
+    prev_dates = ["2020-12-01", "2021-01-04", "2021-01-20", "2021-02-01"]
+    return pd.DataFrame({
+        "symbol": "AAAA3",
+        "prev_date": prev_dates,
+        "payment_day": ["2021-03-01"] * len(prev_dates),
+        "type": "Dividendo",
+        "value": 1.0,
+    })
+
+def test_dividend_on_the_first_trade_date_gets_the_position_of_that_day():
+    df = dividends_story(ledger().positions(), dividends())
+    assert list(df.columns) == STORY_COLUMNS
+    df = df.sort_values("prev_date")
+    # The dividend before the first trade is left out, the one on the
+    # first trade date counts its trades and the later ones do not count
+    # the trades of their own day
+    assert df["prev_date"].tolist() == [
+        "2021-01-04", "2021-01-20", "2021-02-01"
+    ]
+    assert df["amount"].tolist() == [10, 10, 10]
+    assert df["investment"].tolist() == [100.0, 100.0, 100.0]
+
+def test_cost_basis_is_kept_apart_from_the_story():
+    ledger_ = ledger()
+    df = dividends_story(ledger_.positions(), dividends(), ledger_.lots())
+    assert list(df.columns) == STORY_COLUMNS + ["cost"]
+    assert df["cost"].notna().all()
+    assert df["cost"].tolist() == [100.0, 100.0, 100.0]
@@ -0,0 +1,43 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from utils.fetcher import HTTPFetcher
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, *args):
+        pass
+
+def test_close_closes_the_connections_of_every_thread():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        fetcher = HTTPFetcher(
+            f"http://127.0.0.1:{server.server_port}/", interval=0
+        )
+        threads = [
+            threading.Thread(target=fetcher.get, args=("page",))
+                for _ in range(3)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        connections = list(fetcher.connections)
+        assert len(connections) == 3
+        fetcher.close()
+        assert not fetcher.connections
+        assert all(conn.sock is None for conn in connections)
+        # A thread whose connection was closed opens a new one
+        assert fetcher.get("page") == b"ok"
+        assert len(fetcher.connections) == 1
+        fetcher.close()
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,29 @@
+import numpy as np
+import pandas as pd
+from investment_portfolio.income import IncomeCube, income_rows
+
+def test_yield_on_cost_is_aggregated_from_the_cost_basis():
+    df_dividend_story = pd.DataFrame({
+        "symbol": ["AAAA3", "AAAA3", "AAAA3", "BBBB3"],
+        "payment_day": [
+            "2021-01-10", "2021-01-20", "2021-02-10", "2021-02-15"
+        ],
+        "type": ["Dividendo", "Dividendo", "Dividendo", "Dividendo"],
+        "amount": [10, 10, 20, 5],
+        "dividend_received": [1.0, 2.0, 3.0, 4.0],
+        "cost": [100.0, 120.0, 200.0, 50.0],
+    })
+    df_income = income_rows(df_dividend_story)
+    assert df_income["cost"].tolist() == [120.0, 200.0, 50.0]
+    cube = IncomeCube(df_income)
+    # The net income is summed, but the cost basis is the one held last
+    total = cube.total(symbol="AAAA3")
+    assert total["net"] == 6.0
+    assert total["cost"] == 200.0
+    assert np.isclose(total["yield_on_cost"], 6.0 / 200.0)
+    # The cost basis of the symbols is summed
+    total = cube.total(year="2021")
+    assert total["cost"] == 250.0
+    assert np.isclose(total["yield_on_cost"], 10.0 / 250.0)
+    assert cube.total(month="2021-01")["cost"] == 120.0
+    assert cube.total(symbol="CCCC3")["yield_on_cost"] == 0.0
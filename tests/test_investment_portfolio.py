@@ -0,0 +1,137 @@
+import json
+from os import remove
+from shutil import copytree
+import pandas as pd
+import pytest
+from investment_portfolio.investment_portfolio import InvestmentPortfolio
+from migrate import migrate
+from storage.storage import TABLES, get_storage
+from utils.utils import read_trade_confirmation
+
+FEES = {"liquidacao": 0.31, "emolumentos": 0.07}
+
+def write_paper(dir, name: str, date: str, operations: list, fees=FEES):
+    """
+    This function writes a trade confirmation whose values match its
+    operations and fees
+    """
+    operations = [
+        {
+            "symbol": symbol, "amount": amount, "price": price,
+            "value": round(amount * price, 2)
+        }
+            for symbol, amount, price in operations
+    ]
+    cents = sum(round(o["value"] * 100) for o in operations)
+    fees_cents = sum(round(value * 100) for value in fees.values())
+    with open(dir / name, "w") as f:
+        json.dump({
+            "broker": "broker",
+            "date": date,
+            "operations_value": cents / 100,
+            "settlement_amount": (cents + fees_cents) / 100,
+            "fees": fees,
+            "operations": operations
+        }, f)
+
+def write_earnings(dir) -> None:
+    """
+    This function writes a rename of AAAA3 to CCCC3, a bonus of BBBB3 and
+    the dividends of BBBB3
+    """
+    dir.mkdir(parents=True)
+    (dir / "actions-AAAA3.csv").write_text(
+        "type;ex_date;new_symbol\nrename;2021-06-01;CCCC3\n"
+    )
+    (dir / "bonus-BBBB3.csv").write_text(
+        "symbol;ex-date;incorporation_date;proportion;value;new_ticker;"
+        "ex_date;prev_date\n"
+        "BBBB3;;2021-03-02;10.0;5.5;BBBB3;2021-03-01;2021-02-26\n"
+    )
+    (dir / "dividends-BBBB3.csv").write_text(
+        "symbol;ex_date;prev_date;payment_day;type;value_without_tax;value\n"
+        "BBBB3;2021-02-11;2021-02-10;2021-03-10;Dividendo;0.5;0.5\n"
+        "BBBB3;2021-08-11;2021-08-10;2021-09-10;JCP;0.4;0.34\n"
+    )
+
+def tables(storage) -> dict:
+    """
+    This function reads every table of the storage
+    """
+    frames = {}
+    for table, spec in TABLES.items():
+        symbols = storage.symbols(table) if spec.get("symbol") else [None]
+        for symbol in symbols:
+            if storage.exists(table, symbol):
+                frames[(table, symbol)] = storage.read(table, symbol)
+    return frames
+
+def build(root, tc_dir, backend: str) -> InvestmentPortfolio:
+    dir = str(root / "investment-portfolio") + "/"
+    return InvestmentPortfolio(
+        dir, read_trade_confirmation(str(tc_dir)),
+        get_storage(dir, backend)
+    )
+
+@pytest.mark.parametrize("backend", ["csv", "sqlite"])
+def test_incremental_update_matches_full_rebuild(tmp_path, backend):
+    tc_dir = tmp_path / "trade-confirmation"
+    tc_dir.mkdir()
+    write_earnings(tmp_path / "incremental" / "earnings-history")
+    copytree(
+        tmp_path / "incremental" / "earnings-history",
+        tmp_path / "full" / "earnings-history"
+    )
+    write_paper(tc_dir, "tc-1.json", "2021-01-05", [
+        ("AAAA3", 100, 10.0), ("BBBB3", 200, 20.5)
+    ])
+    write_paper(tc_dir, "tc-2.json", "2021-02-01", [("BBBB3", -50, 22.0)])
+    write_paper(tc_dir, "tc-3.json", "2021-04-01", [("AAAA3", 30, 12.0)])
+    write_paper(tc_dir, "tc-4.json", "2021-07-01", [
+        ("CCCC3", -40, 15.0), ("DDDD3", 10, 50.0)
+    ])
+    build(tmp_path / "incremental", tc_dir, backend)
+
+    # A purchase before the rename changes the position moved to CCCC3
+    write_paper(tc_dir, "tc-5.json", "2021-05-03", [("AAAA3", 20, 11.0)])
+    remove(tc_dir / "tc-2.json")
+    write_paper(
+        tc_dir, "tc-4.json", "2021-07-01",
+        [("CCCC3", -40, 15.0), ("DDDD3", 10, 50.0)],
+        {"liquidacao": 0.52, "emolumentos": 0.09}
+    )
+    incremental = build(tmp_path / "incremental", tc_dir, backend)
+    full = build(tmp_path / "full", tc_dir, backend)
+
+    pd.testing.assert_frame_equal(
+        incremental.ledger.operations, full.ledger.operations
+    )
+    incremental_tables = tables(incremental.storage)
+    full_tables = tables(full.storage)
+    assert incremental_tables.keys() == full_tables.keys()
+    for key, df in full_tables.items():
+        pd.testing.assert_frame_equal(
+            incremental_tables[key], df, obj=str(key)
+        )
+
+def test_migration_to_sqlite_keeps_the_tables(tmp_path):
+    tc_dir = tmp_path / "trade-confirmation"
+    tc_dir.mkdir()
+    write_earnings(tmp_path / "earnings-history")
+    write_paper(tc_dir, "tc-1.json", "2021-01-05", [
+        ("AAAA3", 100, 10.0), ("BBBB3", 200, 20.5)
+    ])
+    write_paper(tc_dir, "tc-2.json", "2021-02-01", [("BBBB3", -50, 22.0)])
+    write_paper(tc_dir, "tc-3.json", "2021-07-01", [
+        ("CCCC3", -40, 15.0), ("DDDD3", 10, 50.0)
+    ])
+    csv = build(tmp_path, tc_dir, "csv").storage
+    migrate(str(tmp_path / "investment-portfolio") + "/")
+
+    csv_tables = tables(csv)
+    sqlite_tables = tables(get_storage(
+        str(tmp_path / "investment-portfolio") + "/", "sqlite"
+    ))
+    assert sqlite_tables.keys() == csv_tables.keys()
+    for key, df in csv_tables.items():
+        pd.testing.assert_frame_equal(sqlite_tables[key], df, obj=str(key))
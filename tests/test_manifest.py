@@ -0,0 +1,42 @@
+import json
+from os import listdir
+from investment_portfolio import manifest
+from investment_portfolio.manifest import (
+    diff_manifest,
+    load_manifest,
+    manifest_entry,
+    save_manifest
+)
+
+class Paper:
+    def __init__(self, file_path, hash=None):
+        self.name = file_path.rsplit("/", 1)[-1]
+        self.file_path = file_path
+        self.hash = hash
+        self.symbols = ("B", "A", "B")
+
+def test_save_manifest_replaces_the_file(tmp_path):
+    file = str(tmp_path / "manifest.json")
+    save_manifest(file, {"a": 1})
+    save_manifest(file, {"b": 2})
+    assert load_manifest(file) == {"b": 2}
+    assert listdir(tmp_path) == ["manifest.json"]
+
+def test_the_known_hash_is_not_computed_again(tmp_path, monkeypatch):
+    file = tmp_path / "tc.json"
+    file.write_text(json.dumps({}))
+    tc = Paper(str(file), "known")
+    monkeypatch.setattr(manifest, "file_hash", None)
+    entry = manifest_entry(tc)
+    assert entry["hash"] == "known"
+    assert entry["symbols"] == ["A", "B"]
+    # A touched file with the same hash is kept, with its new mtime
+    entry["mtime"] -= 1
+    changed, deleted = diff_manifest({"tc.json": entry}, {"2020-01-01": [tc]})
+    assert changed == [] and deleted == []
+
+def test_the_hash_is_computed_when_unknown(tmp_path):
+    file = tmp_path / "tc.json"
+    file.write_text("{}")
+    entry = manifest_entry(Paper(str(file)))
+    assert entry["hash"] == manifest.file_hash(str(file))
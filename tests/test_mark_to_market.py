@@ -0,0 +1,31 @@
+import pandas as pd
+from investment_portfolio.ledger import Ledger
+from investment_portfolio.mark_to_market import MarkToMarket
+from investment_portfolio.position_index import PositionIndex
+from prices.prices import PriceStore
+
+def test_unrealised_profit_is_over_the_cost_of_the_amount_held(tmp_path):
+    # Buy 10 at 10 and sell 5 at 20, in cents
+    ledger = Ledger(pd.DataFrame({
+        "date": ["2021-01-04", "2021-01-05"],
+        "symbol": ["AAAA3", "AAAA3"],
+        "amount": [10, -5],
+        "price": [10.0, 20.0],
+        "value": [10000, -10000],
+        "cost_of_fees": [0, 0],
+        "value_without_fees": [10000, -10000],
+        "price_without_fees": [10.0, 20.0],
+        "tc_name": ["tc-1-1", "tc-2-1"],
+    }))
+    prices = PriceStore(str(tmp_path) + "/")
+    prices.append(pd.DataFrame({
+        "date": ["2021-01-05"], "symbol": ["AAAA3"], "close": [20.0]
+    }))
+    df_lots = ledger.lot_story()
+    totals = MarkToMarket(
+        PositionIndex(df_lots),
+        prices,
+        realised=PositionIndex(df_lots.assign(value=df_lots["realized"]))
+    ).totals()
+    assert totals[["market_value", "cost", "unrealised", "realised"]] \
+        .iloc[-1].tolist() == [100.0, 50.0, 50.0, 50.0]
@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+from utils.money import allocate, to_cents, to_cents_array
+
+def test_allocate_gives_the_remainder_to_the_largest_fractions():
+    # 100 * 1/6, 2/6, 3/6 is 16.67, 33.33 and 50
+    assert allocate([100], [1, 2, 3], [0, 0, 0]).tolist() == [17, 33, 50]
+    # The ties go to the first rows, in each group
+    shares = allocate([10, 7], [3, 1, 2, 2], [0, 0, 1, 1])
+    assert shares.tolist() == [8, 2, 4, 3]
+
+def test_allocate_negative_totals_sum_exactly():
+    shares = allocate([-100, -7], [1, 1, 1, 1, 1], [0, 0, 0, 1, 1])
+    assert shares.tolist() == [-33, -33, -34, -3, -4]
+    assert np.bincount([0, 0, 0, 1, 1], weights=shares).tolist() \
+        == [-100, -7]
+
+def test_allocate_zero_weights():
+    # A row without weight gets nothing, and so does a group without total
+    shares = allocate([5, 0], [1, 0, 2, 1], [0, 0, 0, 1])
+    assert shares.tolist() == [2, 0, 3, 0]
+    with pytest.raises(ValueError):
+        allocate([10], [0, 0], [0, 0])
+
+def test_cents_of_scalars_and_arrays_are_rounded_the_same():
+    # 0.125 and 2.675 are half cents by their shortest representation, but
+    # 2.675 * 100 is 267.49999999999997 in floats
+    values = [0.125, 2.675, -2.675, 0.135, 1.005, -0.005, 0.1, 0.3, 1234.56]
+    expected = [12, 268, -268, 14, 100, 0, 10, 30, 123456]
+    assert [to_cents(value) for value in values] == expected
+    assert to_cents_array(values).tolist() == expected
+    rng = np.random.default_rng(0)
+    values = np.concatenate([
+        np.round(rng.uniform(-1e4, 1e4, 5000), 3),
+        rng.uniform(-1e6, 1e6, 5000)
+    ])
+    assert to_cents_array(values).tolist() \
+        == [to_cents(float(value)) for value in values]
@@ -0,0 +1,101 @@
+import pytest
+from pipeline.pipeline import Pipeline, Stage
+
+def dag(tmp_path, calls: list, jobs: int) -> Pipeline:
+    """
+    This function creates a DAG of two inputs, a and b, read by the stages
+    a and b, whose results go through c and d to e
+    """
+    def read(name):
+        def function(results):
+            calls.append(name)
+            return (tmp_path / name).read_text()
+        return function
+
+    def upper(name, required):
+        def function(results):
+            calls.append(name)
+            return "".join(results[r] for r in required).upper()
+        return function
+
+    return Pipeline(
+        [
+            Stage("a", read("a"), inputs=[str(tmp_path / "a")]),
+            Stage("b", read("b"), inputs=[str(tmp_path / "b")]),
+            Stage("c", upper("c", ["a"]), ["a"], resource="r"),
+            Stage("d", upper("d", ["b"]), ["b"], resource="r"),
+            Stage("e", upper("e", ["c", "d"]), ["c", "d"]),
+        ],
+        str(tmp_path / "pipeline") + "/",
+        jobs
+    )
+
+@pytest.fixture(params=[1, 4])
+def run(request, tmp_path):
+    (tmp_path / "a").write_text("a")
+    (tmp_path / "b").write_text("b")
+    calls = []
+
+    def run(*args, **kwargs):
+        calls.clear()
+        pipeline = dag(tmp_path, calls, request.param)
+        status = pipeline.run(*args, **kwargs)
+        return status, sorted(calls), pipeline
+    run(None)
+    return run
+
+def test_second_run_skips_every_stage(run):
+    status, calls, _ = run(None)
+    assert calls == []
+    assert set(status.values()) == {"up to date"}
+
+def test_changed_input_runs_only_the_stages_that_depend_on_it(run, tmp_path):
+    (tmp_path / "b").write_text("x")
+    status, calls, pipeline = run(None)
+    assert calls == ["b", "d", "e"]
+    assert pipeline.result("e") == "AX"
+
+def test_same_result_does_not_run_the_next_stages(run, tmp_path):
+    # The file is written again with the same content
+    (tmp_path / "a").write_text("a")
+    status, calls, _ = run(None, force=["c"])
+    assert calls == ["c"]
+    assert status["e"] == "up to date"
+
+def test_kept_stage_reuses_its_previous_result(run, tmp_path):
+    (tmp_path / "a").write_text("y")
+    status, calls, pipeline = run(None, keep=["a"])
+    assert calls == []
+    assert status["a"] == "up to date"
+    assert pipeline.result("e") == "AB"
+    # Without keep the change is seen
+    status, calls, pipeline = run(None)
+    assert calls == ["a", "c", "e"]
+    assert pipeline.result("e") == "YB"
+
+def test_targets_run_only_the_stages_they_require(run, tmp_path):
+    (tmp_path / "a").write_text("y")
+    (tmp_path / "b").write_text("x")
+    status, calls, _ = run(["c"])
+    assert list(status) == ["a", "c"]
+    assert calls == ["a", "c"]
+
+def test_stage_without_inputs_is_up_to_date_after_its_first_run(tmp_path):
+    # As the prices without files to import
+    calls = []
+    files = []
+
+    def prices(results):
+        calls.append("prices")
+        return {}
+
+    for _ in range(2):
+        status = Pipeline(
+            [Stage(
+                "prices", prices, inputs=files, params=files,
+                dirty=lambda: bool(files) and not (tmp_path / "npz").exists()
+            )],
+            str(tmp_path / "pipeline") + "/"
+        ).run()
+    assert calls == ["prices"]
+    assert status == {"prices": "up to date"}
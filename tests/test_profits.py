@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+from investment_portfolio.profits import (
+    SALES_EXEMPTION,
+    monthly_profits,
+    symbol_months,
+    track_lots
+)
+
+def operations(symbol: str, trades: list) -> pd.DataFrame:
+    """
+    This function creates the operations of a symbol from (date, amount,
+    value, value without fees) trades. The sales have negative values
+    """
+    return pd.DataFrame({
+        "date": [trade[0] for trade in trades],
+        "symbol": symbol,
+        "amount": np.array([trade[1] for trade in trades], dtype=np.int64),
+        "value": [trade[2] for trade in trades],
+        "value_without_fees": [trade[3] for trade in trades],
+        "tc_name": [f"tc-{i}-1" for i in range(len(trades))]
+    })
+
+def test_average_cost_across_months_until_the_position_is_closed():
+    df = track_lots(operations("AAAA3", [
+        ("2021-01-05", 100, 1000.0, 990.0),
+        ("2021-01-20", 100, 1200.0, 1190.0),
+        # 50 of the 200 at the average price of 11.00
+        ("2021-02-10", -50, -600.0, -605.0),
+        ("2021-03-10", -150, -1500.0, -1510.0),
+    ]))
+    assert df["position"].tolist() == [100, 200, 150, 0]
+    assert df["cost"].tolist() == [1000.0, 2200.0, 1650.0, 0.0]
+    assert df["sold_cost"].tolist() == [0.0, 0.0, 550.0, 1650.0]
+    assert df["realized"].tolist() == [0.0, 0.0, 50.0, -150.0]
+    assert df["sale_value"].tolist() == [0.0, 0.0, 605.0, 1510.0]
+    assert df["avg_price"].tolist()[:3] == [10.0, 11.0, 11.0]
+    # A closed position has no average price
+    assert np.isnan(df["avg_price"].iloc[3])
+
+    df_months = symbol_months(df)
+    assert df_months["month"].tolist() == ["2021-02", "2021-03"]
+    assert df_months["sales"].tolist() == [60500, 151000]
+    assert df_months["realized"].tolist() == [50.0, -150.0]
+
+def test_a_sale_beyond_the_position_opens_a_short_one():
+    df = track_lots(operations("AAAA3", [
+        ("2021-01-05", 20, 200.0, 200.0),
+        ("2021-01-06", -30, -450.0, -450.0),
+        ("2021-01-07", 10, 120.0, 120.0),
+    ]))
+    assert df["position"].tolist() == [20, -10, 0]
+    # The 20 closed received 2/3 of the sale, the other 10 are at its price
+    assert df["realized"].tolist() == [0.0, 100.0, 30.0]
+    assert df["cost"].tolist() == [200.0, -150.0, 0.0]
+    assert df["avg_price"].iloc[1] == 15.0
+
+def test_previous_position_and_cost():
+    df = track_lots(
+        operations("AAAA3", [("2021-04-01", -10, -130.0, -130.0)]),
+        position=40, cost=480.0
+    )
+    assert df["sold_cost"].tolist() == [120.0]
+    assert df["realized"].tolist() == [10.0]
+    assert df["cost"].tolist() == [360.0]
+
+def test_sales_exemption_at_the_limit():
+    limit = round(SALES_EXEMPTION * 100)
+    df_months = pd.DataFrame({
+        "symbol": ["AAAA3", "AAAA3", "BBBB3", "AAAA3", "BBBB3"],
+        "month": ["2021-01", "2021-02", "2021-02", "2021-03", "2021-03"],
+        "sales": [limit, limit // 2, limit // 2 + 1, limit - 1, 1],
+        "realized": [1000.0, 600.0, 400.0, -300.0, 100.0]
+    })
+    df = monthly_profits(df_months)
+    assert df["month"].tolist() == ["2021-01", "2021-02", "2021-03"]
+    assert df["sales"].tolist() == [20000.0, 20000.01, 20000.0]
+    # The sales of every symbol count for the limit, and a month exactly at
+    # it is exempt
+    assert df["exempt"].tolist() == [True, False, True]
+    assert df["realized"].tolist() == [1000.0, 1000.0, -200.0]
+    assert df["taxable"].tolist() == [0.0, 1000.0, 0.0]
+    assert df["tax"].tolist() == [0.0, 150.0, 0.0]
+
+def test_a_taxable_loss_has_no_tax():
+    df = monthly_profits(pd.DataFrame({
+        "symbol": ["AAAA3"], "month": ["2021-05"],
+        "sales": [3000000], "realized": [-500.0]
+    }))
+    assert df["exempt"].tolist() == [False]
+    assert df["taxable"].tolist() == [-500.0]
+    assert df["tax"].tolist() == [0.0]
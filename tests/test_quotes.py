@@ -0,0 +1,21 @@
+from prices.quotes import QuoteCache, QuoteProvider
+
+class FakeProvider(QuoteProvider):
+    def __init__(self, quotes: dict) -> None:
+        self.quotes = quotes
+        self.calls = []
+
+    def get_quotes(self, symbols):
+        self.calls.append(list(symbols))
+        return {s: self.quotes[s] for s in symbols if s in self.quotes}
+
+def test_a_symbol_without_a_price_is_not_fetched_again_before_ttl():
+    provider = FakeProvider({"AAAA3": 10.0})
+    cache = QuoteCache(provider, ttl=60)
+    assert cache.get(["AAAA3"]) == {"AAAA3": 10.0}
+    # The quote is stale, and the provider has no price for it anymore
+    cache.quotes["AAAA3"][1] -= 60
+    del provider.quotes["AAAA3"]
+    assert cache.get(["AAAA3"]) == {"AAAA3": 10.0}
+    assert cache.get(["AAAA3"]) == {"AAAA3": 10.0}
+    assert provider.calls == [["AAAA3"], ["AAAA3"]]
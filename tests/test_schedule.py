@@ -0,0 +1,84 @@
+from datetime import date, datetime, timedelta
+import pandas as pd
+from utils.schedule import (
+    DAY,
+    EVENT_WINDOW,
+    MAX_INTERVAL,
+    MIN_INTERVAL,
+    RefreshSchedule
+)
+
+TODAY = date(2021, 6, 15)
+NOW = datetime(2021, 6, 15, 12).timestamp()
+
+def dividends(ex_dates: list, payment_days: list = None) -> pd.DataFrame:
+    payment_days = payment_days or ex_dates
+    return pd.DataFrame({
+        "ex_date": pd.to_datetime([str(d) for d in ex_dates]),
+        "payment_day": pd.to_datetime([str(d) for d in payment_days])
+    })
+
+def test_interval_backs_off_until_the_payload_changes(tmp_path):
+    schedule = RefreshSchedule(str(tmp_path / "schedule.json"))
+    old = dividends([date(2020, 1, 10)])
+    intervals = []
+    for i in range(8):
+        changed = schedule.update("AAAA3", "hash", old, NOW + i * DAY)
+        assert changed == (i == 0)
+        intervals.append(schedule.symbols["AAAA3"]["interval"] // DAY)
+    assert intervals == [1, 2, 4, 8, 16, 32, 32, 32]
+    assert schedule.next_fetch("AAAA3", NOW) == NOW + 7 * DAY + MAX_INTERVAL
+
+    assert schedule.update("AAAA3", "other", old, NOW + 8 * DAY)
+    assert schedule.symbols["AAAA3"]["interval"] == MIN_INTERVAL
+    assert not schedule.is_changed("AAAA3", "other")
+
+    schedule.save()
+    saved = RefreshSchedule(str(tmp_path / "schedule.json"))
+    assert saved.symbols == schedule.symbols
+
+def test_event_window(tmp_path):
+    schedule = RefreshSchedule(str(tmp_path / "schedule.json"))
+    window = timedelta(days=EVENT_WINDOW)
+    schedule.update("RECENT", "h", dividends([TODAY - window]), NOW)
+    schedule.update(
+        "OLD", "h", dividends([TODAY - window - timedelta(days=1)]), NOW
+    )
+    schedule.update(
+        "TO_PAY", "h",
+        dividends([TODAY - 3 * window], [TODAY + timedelta(days=20)]), NOW
+    )
+    # Every 90 days, so the next ex-date is expected in 5 and 30 days
+    schedule.update("EXPECTED", "h", dividends([
+        TODAY - timedelta(days=175), TODAY - timedelta(days=85)
+    ]), NOW)
+    schedule.update("LATER", "h", dividends([
+        TODAY - timedelta(days=150), TODAY - timedelta(days=60)
+    ]), NOW)
+    schedule.update("NONE", "h", None, NOW)
+    events = {
+        symbol: schedule.has_event(symbol, TODAY)
+            for symbol in schedule.symbols
+    }
+    assert events == {
+        "RECENT": True, "OLD": False, "TO_PAY": True, "EXPECTED": True,
+        "LATER": False, "NONE": False
+    }
+    assert schedule.symbols["EXPECTED"]["cadence"] == 90
+    # The window moves with today
+    assert not schedule.has_event("RECENT", TODAY + timedelta(days=1))
+    assert schedule.has_event("LATER", TODAY + timedelta(days=25))
+
+def test_plan_fetches_the_events_first(tmp_path):
+    schedule = RefreshSchedule(str(tmp_path / "schedule.json"))
+    old = dividends([date(2020, 1, 10)])
+    for i in range(3):
+        schedule.update("IDLE", "h", old, NOW - 10 * DAY + i)
+    schedule.update("LATE", "h", old, NOW - 30 * DAY)
+    schedule.update("EVENT", "h", dividends([TODAY]), NOW - 2 * DAY)
+    schedule.update("FRESH", "h", old, NOW)
+    symbols = ["FRESH", "IDLE", "LATE", "EVENT", "NEW"]
+    # IDLE backed off to 4 days and is due, FRESH is not
+    assert schedule.plan(symbols, NOW) == ["EVENT", "NEW", "LATE", "IDLE"]
+    assert schedule.plan(symbols, NOW, limit=2) == ["EVENT", "NEW"]
+    assert schedule.next_fetch("EVENT", NOW) == NOW - 2 * DAY + MIN_INTERVAL
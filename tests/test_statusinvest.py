@@ -0,0 +1,29 @@
+import sys
+from os.path import dirname, realpath
+
+sys.path.append(dirname(realpath(__file__)) + "/../benchmarks")
+import numpy as np
+import pytest
+from bs4 import BeautifulSoup
+from synthetic import page
+from utils.statusinvest import (
+    find_bonus,
+    find_bonus_bs,
+    find_earnings,
+    find_earnings_bs
+)
+
+@pytest.mark.parametrize("seed", range(8))
+@pytest.mark.parametrize("dividends", [0, 1, 40, 300])
+def test_streaming_extractors_match_beautifulsoup(seed, dividends):
+    html = page("ABCD3", np.random.default_rng(seed), dividends)
+    bs = BeautifulSoup(html.encode("utf-8"), "html.parser")
+    assert find_earnings(html) == find_earnings_bs(bs)
+    assert find_bonus(html) == find_bonus_bs(bs)
+
+def test_synthetic_pages_have_bonus_rows():
+    rows = [
+        find_bonus(page("ABCD3", np.random.default_rng(seed), 1))
+            for seed in range(8)
+    ]
+    assert any(rows)
@@ -0,0 +1,89 @@
+from os.path import exists
+import pandas as pd
+from storage.storage import CSVStorage, SQLiteStorage
+from utils.utils import BatchWriter
+
+def save_to_file(df: pd.DataFrame, file: str) -> None:
+    """
+    This function is the previous path, which rewrote the file for each
+    trade confirmation
+    """
+    if exists(file):
+        df_prev = pd.read_csv(file, sep=";")
+    else:
+        df_prev = pd.DataFrame(columns=df.columns)
+    tc_name = df["tc_name"].unique()[0]
+    df_prev = df_prev.loc[~(df_prev["tc_name"] == tc_name)]
+    df_prev = pd.concat([df_prev, df]).sort_values(["date", "tc_name"])
+    df_prev.to_csv(file, sep=";", index=False)
+
+def fees(tc_name: str, date: str, value: float) -> pd.DataFrame:
+    return pd.DataFrame({
+        "date": [date, date],
+        "broker": ["broker", "broker"],
+        "fee": ["liquidacao", "emolumentos"],
+        "value": [value, 1234.56],
+        "tc_name": [tc_name, tc_name],
+    })
+
+def spent_values(tc_name: str, date: str, value: float) -> pd.DataFrame:
+    return pd.DataFrame({
+        "date": [date],
+        "operations_value": [value],
+        "settlement_amount": [1.422713833],
+        "tc_name": [tc_name],
+    })
+
+# The trade confirmations of each run, out of order, with a rewritten one.
+# The values are as the papers give them, and are not rounded
+RUNS = [
+    [("tc-2", "2021-02-01", 37.16), ("tc-1", "2021-01-01", 1.422713833)],
+    [("tc-3", "2021-01-15", 2.675), ("tc-1", "2021-01-01", 0.125)],
+]
+
+def test_batched_writes_match_the_previous_path_byte_for_byte(tmp_path):
+    storage = CSVStorage(str(tmp_path / "new") + "/")
+    (tmp_path / "old").mkdir()
+    old = {
+        table: str(tmp_path / "old" / f"{table}.csv")
+            for table in ["fees", "spent_values"]
+    }
+    for run in RUNS:
+        writer = BatchWriter(storage)
+        for tc_name, date, value in run:
+            df_fees = fees(tc_name, date, value)
+            df_spent = spent_values(tc_name, date, value)
+            save_to_file(df_fees, old["fees"])
+            save_to_file(df_spent, old["spent_values"])
+            writer.save_rows(
+                list(df_fees.itertuples(index=False)),
+                list(df_fees.columns), "fees"
+            )
+            writer.save(df_spent, "spent_values")
+        writer.flush()
+    for table, file in old.items():
+        with open(file, "rb") as f_old, \
+                open(storage.file(table), "rb") as f_new:
+            assert f_new.read() == f_old.read()
+
+def test_sqlite_adds_the_new_columns(tmp_path):
+    storage = SQLiteStorage(str(tmp_path) + "/")
+    storage.write("monthly_profits", pd.DataFrame({
+        "month": ["2021-01"], "sales": [10.5]
+    }))
+    storage.write("monthly_profits", pd.DataFrame({
+        "month": ["2021-01", "2021-02"], "sales": [10.5, 20.0],
+        "exempt": [True, False]
+    }))
+    pd.testing.assert_frame_equal(
+        storage.read("monthly_profits"),
+        pd.DataFrame({
+            "month": ["2021-01", "2021-02"], "sales": [10.5, 20.0],
+            "exempt": [True, False]
+        })
+    )
+    storage.merge("fees", [fees("tc-1", "2021-01-05", 0.31)], set())
+    df = fees("tc-2", "2021-01-06", 0.07).assign(note="late")
+    storage.merge("fees", [df], set())
+    df_fees = storage.read("fees")
+    assert df_fees["note"].isna().tolist() == [True, True, False, False]
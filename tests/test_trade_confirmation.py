@@ -0,0 +1,164 @@
+from trade_confirmation.trade_confirmation import (
+    Operation,
+    OperationBatch,
+    TradeConfirmation
+)
+from trade_confirmation.utils import (
+    VIOLATION_COLUMNS,
+    report_text,
+    validate_papers
+)
+
+def paper(date: str, operations: list, fees: dict) -> dict:
+    value = round(sum(o["value"] for o in operations), 2)
+    return {
+        "broker": "broker",
+        "date": date,
+        "operations_value": value,
+        "settlement_amount": round(value + sum(fees.values()), 2),
+        "fees": fees,
+        "operations": operations
+    }
+
+def test_batch_iterates_over_its_operations():
+    batch = OperationBatch([
+        TradeConfirmation("tc-1.json", paper(
+            "2021-01-04",
+            [
+                {"symbol": "AAAA3", "amount": 10, "price": 10.0,
+                    "value": 100.0},
+                {"symbol": "BBBB3", "amount": 20, "price": 5.0,
+                    "value": 100.0},
+            ],
+            {"liquidacao": 0.03}
+        )),
+        TradeConfirmation("tc-2.json", paper(
+            "2021-01-05",
+            [{"symbol": "AAAA3", "amount": -5, "price": 12.0, "value": -60.0}],
+            {}
+        )),
+    ])
+    operations = list(batch)
+    assert len(operations) == len(batch) == 3
+    assert all(isinstance(o, Operation) for o in operations)
+    assert not hasattr(operations[0], "__dict__")
+    assert [(o.symbol, o.amount, o.counter) for o in operations] == [
+        ("AAAA3", 10, 1), ("BBBB3", 20, 2), ("AAAA3", -5, 1)
+    ]
+    # The 3 cents of fees are split by the values, the cent left to the
+    # first operation
+    assert [o.cost_of_fees for o in operations] == [2, 1, 0]
+    assert [o.value for o in operations] == [10002, 10001, -6000]
+    assert operations[0].price == 10.002
+    assert operations[0].price_without_fees == 10.0
+
+def operation(symbol: str, amount, price, value) -> dict:
+    return {"symbol": symbol, "amount": amount, "price": price, "value": value}
+
+def test_validate_papers_reports_every_violation():
+    valid = paper(
+        "2021-01-04",
+        [operation("AAAA3", 10, 10.0, 100.0)],
+        {"liquidacao": 0.03, "emolumentos": 0.01}
+    )
+    wrong_date = dict(valid, date="04/01/2021")
+    wrong_value = paper(
+        "2021-01-04", [operation("AAAA3", 10, 10.0, 100.0)], {}
+    )
+    wrong_value["operations"][0]["value"] = 101.0
+    wrong_amount = paper(
+        "2021-01-04", [operation("AAAA3", 0.5, 10.0, 5.0)], {}
+    )
+    # A missing operation, and the settlement amount without the fees
+    forgotten = dict(
+        valid, operations_value=200.0, settlement_amount=200.0
+    )
+    zero = paper("2021-01-04", [operation("AAAA3", 10, 0.0, 0.0)], {})
+    missing = {k: v for k, v in valid.items() if k != "fees"}
+    not_a_number = paper(
+        "2021-01-04", [operation("AAAA3", 10, "10,00", 100.0)], {}
+    )
+    unknown = paper(
+        "2021-01-04", [operation("ZZZZ3", 10, 10.0, 100.0)], {}
+    )
+    report = validate_papers(
+        {
+            "valid.json": valid,
+            "wrong_date.json": wrong_date,
+            "wrong_value.json": wrong_value,
+            "wrong_amount.json": wrong_amount,
+            "forgotten.json": forgotten,
+            "zero.json": zero,
+            "missing.json": missing,
+            "not_a_number.json": not_a_number,
+            "unknown.json": unknown,
+            "empty.json": paper("2021-01-04", [], {}),
+            "list.json": [],
+        },
+        brokers=["broker"],
+        symbols=["AAAA3"]
+    )
+    assert list(report.columns) == VIOLATION_COLUMNS
+    assert report.values.tolist() == [
+        ["empty.json", "operations", "", "has no operations"],
+        [
+            "forgotten.json", "operations_value", "200.0",
+            "is not matching with the value of the operations. Please, "
+            "verify that you have not forgotten any operation"
+        ],
+        [
+            "forgotten.json", "settlement_amount", "200.0",
+            "is not matching with the fees cost and the operations value. "
+            "Please, verify that you have not forgotten any information"
+        ],
+        ["list.json", "file", "", "is not a trade confirmation"],
+        ["missing.json", "fees", "", "is missing"],
+        [
+            "not_a_number.json", "operations[0].price", "10,00",
+            "is not a number"
+        ],
+        [
+            "unknown.json", "operations[0].symbol", "ZZZZ3",
+            "does not exist in the companies file. Please, add this company"
+        ],
+        [
+            "wrong_amount.json", "operations[0].amount", "0.5",
+            "must be a whole number of shares other than zero"
+        ],
+        [
+            "wrong_date.json", "date", "04/01/2021",
+            "must respect the format %Y-%m-%d"
+        ],
+        [
+            "wrong_value.json", "operations[0].value", "101.0",
+            "is not matching with the amount and price. Please, verify "
+            "that the values are right"
+        ],
+        [
+            "wrong_value.json", "operations_value", "100.0",
+            "is not matching with the value of the operations. Please, "
+            "verify that you have not forgotten any operation"
+        ],
+        [
+            "zero.json", "operations_value", "0.0",
+            "is zero, so the fees can not be spread over the operations"
+        ],
+    ]
+    assert report_text(report.iloc[[0, 3, 11]]).split("\n") == [
+        "empty.json: operations has no operations",
+        "list.json: file is not a trade confirmation",
+        "zero.json: operations_value is zero, so the fees can not be spread "
+        "over the operations (0.0)",
+    ]
+
+def test_valid_papers_have_no_report():
+    report = validate_papers({"tc.json": paper(
+        "2021-01-04",
+        [
+            operation("AAAA3", 10, 10.0, 100.0),
+            operation("BBBB3", -3, 2.5, -7.5),
+        ],
+        {"liquidacao": 0.03}
+    )}, brokers=["broker"], symbols=["AAAA3", "BBBB3"])
+    assert report.empty
+    assert report_text(report) == ""
@@ -0,0 +1,74 @@
+import threading
+from os import remove, rename
+from time import monotonic, sleep
+import pytest
+from utils.watcher import DirectoryWatcher
+
+DEBOUNCE = 0.3
+
+def new_watcher(dir, backend: str) -> DirectoryWatcher:
+    if backend == "inotify":
+        pytest.importorskip("inotify_simple")
+    watcher = DirectoryWatcher(str(dir), interval=0.05, debounce=DEBOUNCE)
+    if backend == "poll":
+        watcher.close()
+        watcher.inotify = None
+    return watcher
+
+def burst(steps: list, gap: float, done: list) -> threading.Thread:
+    """
+    This function runs the steps in a thread, a gap apart, and records when
+    the last one was done
+    """
+    def run():
+        for step in steps:
+            sleep(gap)
+            step()
+        done.append(monotonic())
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+@pytest.mark.parametrize("backend", ["poll", "inotify"])
+def test_a_burst_of_changes_is_returned_at_once(tmp_path, backend):
+    (tmp_path / "old.json").write_text("{}")
+    (tmp_path / "gone.json").write_text("{}")
+    w = new_watcher(tmp_path, backend)
+    done = []
+    thread = burst([
+        lambda: (tmp_path / "new.json").write_text("{}"),
+        lambda: rename(tmp_path / "old.json", tmp_path / "moved.json"),
+        lambda: remove(tmp_path / "gone.json"),
+        # Other files are not watched
+        lambda: (tmp_path / "notes.txt").write_text(""),
+        lambda: (tmp_path / "new.json").write_text('{"a": 1}'),
+    ], DEBOUNCE / 3, done)
+    try:
+        names = w.wait()
+        returned = monotonic()
+    finally:
+        thread.join()
+        w.close()
+    assert names == ["gone.json", "moved.json", "new.json", "old.json"]
+    # The changes were a debounce apart from each other, so they are all
+    # returned after the last one
+    assert returned - done[0] >= DEBOUNCE
+
+@pytest.mark.parametrize("backend", ["poll", "inotify"])
+def test_separate_bursts_are_separate_batches(tmp_path, backend):
+    w = new_watcher(tmp_path, backend)
+    done = []
+    try:
+        thread = burst([
+            lambda: (tmp_path / "a.json").write_text("{}"),
+        ], 0.0, done)
+        assert w.wait() == ["a.json"]
+        thread.join()
+        thread = burst([
+            lambda: remove(tmp_path / "a.json"),
+            lambda: (tmp_path / "b.json").write_text("{}"),
+        ], 0.05, done)
+        assert w.wait() == ["a.json", "b.json"]
+        thread.join()
+    finally:
+        w.close()